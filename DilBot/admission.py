@@ -0,0 +1,185 @@
+# Admission control for LLM calls: per-user rate limits, a global concurrency
+# cap, and round-robin fairness between users waiting for a slot.
+#
+#   controller.acquire_token(username)          # RateLimited when over the user's rate
+#   with controller.slot(username, on_wait=show_position):
+#       response = chain.run(...)
+#
+# Each user has a token bucket (DILBOT_USER_RATE_PER_MIN tokens a minute, up to
+# DILBOT_USER_BURST saved up) and at most MAX_PENDING_PER_USER requests waiting
+# or running. At most DILBOT_LLM_CONCURRENCY calls run at once per process;
+# when a slot frees up, the next user in rotation gets it, so one user's burst
+# queues behind everyone else instead of in front of them. on_wait(position) is
+# called from the waiting thread whenever its place in line changes.
+import os, time, threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import metrics
+
+LLM_CONCURRENCY = int(os.getenv("DILBOT_LLM_CONCURRENCY", "4"))
+USER_RATE_PER_MIN = float(os.getenv("DILBOT_USER_RATE_PER_MIN", "6"))  # 0 = no per-user limit
+USER_BURST = int(os.getenv("DILBOT_USER_BURST", "3"))
+QUEUE_TIMEOUT = float(os.getenv("DILBOT_ADMISSION_TIMEOUT", "60"))  # seconds a request may wait for a slot
+MAX_PENDING_PER_USER = 2  # requests per user waiting or running at once
+POSITION_POLL = 0.25  # seconds between queue position updates
+
+
+class AdmissionError(Exception):
+    pass
+
+
+class RateLimited(AdmissionError):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many messages; try again in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class QueueTimeout(AdmissionError):
+    def __init__(self, waited):
+        super().__init__(f"DilBot is busy; no slot after {waited:.0f}s")
+        self.waited = waited
+
+
+class _Waiter:
+    __slots__ = ("username", "granted")
+
+    def __init__(self, username):
+        self.username = username
+        self.granted = threading.Event()
+
+
+class AdmissionController:
+    def __init__(self, concurrency=LLM_CONCURRENCY, rate_per_min=USER_RATE_PER_MIN, burst=USER_BURST,
+                 queue_timeout=QUEUE_TIMEOUT, max_pending_per_user=MAX_PENDING_PER_USER):
+        self.concurrency = concurrency
+        self.rate = rate_per_min / 60
+        self.burst = burst
+        self.queue_timeout = queue_timeout
+        self.max_pending_per_user = max_pending_per_user
+        self._lock = threading.Lock()
+        self._buckets = {}  # username -> (tokens, updated_at)
+        self._queues = OrderedDict()  # username -> deque of waiters; order = rotation
+        self._pending = {}  # username -> requests waiting or running
+        self._in_flight = 0
+
+    # Rate limits
+    def acquire_token(self, username):
+        """Spend one of the user's tokens, or raise RateLimited (with seconds until the next one)"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(username, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets[username] = (tokens, now)
+                metrics.increment("llm_rate_limited")
+                raise RateLimited((1 - tokens) / self.rate)
+            self._buckets[username] = (tokens - 1, now)
+            # Full buckets carry no information; drop them so idle users cost nothing
+            for name in [name for name, (t, at) in self._buckets.items()
+                         if t + (now - at) * self.rate >= self.burst]:
+                del self._buckets[name]
+
+    # Concurrency and fairness
+    @contextmanager
+    def slot(self, username, on_wait=None):
+        """Hold one of the concurrent LLM slots; waits in the fair queue when all are busy"""
+        waiter = self._enqueue(username)
+        try:
+            if not waiter.granted.is_set():
+                self._wait(waiter, on_wait)
+            yield
+        finally:
+            self._release(waiter)
+
+    def _enqueue(self, username):
+        with self._lock:
+            if self._pending.get(username, 0) >= self.max_pending_per_user:
+                metrics.increment("llm_rate_limited")
+                raise RateLimited(1.0)
+            self._pending[username] = self._pending.get(username, 0) + 1
+            waiter = _Waiter(username)
+            if self._in_flight < self.concurrency and not self._queues:
+                self._in_flight += 1
+                waiter.granted.set()
+            else:
+                self._queues.setdefault(username, deque()).append(waiter)
+            self._publish()
+            return waiter
+
+    def _wait(self, waiter, on_wait):
+        started = time.monotonic()
+        last_position = None
+        with metrics.span("admission_wait"):
+            while not waiter.granted.wait(POSITION_POLL):
+                if time.monotonic() - started > self.queue_timeout:
+                    if waiter.granted.is_set():
+                        break  # granted just now
+                    metrics.increment("llm_queue_timeouts")
+                    raise QueueTimeout(time.monotonic() - started)  # slot()'s finally leaves the queue
+                if on_wait is not None:
+                    position = self.position(waiter)
+                    if position is not None and position != last_position:
+                        last_position = position
+                        on_wait(position)
+
+    def _release(self, waiter):
+        with self._lock:
+            self._pending[waiter.username] -= 1
+            if not self._pending[waiter.username]:
+                del self._pending[waiter.username]
+            if waiter.granted.is_set():
+                self._in_flight -= 1
+                self._grant_next()
+            else:
+                # Gave up waiting (timeout, or the page was rerun while queued)
+                waiters = self._queues[waiter.username]
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._queues[waiter.username]
+            self._publish()
+
+    def _grant_next(self):
+        """Give free slots to the users at the front of the rotation (caller holds the lock)"""
+        while self._in_flight < self.concurrency and self._queues:
+            username, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(username)  # their next request goes behind everyone else's
+            else:
+                del self._queues[username]
+            self._in_flight += 1
+            waiter.granted.set()
+
+    def position(self, waiter):
+        """1-based place in line under the round-robin order, or None once admitted"""
+        with self._lock:
+            if waiter.granted.is_set():
+                return None
+            queues = [list(waiters) for waiters in self._queues.values()]
+        position = 0
+        for round_index in range(max(map(len, queues), default=0)):
+            for waiters in queues:
+                if round_index < len(waiters):
+                    position += 1
+                    if waiters[round_index] is waiter:
+                        return position
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": sum(len(waiters) for waiters in self._queues.values()),
+                "queued_users": len(self._queues),
+                "concurrency": self.concurrency,
+            }
+
+    def _publish(self):
+        metrics.set_gauge("llm_in_flight", self._in_flight)
+        metrics.set_gauge("llm_queued", sum(len(waiters) for waiters in self._queues.values()))
+
+
+# Shared by every session of this process
+controller = AdmissionController()
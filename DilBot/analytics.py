@@ -0,0 +1,145 @@
+# Fleet-wide journal analytics for the admin dashboard, computed by a background job.
+#
+#   jobs.submit("fleet_analytics", {})
+#   analytics.cached()  # last result plus "stale", or None before the first run
+#
+# Users' journals are split into chunks of CHUNK_USERS and streamed by a pool
+# of DILBOT_ANALYTICS_WORKERS processes: every entry of a user's full history
+# (archived months, then the hot journal) is read one at a time and folded
+# into the chunk's partial aggregates (emotion counts, activity buckets,
+# per-day entries and active users), which the parent merges as chunks finish.
+# At most two chunks per worker are in flight, so memory stays bounded by the
+# aggregates, not the journals. The result is saved with the user index's
+# journal version and served until a journal changes.
+import os, json, time, datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import multiprocessing
+import user_index
+from journal_archive import iter_full_journal
+
+ANALYTICS_PATH = "data/analytics.json"
+# Processes streaming journals (0 = in the job's own process)
+ANALYTICS_WORKERS = int(os.getenv("DILBOT_ANALYTICS_WORKERS", str(min(os.cpu_count() or 1, 8))))
+# A stale result is recomputed on dashboard view at most this often
+REFRESH_MINUTES = float(os.getenv("DILBOT_ANALYTICS_REFRESH_MINUTES", "10"))
+CHUNK_USERS = 64  # journals per task
+
+
+def _empty():
+    return {
+        "users": 0,
+        "entries": 0,
+        "emotion_counts": {},
+        "activity_levels": {label: 0 for label, _, _ in user_index.ACTIVITY_LEVELS},
+        "daily": {},  # date -> {"entries": n, "users": n}
+    }
+
+
+def _activity_level(conversations):
+    for label, low, high in user_index.ACTIVITY_LEVELS:
+        if conversations >= low and (high is None or conversations <= high):
+            return label
+
+
+def aggregate_journals(journal_paths):
+    """Partial aggregates for a chunk of journals, streamed entry by entry"""
+    partial = _empty()
+    emotions, daily = partial["emotion_counts"], partial["daily"]
+    for journal_path in journal_paths:
+        conversations = 0
+        active_days = set()
+        for entry in iter_full_journal(journal_path):
+            conversations += 1
+            emotions[entry["emotion"]] = emotions.get(entry["emotion"], 0) + 1
+            day = daily.setdefault(entry["date"], {"entries": 0, "users": 0})
+            day["entries"] += 1
+            if entry["date"] not in active_days:
+                active_days.add(entry["date"])
+                day["users"] += 1
+        partial["users"] += 1
+        partial["entries"] += conversations
+        partial["activity_levels"][_activity_level(conversations)] += 1
+    return partial
+
+
+def merge(total, partial):
+    total["users"] += partial["users"]
+    total["entries"] += partial["entries"]
+    for emotion, count in partial["emotion_counts"].items():
+        total["emotion_counts"][emotion] = total["emotion_counts"].get(emotion, 0) + count
+    for label, count in partial["activity_levels"].items():
+        total["activity_levels"][label] += count
+    for date, day in partial["daily"].items():
+        merged = total["daily"].setdefault(date, {"entries": 0, "users": 0})
+        merged["entries"] += day["entries"]
+        merged["users"] += day["users"]
+    return total
+
+
+def compute(journal_paths, workers=ANALYTICS_WORKERS, progress=None):
+    """(aggregates over every journal, worker processes used; 0 = inline), chunks merged as they finish"""
+    chunks = [journal_paths[i:i + CHUNK_USERS] for i in range(0, len(journal_paths), CHUNK_USERS)]
+    total = _empty()
+    done = 0
+
+    def report():
+        if progress is not None:
+            progress(done / max(len(chunks), 1), f"Streamed {total['users']} of {len(journal_paths)} journals")
+
+    if workers <= 0 or len(chunks) <= 1:
+        for chunk in chunks:
+            merge(total, aggregate_journals(chunk))
+            done += 1
+            report()
+        return total, 0
+
+    processes = min(workers, len(chunks))
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        remaining = iter(chunks)
+        in_flight = set()
+        while True:
+            for chunk in remaining:
+                in_flight.add(pool.submit(aggregate_journals, chunk))
+                if len(in_flight) >= 2 * workers:
+                    break
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                merge(total, future.result())
+                done += 1
+            report()
+    return total, processes
+
+
+def refresh(journal_paths, workers=ANALYTICS_WORKERS, progress=None):
+    """Recompute and save; the version is read first, so entries written meanwhile leave the result stale"""
+    version = user_index.journal_version()
+    started = time.perf_counter()
+    result, processes = compute(journal_paths, workers, progress)
+    result.update(version=version, computed_at=time.time(), seconds=round(time.perf_counter() - started, 2),
+                  workers=processes)
+    os.makedirs(os.path.dirname(ANALYTICS_PATH), exist_ok=True)
+    with open(ANALYTICS_PATH + ".partial", "w") as f:
+        json.dump(result, f)
+    os.replace(ANALYTICS_PATH + ".partial", ANALYTICS_PATH)
+    return result
+
+
+def cached():
+    """The saved result with "stale" (journals changed since) and "due" (stale and old enough to redo)"""
+    try:
+        with open(ANALYTICS_PATH, "r") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    result["stale"] = result["version"] != user_index.journal_version()
+    result["due"] = result["stale"] and time.time() - result["computed_at"] > REFRESH_MINUTES * 60
+    return result
+
+
+def daily_rows(result):
+    """Per-day totals as chart rows, oldest first"""
+    return [{"date": datetime.date.fromisoformat(date), "entries": day["entries"], "users": day["users"]}
+            for date, day in sorted(result["daily"].items())]
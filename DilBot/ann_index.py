@@ -0,0 +1,129 @@
+# FAISS index selection for quote vectorstores.
+#
+# Small corpora use an exact flat index. Larger ones switch to HNSW (graph,
+# no training) and, past a few hundred thousand quotes, to IVF with trained
+# centroids. DILBOT_INDEX_TYPE forces one of "flat", "hnsw" or "ivf".
+# DILBOT_VECTOR_DTYPE stores vectors as "float16" or "int8" scalar-quantized codes
+# (2x / 4x smaller than "float32") for any of the three index types.
+import os, math
+import numpy as np
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+INDEX_TYPE = os.getenv("DILBOT_INDEX_TYPE", "auto")
+FLAT_MAX_QUOTES = int(os.getenv("DILBOT_FLAT_MAX_QUOTES", "20000"))
+HNSW_MAX_QUOTES = int(os.getenv("DILBOT_HNSW_MAX_QUOTES", "500000"))
+VECTOR_DTYPE = os.getenv("DILBOT_VECTOR_DTYPE", "float32")
+
+HNSW_NEIGHBORS = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = int(os.getenv("DILBOT_HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("DILBOT_IVF_NPROBE", "16"))
+IVF_TRAIN_POINTS_PER_LIST = 40
+SQ_TRAIN_POINTS = 10000
+
+_QUANTIZERS = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def choose_index_type(num_vectors, index_type=None):
+    """Resolve "auto" (or None) to a concrete index type for a corpus of num_vectors"""
+    index_type = (index_type or INDEX_TYPE).lower()
+    if index_type != "auto":
+        return index_type
+    if num_vectors <= FLAT_MAX_QUOTES:
+        return "flat"
+    if num_vectors <= HNSW_MAX_QUOTES:
+        return "hnsw"
+    return "ivf"
+
+
+def ivf_list_count(num_vectors):
+    # ~4*sqrt(N) lists keeps both the coarse and the in-list scan short
+    return max(1, min(65536, int(4 * math.sqrt(max(num_vectors, 1))), num_vectors))
+
+
+def train_size(num_vectors, index_type=None):
+    """How many leading vectors to collect before training an index of this type"""
+    if choose_index_type(num_vectors, index_type) == "ivf":
+        return ivf_list_count(num_vectors) * IVF_TRAIN_POINTS_PER_LIST
+    return min(max(num_vectors, 1), SQ_TRAIN_POINTS)
+
+
+def make_index(dim, num_vectors, index_type=None, vector_dtype=None):
+    """Create an empty (possibly untrained) FAISS index sized for num_vectors"""
+    index_type = choose_index_type(num_vectors, index_type)
+    vector_dtype = vector_dtype or VECTOR_DTYPE
+    if vector_dtype != "float32" and vector_dtype not in _QUANTIZERS:
+        raise ValueError(f"Unknown vector dtype: {vector_dtype}")
+    qtype = _QUANTIZERS.get(vector_dtype)
+
+    if index_type == "flat":
+        if qtype is None:
+            return faiss.IndexFlatL2(dim)
+        return faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2)
+    if index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, HNSW_NEIGHBORS)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, HNSW_NEIGHBORS)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+    if index_type == "ivf":
+        quantizer = faiss.IndexFlatL2(dim)
+        if qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dim, ivf_list_count(num_vectors))
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, ivf_list_count(num_vectors), qtype)
+        index.nprobe = IVF_NPROBE
+        return index
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def vector_dtype(index):
+    """How an index stores its vectors: "float32", "float16" or "int8" (scalar-quantized)"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    quantizer = getattr(index, "sq", None)
+    if quantizer is not None:
+        for name, qtype in _QUANTIZERS.items():
+            if quantizer.qtype == qtype:
+                return name
+    return "float32"
+
+
+def train_index(index, vectors):
+    """Train the index on a sample if it needs training (IVF); no-op otherwise"""
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+
+
+def wrap_index(index, embeddings):
+    """Wrap a raw FAISS index in an empty LangChain vectorstore"""
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+
+
+def build_vectorstore(texts, embeddings, index_type=None):
+    """Embed texts and build a vectorstore whose index type suits the corpus size"""
+    vectors = np.asarray(embeddings.embed_documents(list(texts)), dtype=np.float32)
+    index = make_index(vectors.shape[1], len(vectors), index_type)
+    train_index(index, vectors)
+    vectorstore = wrap_index(index, embeddings)
+    vectorstore.add_embeddings(list(zip(texts, vectors.tolist())))
+    return vectorstore
+
+
+def describe_index(index):
+    """Short human-readable description used in logs and the admin panel"""
+    base = faiss.downcast_index(index)
+    return f"{type(base).__name__} ({index.ntotal} vectors, dim {index.d})"
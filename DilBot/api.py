@@ -0,0 +1,252 @@
+# Headless async HTTP API for DilBot.
+#
+#   uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+#
+# Login/signup, conversation turns, journal queries and admin statistics, with
+# no Streamlit involved. The emotion and sentence models run in a pool of model
+# processes (DILBOT_API_MODEL_WORKERS), blocking storage and LLM work runs in
+# threads, so the event loop only routes requests. Sessions are signed bearer
+# tokens, so any worker sharing DILBOT_API_SECRET and the data directory can
+# serve any user.
+import os, hmac, time, base64, hashlib, secrets, asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import FastAPI, HTTPException, Header, Query
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from admission import RateLimited, QueueTimeout
+import journal_index
+import journal_archive
+import metrics
+from models import MODEL_SERVER, detect_emotion_profile, encode_text, load_emotion_model, load_sentence_model
+from storage import (
+    QUOTE_CATEGORIES, signup, login, get_user_file_path, load_quote_source,
+    load_user_journal, get_admin_stats, search_users
+)
+from turn_pipeline import process_turn, make_llm, create_conversation_memory, synthesize_speech
+
+# Model processes (0 runs the models in the API process itself)
+API_MODEL_WORKERS = int(os.getenv("DILBOT_API_MODEL_WORKERS", "1"))
+# Shared by every API worker; a random per-process secret only suits a single worker
+API_SECRET = os.getenv("DILBOT_API_SECRET") or secrets.token_hex(32)
+API_TOKEN_TTL = int(os.getenv("DILBOT_API_TOKEN_TTL", str(24 * 3600)))
+# Conversation memories kept per API worker (least recently used dropped first)
+API_MEMORY_SESSIONS = int(os.getenv("DILBOT_API_MEMORY_SESSIONS", "1000"))
+
+_model_pool = None
+_memories = OrderedDict()
+_memories_lock = asyncio.Lock()
+
+
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+
+class SignupRequest(Credentials):
+    email: str
+
+
+class TurnRequest(BaseModel):
+    message: str
+    category: str = next(iter(QUOTE_CATEGORIES))
+    speak: bool = True
+
+
+# Signed session tokens: "<username>:<is_admin>:<expiry>" plus an HMAC
+def _sign(payload):
+    return hmac.new(API_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_token(username, is_admin):
+    payload = f"{username}:{int(is_admin)}:{int(time.time()) + API_TOKEN_TTL}"
+    return base64.urlsafe_b64encode(f"{payload}:{_sign(payload)}".encode()).decode()
+
+
+def read_token(authorization):
+    """(username, is_admin) for a valid 'Bearer <token>' header, else 401"""
+    try:
+        scheme, token = authorization.split(" ", 1)
+        payload, signature = base64.urlsafe_b64decode(token.encode()).decode().rsplit(":", 1)
+        username, is_admin, expiry = payload.rsplit(":", 2)
+    except (AttributeError, ValueError):
+        raise HTTPException(status_code=401, detail="Missing or malformed token")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(signature, _sign(payload)):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if int(expiry) < time.time():
+        raise HTTPException(status_code=401, detail="Token expired")
+    return username, is_admin == "1"
+
+
+# Model work
+def _warm_models():
+    load_emotion_model()
+    load_sentence_model()
+
+
+def _run_model(fn, *args):
+    """Run a model call in the model processes (called from worker threads)"""
+    if _model_pool is None:
+        return fn(*args)
+    return _model_pool.submit(fn, *args).result()
+
+
+def pooled_detect(text, token_count=None):
+    return _run_model(detect_emotion_profile, text, token_count)
+
+
+def pooled_encode(text):
+    return _run_model(encode_text, text)
+
+
+async def conversation_memory(username):
+    async with _memories_lock:
+        memory = _memories.get(username)
+        if memory is None:
+            memory = _memories[username] = create_conversation_memory(make_llm())
+            if len(_memories) > API_MEMORY_SESSIONS:
+                _memories.popitem(last=False)
+        _memories.move_to_end(username)
+        return memory
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _model_pool
+    # With a shared model server the models already run out of process
+    if API_MODEL_WORKERS > 0 and not MODEL_SERVER:
+        _model_pool = ProcessPoolExecutor(max_workers=API_MODEL_WORKERS, initializer=_warm_models)
+    metrics.start_metrics_server()
+    yield
+    if _model_pool is not None:
+        _model_pool.shutdown(cancel_futures=True)
+        _model_pool = None
+
+
+app = FastAPI(title="DilBot API", lifespan=lifespan)
+
+
+# Routes
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/signup")
+async def signup_route(request: SignupRequest):
+    success, message = await asyncio.to_thread(signup, request.username, request.password, request.email)
+    return {"success": success, "message": message}
+
+
+@app.post("/login")
+async def login_route(request: Credentials):
+    success, message, is_admin = await asyncio.to_thread(login, request.username, request.password)
+    return {
+        "success": success,
+        "message": message,
+        "is_admin": is_admin,
+        "token": issue_token(request.username, is_admin) if success else None,
+    }
+
+
+@app.post("/turn")
+async def turn_route(request: TurnRequest, authorization: str = Header(None)):
+    username, _ = read_token(authorization)
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Empty message")
+    if request.category not in QUOTE_CATEGORIES:
+        raise HTTPException(status_code=400, detail=f"Unknown quote category: {request.category}")
+
+    memory = await conversation_memory(username)
+    vectorstore, current_quotes = await asyncio.to_thread(load_quote_source, username, request.category)
+    started = time.perf_counter()
+    try:
+        result = await asyncio.to_thread(
+            process_turn, username, request.message.strip(), vectorstore, current_quotes, make_llm(),
+            memory=memory,
+            synthesize=synthesize_speech if request.speak else None,
+            detect=pooled_detect, encode=pooled_encode
+        )
+    except RateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except QueueTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    metrics.observe("turn_total", time.perf_counter() - started)
+    result["audio_url"] = "/audio" if result.pop("audio_path") else None
+    return result
+
+
+@app.get("/audio")
+async def audio_route(authorization: str = Header(None)):
+    username, _ = read_token(authorization)
+    audio_path = get_user_file_path(username, "response.mp3")
+    if not os.path.exists(audio_path):
+        raise HTTPException(status_code=404, detail="No audio yet")
+    return FileResponse(audio_path, media_type="audio/mpeg")
+
+
+@app.get("/journal")
+async def journal_route(authorization: str = Header(None), start_date: str = None, end_date: str = None,
+                        emotion: list[str] = Query(None), limit: int = 50, archived: bool = False):
+    username, _ = read_token(authorization)
+    if archived:
+        # Archived months are opened only when they overlap the date range
+        journal_path = get_user_file_path(username, "journal.json")
+        journal = await asyncio.to_thread(
+            lambda: list(journal_archive.iter_archived_entries(journal_path, start_date, end_date))
+            + load_user_journal(username))
+    else:
+        journal = await asyncio.to_thread(load_user_journal, username)
+    emotions = {e.lower() for e in emotion} if emotion else None
+    entries = [
+        entry for entry in journal
+        if (not start_date or entry["date"] >= start_date)
+        and (not end_date or entry["date"] <= end_date)
+        and (not emotions or entry["emotion"] in emotions)
+    ]
+    return {"total": len(entries), "entries": entries[-limit:] if limit > 0 else entries}
+
+
+@app.get("/journal/search")
+async def journal_search_route(q: str, authorization: str = Header(None), k: int = 5,
+                               start_date: str = None, end_date: str = None, emotion: list[str] = Query(None)):
+    username, _ = read_token(authorization)
+    index_dir = get_user_file_path(username, "journal_index")
+
+    def search():
+        # The index covers the full history, archived months included
+        journal_path = get_user_file_path(username, "journal.json")
+        total = len(load_user_journal(username)) + journal_archive.summary(journal_path)["entries"]
+        if journal_index.entry_count(index_dir) < total:
+            journal_index.backfill(index_dir, journal_path, pooled_encode)
+        return journal_index.search(index_dir, pooled_encode(q.strip()), k=k, start_date=start_date,
+                                    end_date=end_date, emotions=emotion)
+
+    return {"matches": await asyncio.to_thread(search)}
+
+
+@app.get("/admin/stats")
+async def admin_stats_route(authorization: str = Header(None)):
+    _, is_admin = read_token(authorization)
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return await asyncio.to_thread(get_admin_stats)
+
+
+@app.get("/admin/users")
+async def admin_users_route(authorization: str = Header(None), q: str = "", min_conversations: int = 0,
+                            max_conversations: int = None, emotion: str = None, joined_from: str = None,
+                            joined_to: str = None, active_since: str = None, sort: str = "conversations",
+                            limit: int = 50, offset: int = 0):
+    _, is_admin = read_token(authorization)
+    if not is_admin:
+        raise HTTPException(status_code=403, detail="Admin only")
+    try:
+        users, total = await asyncio.to_thread(
+            search_users, q.strip(), min_conversations=min_conversations, max_conversations=max_conversations,
+            emotion=emotion, joined_from=joined_from, joined_to=joined_to, active_since=active_since, sort=sort,
+            limit=min(max(limit, 1), 500), offset=max(offset, 0))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"total": total, "users": users}
@@ -0,0 +1,81 @@
+# Thin client for the DilBot HTTP API (api.py), used by the Streamlit app when
+# DILBOT_API_URL is set. Standard library only.
+#
+# login() and signup() return the same tuples as their storage counterparts, and
+# turn() the same dict as turn_pipeline.process_turn (with the audio as bytes),
+# so callers can switch between local and remote without other changes.
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class DilBotClient:
+    def __init__(self, base_url, token=None, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None, params=None, raw=False):
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode({k: v for k, v in params.items() if v is not None}, doseq=True)
+        headers = {"Accept": "application/json"}
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("detail", e.reason)
+            except ValueError:
+                message = e.reason
+            raise APIError(e.code, message)
+        return body if raw else json.loads(body)
+
+    def signup(self, username, password, email):
+        result = self._request("POST", "/signup", {"username": username, "password": password, "email": email})
+        return result["success"], result["message"]
+
+    def login(self, username, password):
+        result = self._request("POST", "/login", {"username": username, "password": password})
+        if result["success"]:
+            self.token = result["token"]
+        return result["success"], result["message"], result["is_admin"]
+
+    def turn(self, message, category=None, speak=True):
+        payload = {"message": message, "speak": speak}
+        if category:
+            payload["category"] = category
+        result = self._request("POST", "/turn", payload)
+        result["audio"] = self._request("GET", result["audio_url"], raw=True) if result.get("audio_url") else None
+        return result
+
+    def journal(self, start_date=None, end_date=None, emotions=None, limit=50, archived=False):
+        params = {"start_date": start_date, "end_date": end_date, "emotion": emotions, "limit": limit,
+                  "archived": "true" if archived else None}
+        return self._request("GET", "/journal", params=params)
+
+    def search_journal(self, query, k=5, start_date=None, end_date=None, emotions=None):
+        params = {"q": query, "k": k, "start_date": start_date, "end_date": end_date, "emotion": emotions}
+        return self._request("GET", "/journal/search", params=params)["matches"]
+
+    def admin_stats(self):
+        return self._request("GET", "/admin/stats")
+
+    def admin_users(self, prefix="", sort="conversations", limit=50, offset=0, **filters):
+        params = {"q": prefix, "sort": sort, "limit": limit, "offset": offset, **filters}
+        return self._request("GET", "/admin/users", params=params)
@@ -1,27 +1,15 @@
 import streamlit as st
-import os, json, datetime, hashlib
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
-from gtts import gTTS
-from pathlib import Path
+import os
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer, util
-import altair as alt
-import speech_recognition as sr
-from transformers import pipeline
-import torch
-import pickle
-import re
-import pandas as pd 
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Load environment variables
 load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-CRISIS_KEYWORDS = ["suicide", "kill myself", "end it all", "worthless", "can't go on", "hurt myself", "self harm", "want to disappear", "no reason to live"]
+import jobs
+import memory_profile
+import metrics
+from auth_page import API_URL, show_auth_page, get_api_client
 
 # Initialize session state
 if "authenticated" not in st.session_state:
@@ -33,755 +21,96 @@ if "is_admin" not in st.session_state:
 if "transcribed_text" not in st.session_state:
     st.session_state.transcribed_text = ""
 
-# Admin configuration
-ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")  # Set in HF Spaces secrets
-ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")  # Set in HF Spaces secrets
-
-# --- UI/UX Modifications (Applied globally) ---
-def set_background_and_styles():
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@300;400;600;700&display=swap');
-        @import url('https://fonts.googleapis.com/css2?family=Merriweather:wght@300;400;700&display=swap');
-        .stApp {
-            background: linear-gradient(135deg, #e0e7ff 0%, #c6e2ff 50%, #b0c4de 100%); /* Light blueish gradient */
-            background-size: cover;
-            background-position: center;
-            background-repeat: no-repeat;
-            background-attachment: fixed;
-            font-family: 'Montserrat', sans-serif;
-            color: #333; /* Default text color to dark for light background */
-        }
-        
-        h1, h2, h3, h4, h5, h6, .stMarkdown, label {
-            font-family: 'Merriweather', serif;
-            color: #1a237e; /* Darker blue for headings */
-        }
-        
-        /* Ensure text area label is dark */
-        .stTextArea > label {
-            color: #333 !important;
-        }
-        .stButton>button {
-            background-image: linear-gradient(to right, #6a11cb 0%, #2575fc 100%); /* Blue-purple gradient */
-            color: white;
-            border-radius: 8px;
-            border: none;
-            padding: 10px 20px;
-            font-size: 16px;
-            font-weight: bold;
-            transition: all 0.2s ease-in-out;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        }
-        .stButton>button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 12px rgba(0, 0, 0, 0.2);
-        }
-        
-        /* Secondary button style for "Explore Opportunities" */
-        .secondary-button > button {
-            background-color: white;
-            color: #6a11cb;
-            border: 1px solid #6a11cb;
-            box-shadow: none;
-        }
-        .secondary-button > button:hover {
-            background-color: #f0f4f8; /* Light hover */
-            color: #2575fc;
-            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-        }
-        .stTextInput>div>div>input, .stTextArea>div>div>textarea, .stSelectbox>div>div>div {
-            border-radius: 8px;
-            border: 1px solid #b3e5fc; /* Light blue border */
-            padding: 10px;
-            background-color: rgba(255, 255, 255, 0.95); /* Nearly opaque white */
-            color: #333; /* Input text color dark */
-        }
-        /* Adjusted stSuccess and stInfo for white text on darker transparent black background */
-        .stSuccess { 
-            border-left: 5px solid #28a745; 
-            background-color: rgba(0, 0, 0, 0.6); /* Transparent black */
-            color: white; /* Make text white */
-            border-radius: 8px;
-            padding: 10px;
-            margin-bottom: 10px;
-        }
-        .stInfo { 
-            border-left: 5px solid #17a2b8; 
-            background-color: rgba(0, 0, 0, 0.6); /* Transparent black */
-            color: white; /* Make text white */
-            border-radius: 8px;
-            padding: 10px;
-            margin-bottom: 10px;
-        }
-        /* Keeping warning/error as original light background for now, as black transparent might not suit warnings well */
-        .stWarning { 
-            border-left: 5px solid #ffc107; 
-            background-color: rgba(255, 255, 255, 0.9); 
-            color: #333; 
-            border-radius: 8px;
-            padding: 10px;
-            margin-bottom: 10px;
-        }
-        .stError { 
-            border-left: 5px solid #dc3545; 
-            background-color: rgba(255, 255, 255, 0.9); 
-            color: #333; 
-            border-radius: 8px;
-            padding: 10px;
-            margin-bottom: 10px;
-        }
-        /* Custom container for content with blur background - used for auth form */
-        .auth-content-container {
-            background-color: rgba(255, 255, 255, 0.8); /* Slightly transparent white */
-            backdrop-filter: blur(8px); /* Blur effect */
-            border-radius: 15px;
-            padding: 30px;
-            margin: 20px auto;
-            max-width: 450px; /* Slimmer for auth forms */
-            box-shadow: 0 10px 25px rgba(0, 0, 0, 0.1);
-            text-align: center; /* Center content within */
-        }
-        
-        .feature-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); /* Adjusted for more flexibility */
-            gap: 20px;
-            margin-top: 30px;
-            margin-bottom: 30px;
-            max-width: 900px; /* Max width for the grid itself */
-            margin-left: auto;
-            margin-right: auto;
-        }
-        .feature-item {
-            background-color: rgba(255, 255, 255, 0.9);
-            border-radius: 12px;
-            padding: 20px;
-            text-align: center;
-            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.08);
-            transition: transform 0.2s ease-in-out;
-            border: 1px solid #e0e0e0;
-        }
-        .feature-item:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 8px 15px rgba(0, 0, 0, 0.12);
-        }
-        .feature-item .icon-img {
-            height: 60px; /* Adjust icon size as needed */
-            margin-bottom: 10px;
-            display: block; /* Ensure icon is on its own line */
-            margin-left: auto;
-            margin-right: auto;
-        }
-        .feature-item h3 {
-            font-size: 1.2em;
-            color: #1a237e;
-            margin-bottom: 8px;
-        }
-        .feature-item p {
-            font-size: 0.9em;
-            color: #555;
-            line-height: 1.5;
-        }
-        /* Main app content container */
-        .main-app-content-container {
-            background-color: rgba(255, 255, 255, 0.8); /* Slightly transparent white */
-            backdrop-filter: blur(8px); /* Blur effect */
-            border-radius: 15px;
-            padding: 30px;
-            margin: 20px auto;
-            max-width: 800px; /* Wider for main app content */
-            box-shadow: 0 10px 25px rgba(0, 0, 0, 0.1);
-            color: #333; /* Dark text inside */
-        }
-        /* Ensure headers within main app container are dark */
-        .main-app-content-container h1, .main-app-content-container h2, 
-        .main-app-content-container h3, .main-app-content-container h4, 
-        .main-app-content-container h5, .main-app-content-container h6,
-        .main-app-content-container .stMarkdown, .main-app-content-container label {
-            color: #1a237e; /* Darker blue for headers in main app */
-        }
-        /* Specifically target text within main-app-content-container to be dark */
-        .main-app-content-container p, .main-app-content-container li, .main-app-content-container div {
-            color: #333;
-        }
-        /* Override specific Streamlit elements that don't pick up general styles for main app */
-        .main-app-content-container .st-emotion-cache-1jmve6n, /* st.subheader */
-        .main-app-content-container .st-emotion-cache-1gcs47q, /* st.text or similar */
-        .main-app-content-container .st-emotion-cache-10q7f27, /* st.info text */
-        .main-app-content-container .st-emotion-cache-1j0qsvo { /* more specific text */
-             color: #333 !important;
-        }
-        /* Navbar Styling */
-        .navbar {
-            display: flex;
-            justify-content: center; /* Center the logo and title */
-            align-items: center;
-            padding: 15px 40px;
-            background-color: rgba(255, 255, 255, 0.8); /* Slightly transparent white */
-            backdrop-filter: blur(5px);
-            border-bottom: 1px solid rgba(0, 0, 0, 0.05);
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
-            border-radius: 10px;
-            margin-bottom: 20px;
-            /* position: relative; Removed absolute positioning as logout button is gone */
-        }
-        .navbar-logo-container {
-            display: flex;
-            align-items: center;
-            justify-content: center; /* Center the logo and text */
-            flex-grow: 1; /* Allows it to take available space for centering */
-        }
-        .navbar-logo-text {
-            font-family: 'Merriweather', serif;
-            font-size: 24px;
-            font-weight: bold;
-            color: #1a237e;
-            margin-left: 10px; /* Space between logo image and text */
-        }
-        .navbar-logo-img {
-            height: 30px; /* Size of your logo image */
-            vertical-align: middle;
-        }
-        .navbar-links { /* This block might not be needed if links are removed */
-            display: flex;
-            gap: 30px;
-        }
-        .navbar-link { /* This block might not be needed if links are removed */
-            font-family: 'Montserrat', sans-serif;
-            font-size: 16px;
-            color: #3f51b5; /* Medium blue */
-            text-decoration: none;
-            padding: 5px 10px;
-            transition: color 0.2s ease-in-out;
-            cursor: pointer;
-        }
-        .navbar-link:hover { /* This block might not be needed if links are removed */
-            color: #6a11cb; /* Purple hover */
-        }
-        .navbar-button { /* This block might not be needed if links are removed */
-            background-image: linear-gradient(to right, #6a11cb 0%, #2575fc 100%);
-            color: white;
-            border-radius: 8px;
-            padding: 8px 15px;
-            font-size: 14px;
-            font-weight: bold;
-            text-decoration: none;
-            transition: all 0.2s ease-in-out;
-            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-            cursor: pointer;
-        }
-        .navbar-button:hover { /* This block might not be needed if links are removed */
-            transform: translateY(-1px);
-            box_shadow: 0 4px 8px rgba(0, 0, 0, 0.15);
-        }
-        /* AI Powered Educational Platform banner style */
-        .ai-powered-banner {
-            display: inline-flex; /* Use inline-flex to shrink-wrap content */
-            align-items: center;
-            background-color: rgba(255, 255, 255, 0.7); /* Light, semi-transparent */
-            border-radius: 20px;
-            padding: 8px 15px;
-            margin-bottom: 20px;
-            font-size: 14px;
-            font-weight: 600;
-            color: #3f51b5; /* Blue text */
-            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-            text-align: center; /* Ensure text is centered if container grows */
-            margin-left: auto; /* Center horizontally */
-            margin-right: auto; /* Center horizontally */
-        }
-        .centered-container {
-            display: flex;
-            justify-content: center;
-            width: 100%;
-        }
-        /* Metrics section styles (50K+ Students Helped, etc.) */
-        .metrics-container {
-            display: flex;
-            justify-content: space-around;
-            flex-wrap: wrap;
-            margin-top: 40px;
-            gap: 20px;
-            /* border: 1px solid red; REMOVED for debugging */ 
-        }
-        .metric-item {
-            text-align: center;
-            background-color: rgba(255, 255, 255, 0.7);
-            padding: 20px;
-            border-radius: 10px;
-            box-shadow: 0 4px 10px rgba(0,0,0,0.05);
-            flex: 1; /* Allow items to grow/shrink */
-            min-width: 180px; /* Minimum width before wrapping */
-        }
-        .metric-item h2 {
-            font-size: 32px;
-            color: #6a11cb; /* Purple */
-            margin-bottom: 5px;
-        }
-        .metric-item p {
-            font-size: 16px;
-            color: #555;
-        }
-        .metric-item img { /* Style for icon images if used */
-            height: 40px;
-            margin-bottom: 10px;
-        }
-        /* Center plots */
-        .st-emotion-cache-1pxazr6 { /* Specific Streamlit container for pyplot */
-            display: flex;
-            justify-content: center;
-        }
-        /* Override specific Streamlit elements that don't pick up general styles */
-        .st-emotion-cache-1jmve6n { /* This class is often for st.subheader */
-            color: #1a237e !important; /* Darker blue */
-        }
-        .st-emotion-cache-1gcs47q { /* This class can be for specific text elements */
-             color: #333 !important;
-        }
-        .st-emotion-cache-10q7f27 { /* Example for st.info text */
-             color: #333 !important;
-        }
-        /* Hide the top grey bar */
-        header.st-emotion-cache-1gh8zsi {
-            display: none !important;
-        }
-        div.st-emotion-cache-fis6y8 { 
-            padding-top: 0 !important;
-        }
-        div.st-emotion-cache-z5inrg { 
-            display: none !important;
-        }
-        /* Adjust overall container width */
-        .st-emotion-cache-fg4lbf { 
-            max-width: 1000px !important; /* Adjusted for wider layout */
-            padding-left: 0 !important; 
-            padding-right: 0 !important;
-        }
-        .block-container { 
-            padding-left: 1rem;
-            padding-right: 1rem;
-            color: #333; /* Default text color within block-container */
-        }
-        /* Specific style for button alignment */
-        /* Updated .button-row to stack and add spacing */
-        .button-row {
-            display: flex;
-            flex-direction: column; /* Stack buttons vertically */
-            align-items: center; /* Center buttons horizontally */
-            gap: 20px; /* Space between buttons */
-            margin-top: 20px;
-            width: 100%; /* Ensure row takes full width to center its content */
-        }
-        .button-row > div { /* Target Streamlit column divs within button-row if still used */
-            width: 100%; /* Make columns take full width to center buttons */
-            display: flex;
-            justify-content: center; /* Center the buttons inside their columns */
-        }
-        /* Custom footer style */
-        .app-footer {
-            position: fixed;
-            left: 0;
-            bottom: 0;
-            width: 100%;
-            background-color: #f0f2f6; /* Streamlit's default background color */
-            color: #31333F; /* Streamlit's default text color */
-            text-align: center;
-            padding: 10px;
-            font-size: 14px;
-            border-top: 1px solid #d3d3d3;
-            z-index: 1000; /* Ensure footer is on top */
-        }
-        /* Adjust app padding to prevent content from being hidden by footer */
-        .stApp {
-            padding-bottom: 50px; /* Approx height of footer */
-        }
-        /* History entry styling */
-        .history-entry {
-            background-color: rgba(255, 255, 255, 0.9);
-            border-radius: 10px;
-            padding: 15px;
-            margin-bottom: 10px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            border: 1px solid #e0e0e0;
-        }
-        .history-entry h4 {
-            color: #2575fc; /* Blue for history entry title */
-            margin-top: 0;
-            margin-bottom: 5px;
-        }
-        .history-entry p {
-            color: #444;
-            font-size: 0.95em;
-        }
-        .history-entry strong {
-            color: #1a237e;
-        }
-        /* New style for output text color from DilBot */
-        .dilbot-response-text {
-            color: black !important; /* Force black text */
-        }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
-# User management functions
-def hash_password(password):
-    """Hash password using SHA-256 with salt"""
-    salt = "dilbot_secure_salt_2024"  # You can change this
-    return hashlib.sha256((password + salt).encode()).hexdigest()
-
-def get_secure_users_path():
-    """Get path to users file in a hidden directory"""
-    secure_dir = ".secure_data"
-    os.makedirs(secure_dir, exist_ok=True)
-    return os.path.join(secure_dir, "users_encrypted.json")
-
-def load_users():
-    """Load users from secure file"""
-    users_path = get_secure_users_path()
-    if os.path.exists(users_path):
-        try:
-            with open(users_path, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_users(users):
-    """Save users to secure file"""
-    users_path = get_secure_users_path()
-    with open(users_path, "w") as f:
-        json.dump(users, f, indent=4)
-
-def create_user_directory(username):
-    """Create user-specific directory structure"""
-    user_dir = f"users/{username}"
-    os.makedirs(user_dir, exist_ok=True)
-    return user_dir
-
-def get_user_file_path(username, filename):
-    """Get path to user-specific file"""
-    user_dir = f"users/{username}"
-    return os.path.join(user_dir, filename)
-
-def signup(username, password, email):
-    """Register new user"""
-    users = load_users()
-    if username in users:
-        return False, "Username already exists"
-    
-    email_pattern = r"^[\w\.-]+@[\w\.-]+\.\w+$"
-    if not re.match(email_pattern, email):
-         return False, "Invalid email format"
-        
-    users[username] = {
-        "password": hash_password(password),
-        "email": email,
-        "created_at": str(datetime.datetime.now())
-    }
-    save_users(users)
-    create_user_directory(username)
-    return True, "Account created successfully!"
-
-def login(username, password):
-    """Authenticate user or admin"""
-    # Check if admin login
-    if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
-        return True, "Admin login successful!", True
-    
-    # Regular user login
-    users = load_users()
-    if username not in users:
-        return False, "User not found.Please signup.", False
-    
-    if users[username]["password"] == hash_password(password):
-        return True, "Login successful!", False
-    return False, "Incorrect password", False
-
-# Emotion detection
 @st.cache_resource
-def load_emotion_model():
-    return pipeline(
-        "text-classification",
-        model="j-hartmann/emotion-english-distilroberta-base",
-        top_k=1,
-        device=-1
-    )
-
-def detect_emotion(text):
-    emotion_pipeline = load_emotion_model()
-    prediction = emotion_pipeline(text)[0][0]
-    return prediction['label'].lower(), prediction['score']
-
-
-# Authentication UI
-def show_auth_page():
-    set_background_and_styles()
-    st.markdown(
-        """
-        <div class="navbar">
-            <div class="navbar-logo-container">
-                <img src="https://e7.pngegg.com/pngimages/498/917/png-clipart-computer-icons-desktop-chatbot-icon-blue-angle-thumbnail.png" class="navbar-logo-img">
-                <div class="navbar-logo-text">DilBot</div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True
-    )
-
-    st.markdown("<div class='centered-container'><div class='ai-powered-banner'><span>✨</span>AI-Powered Emotional Companion</div></div>", unsafe_allow_html=True)
-
-    st.markdown(
-        """
-        <h1 style='text-align: center; font-size: 3.5em; color: #1a237e;'>Transform Your Emotional Journey</h1>
-        <p style='text-align: center; font-size: 1.2em; color: #555;'>
-            DilBot empowers individuals with AI-driven insights for emotional well-being, personal growth, and self-discovery worldwide.
-        </p>
-        """, unsafe_allow_html=True
-    )
-
-    st.markdown('<div class="button-row">', unsafe_allow_html=True)
-    
-    # Buttons placed directly in a single column layout
-    if st.button("Paid Plan", key="paid_plan_btn", use_container_width=True):
-        st.info("Paid version coming soon") # Text for paid plan button
-    st.markdown('<div class="secondary-button" style="margin-top: 20px;">', unsafe_allow_html=True) # Added margin for spacing
-    if st.button("Login Below FOR FREE", key="login_free_btn", use_container_width=True):
-        st.info("Slide down below") # Text for free login button
-    st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True) # Close button-row
-
-
-    # --- Section for icons and descriptions ---
-    st.markdown("<div class='feature-grid'>", unsafe_allow_html=True)
-    
-    # First Image: Users vast amount satisfied (https://cdn-icons-png.flaticon.com/512/33/33308.png)
-    st.markdown(f"""
-        <div class="feature-item">
-            <img src="https://cdn-icons-png.flaticon.com/512/33/33308.png" class="icon-img">
-            <h3>Users Vastly Satisfied</h3>
-            <p>Our community experiences significant positive emotional shifts.</p>
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Second Image: Successful User's Emotion's results a happy lifestyle (https://cdn-icons-png.flaticon.com/512/10809/10809501.png)
-    st.markdown(f"""
-        <div class="feature-item">
-            <img src="https://cdn-icons-png.flaticon.com/512/10809/10809501.png" class="icon-img">
-            <h3>Happy Lifestyle</h3>
-            <p>Empowering users to achieve emotional well-being and a happier life.</p>
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Third Image: 10,000+ Daily Users (https://www.clipartmax.com/png/middle/225-2254363_checklist-comments-form-approved-icon.png)
-    st.markdown(f"""
-        <div class="feature-item">
-            <img src="https://www.clipartmax.com/png/middle/225-2254363_checklist-comments-form-appr.png" class="icon-img">
-            <h3>10,000+ Daily Users</h3>
-            <p>Join our growing community finding support and growth daily.</p>
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Re-adding the original Empathetic Chatbot feature from previous response for completeness
-    st.markdown("""
-        <div class="feature-item">
-            <span class="icon-img"></span> <h3>Empathetic Chatbot</h3>
-            <p>Connect with an AI that listens and understands your feelings.</p>
-        </div>
-    """, unsafe_allow_html=True)
-
-    st.markdown("</div>", unsafe_allow_html=True)
-    # --- End of icon and description section ---
+def start_metrics_endpoint():
+    """Expose /metrics once per worker process (DILBOT_METRICS_PORT, off by default)"""
+    return metrics.start_metrics_server()
 
-
-    st.markdown("<div class='auth-content-container'>", unsafe_allow_html=True) # Container for login/signup
-
-    tab1, tab2 = st.tabs(["Login", "Sign Up"])
-    
-    with tab1:
-        st.subheader("Login to Your Account( Admin will use own creditionals )")
-        login_username = st.text_input("Username", key="login_user")
-        login_password = st.text_input("Password", type="password", key="login_pass")
-        
-        if st.button("Login", key="login_btn"):
-            if login_username and login_password:
-                success, message, is_admin = login(login_username, login_password)
-                if success:
-                    st.session_state.authenticated = True
-                    st.session_state.username = login_username
-                    st.session_state.is_admin = is_admin
-                    st.session_state.page = "main_app" if not is_admin else "admin_dashboard" # Direct to correct page
-                    st.rerun()
-                else:
-                    st.error(message)
-            else:
-                st.warning("Please fill in all fields")
-    
-    with tab2:
-        st.subheader("Create New Account")
-        signup_username = st.text_input("Choose Username", key="signup_user")
-        signup_email = st.text_input("Email Address", key="signup_email")
-        signup_password = st.text_input("Choose Password", type="password", key="signup_pass")
-        signup_confirm = st.text_input("Confirm Password", type="password", key="signup_confirm")
-        
-        if st.button("Create Account", key="signup_btn"):
-            if all([signup_username, signup_email, signup_password, signup_confirm]):
-                if signup_password != signup_confirm:
-                    st.error("Passwords don't match!")
-                elif len(signup_password) < 6:
-                    st.error("Password must be at least 6 characters long!")
-                else:
-                    success, message = signup(signup_username, signup_password, signup_email)
-                    if success:
-                        st.success(message)
-                        st.info("You can now login with your credentials!")
-                    else:
-                        st.error(message)
-            else:
-                st.warning("Please fill in all fields")
-
-    st.markdown("</div>", unsafe_allow_html=True)
-    
-# Main app functions
-def build_user_vectorstore(username, quotes):
-    """Build and save user-specific vectorstore"""
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_texts(quotes, embedding=embeddings)
-    
-    # Save vectorstore for user
-    vectorstore_path = get_user_file_path(username, "vectorstore")
-    vectorstore.save_local(vectorstore_path)
-    return vectorstore
-
-def load_user_vectorstore(username):
-    """Load user-specific vectorstore"""
-    vectorstore_path = get_user_file_path(username, "vectorstore")
-    if os.path.exists(vectorstore_path):
-        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        return FAISS.load_local(vectorstore_path, embeddings, allow_dangerous_deserialization=True)
-    return None
-
-def save_user_journal(username, user_input, emotion, score, response):
-    """Save journal entry for specific user"""
-    journal_path = get_user_file_path(username, "journal.json")
-    entry = {
-        "date": str(datetime.date.today()),
-        "timestamp": str(datetime.datetime.now()),
-        "user_input": user_input,
-        "emotion": emotion,
-        "confidence": round(score * 100, 2),
-        "response": response
-    }
-    
-    journal = []
-    if os.path.exists(journal_path):
-        with open(journal_path, "r") as f:
-            journal = json.load(f)
-    
-    journal.append(entry)
-    with open(journal_path, "w") as f:
-        json.dump(journal, f, indent=4)
-
-def load_user_journal(username):
-    """Load journal for specific user"""
-    journal_path = get_user_file_path(username, "journal.json")
-    if os.path.exists(journal_path):
-        with open(journal_path, "r") as f:
-            return json.load(f)
-    return []
-
-def get_admin_stats():
-    """Get comprehensive admin statistics"""
-    users = load_users()
-    stats = {
-        "total_users": len(users),
-        "users_today": 0,
-        "users_this_week": 0,
-        "total_conversations": 0,
-        "active_users": 0,
-        "user_details": []
-    }
-    
-    today = datetime.date.today()
-    week_ago = today - datetime.timedelta(days=7)
-    
-    for username, user_data in users.items():
-        created_date = datetime.datetime.fromisoformat(user_data["created_at"]).date()
-        
-        # Count registrations
-        if created_date == today:
-            stats["users_today"] += 1
-        if created_date >= week_ago:
-            stats["users_this_week"] += 1
-        
-        # Get user journal stats
-        journal_data = load_user_journal(username)
-        conversation_count = len(journal_data)
-        stats["total_conversations"] += conversation_count
-        
-        if conversation_count > 0:
-            stats["active_users"] += 1
-            last_activity = journal_data[-1]["date"] if journal_data else "Never"
-        else:
-            last_activity = "Never"
-        
-        # Get emotion breakdown
-        emotions = [entry['emotion'] for entry in journal_data]
-        emotion_counts = {}
-        for emotion in emotions:
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        most_common_emotion = max(emotion_counts, key=emotion_counts.get) if emotion_counts else "None"
-        
-        stats["user_details"].append({
-            "username": username,
-            "email": user_data["email"],
-            "joined": created_date.strftime("%Y-%m-%d"),
-            "conversations": conversation_count,
-            "last_activity": last_activity,
-            "most_common_emotion": most_common_emotion.capitalize(),
-            "emotions_breakdown": emotion_counts
-        })
-    
-    return stats
+@st.cache_resource
+def start_job_workers():
+    """Background job worker processes, started once per Streamlit server (DILBOT_JOB_WORKERS)"""
+    return jobs.start_workers()
+
+def record_session_memory():
+    """Sample this session's state size for the admin Memory panel"""
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        memory_profile.record_session(ctx.session_id, st.session_state.get("username"), st.session_state)
+
+start_metrics_endpoint()
+start_job_workers()
+record_session_memory()
+
+# Login and signup run on the light imports above; models, LangChain and the
+# journal store are imported only once a session is authenticated
+if not st.session_state.authenticated:
+    show_auth_page()
+    st.stop()
+
+import json, datetime, time
+import altair as alt
+import speech_recognition as sr
+import pandas as pd 
+import analytics
+import journal_index
+import journal_archive
+import storage
+import storage_manager
+from export import load_export_state
+from models import encode_text
+from storage import (
+    QUOTE_CATEGORIES, get_user_file_path, bump_generation,
+    load_user_journal, get_admin_stats, get_admin_logs, search_users, rebuild_user_index
+)
+from session_cache import UserStateCache
+from quote_ingest import count_lines
+from turn_pipeline import process_turn, make_llm, create_conversation_memory
+from llm_router import hedge_stats
+from api_client import APIError
+from admission import RateLimited, QueueTimeout
+
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job_key, label):
+    """Progress of the background job in st.session_state[job_key]; reruns the page once it finishes"""
+    job = jobs.get_job(st.session_state[job_key])
+    if job["status"] in ("done", "failed"):
+        st.rerun()
+    st.progress(min(job["progress"] or 0.0, 1.0), text=job["message"] or label)
+
+@st.fragment(run_every=1.0)
+def play_when_ready(job_id):
+    """Play DilBot's voice as soon as the speech job has produced it"""
+    job = jobs.get_job(job_id)
+    if job["status"] == "done":
+        st.audio(job["result"]["audio_path"], format="audio/mp3")
+    elif job["status"] == "failed":
+        st.caption("DilBot's voice is unavailable for this reply.")
+    else:
+        st.caption("Preparing DilBot's voice...")
+
+def format_emotion_profile(profile, top=3):
+    """One line for a long entry's mix of emotions, e.g. Across 6 parts: Sadness 54% · Fear 31% · Joy 9%"""
+    shares = " · ".join(f"{emotion.capitalize()} {share * 100:.0f}%"
+                        for emotion, share in list(profile["distribution"].items())[:top])
+    return f"Across {len(profile['segments'])} parts: {shares}"
+
+def get_user_cache(username):
+    """This session's cache of the user's journal, dashboard numbers and quote store"""
+    if st.session_state.get("user_cache") is None or st.session_state.user_cache.username != username:
+        st.session_state.user_cache = UserStateCache(username)
+    return st.session_state.user_cache
+
+def get_conversation_memory(username):
+    """Get this session's conversation memory, starting a fresh one for a new user"""
+    if st.session_state.get("memory_owner") != username:
+        st.session_state.conversation_memory = create_conversation_memory(make_llm())
+        st.session_state.memory_owner = username
+    return st.session_state.conversation_memory
 
 def log_admin_activity(action, details=""):
     """Log admin activities"""
-    admin_log_path = "data/admin_log.json"  # Persistent and visible
-    log_entry = {
-        "timestamp": str(datetime.datetime.now()),
-        "action": action,
-        "details": details,
-        "admin": st.session_state.username
-    }
-    
-    admin_log = []
-    if os.path.exists(admin_log_path):
-        with open(admin_log_path, "r") as f:
-            admin_log = json.load(f)
-    
-    admin_log.append(log_entry)
-    
-    # Keep only last 100 entries
-    admin_log = admin_log[-100:]
-    
-    os.makedirs("data", exist_ok=True)
-    with open(admin_log_path, "w") as f:
-        json.dump(admin_log, f, indent=4)
-
-def get_admin_logs():
-    """Get admin activity logs"""
-    admin_log_path = "data/admin_log.json"
-    if os.path.exists(admin_log_path):
-        with open(admin_log_path, "r") as f:
-            return json.load(f)
-    return []
-
-def is_crisis(text):
-    """Check for crisis keywords"""
-    return any(phrase in text.lower() for phrase in CRISIS_KEYWORDS)
+    storage.log_admin_activity(action, details, admin=st.session_state.username)
 
 def show_admin_dashboard():
     """Admin dashboard for monitoring users and app usage"""
@@ -1104,8 +433,8 @@ def show_admin_dashboard():
     # Log admin access
     log_admin_activity("Dashboard Access", "Viewed admin dashboard")
     
-    # Get statistics
-    stats = get_admin_stats()
+    # Get statistics (aggregates from the user index; users are searched page by page below)
+    stats = get_admin_stats(include_users=False)
     
     # Overview metrics
     st.markdown("<h2> Overview</h2>", unsafe_allow_html=True)
@@ -1124,15 +453,9 @@ def show_admin_dashboard():
     # User registration trend
     st.markdown("<h2> User Registration Trend</h2>", unsafe_allow_html=True)
     with st.container(border=True): # Wrap chart in a container
-        if stats["user_details"]:
-            # Create registration data
-            reg_data = {}
-            for user in stats["user_details"]:
-                date = user["joined"]
-                reg_data[date] = reg_data.get(date, 0) + 1
-            
+        if stats["registrations"]:
             # Convert to DataFrame for Altair compatibility and sorting
-            chart_data_list = [{"date": date, "registrations": count} for date, count in reg_data.items()]
+            chart_data_list = [{"date": date, "registrations": count} for date, count in stats["registrations"].items()]
             chart_df = pd.DataFrame(chart_data_list).sort_values("date")
 
             if not chart_df.empty:
@@ -1152,23 +475,50 @@ def show_admin_dashboard():
     # Detailed user table
     st.markdown("<h2>👥 User Details</h2>", unsafe_allow_html=True)
     with st.container(border=True): # Wrap user details section in a container
-        # Search and filter
+        # Search, filter and sort (answered by the user index)
         col1, col2 = st.columns([2, 1])
         with col1:
-            search_term = st.text_input(" Search users", placeholder="Search by username or email", label_visibility="visible")
+            search_term = st.text_input(" Search users", placeholder="Username or email starts with...", label_visibility="visible")
         with col2:
             min_conversations = st.number_input("Min conversations", min_value=0, value=0, label_visibility="visible")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            emotion_filter = st.selectbox("Most common emotion", ["Any"] + sorted(e.capitalize() for e in stats["emotion_totals"]))
+        with col2:
+            sort_labels = {"Most conversations": "conversations", "Recently active": "last_activity",
+                           "Newest": "joined", "Username": "username"}
+            sort_by = st.selectbox("Sort by", list(sort_labels))
+        with col3:
+            page_size = st.selectbox("Show", [25, 50, 100, 250], index=1)
+
+        filtered_users, matching_users = search_users(
+            search_term.strip(), min_conversations=min_conversations,
+            emotion=None if emotion_filter == "Any" else emotion_filter,
+            sort=sort_labels[sort_by], limit=page_size)
+        caption_col, rebuild_col = st.columns([3, 1])
+        with caption_col:
+            st.caption(f"Showing {len(filtered_users)} of {matching_users} matching users")
+        with rebuild_col:
+            if st.button("Rebuild user index", use_container_width=True,
+                         help="Recount every user's conversations from their journals"):
+                with st.spinner("Rebuilding the user index..."):
+                    count = rebuild_user_index()
+                log_admin_activity("User Index Rebuild", f"Reindexed {count} users")
+                st.rerun()
         
-        # Filter users
-        filtered_users = stats["user_details"]
-        if search_term:
-            filtered_users = [u for u in filtered_users if
-                              search_term.lower() in u["username"].lower() or
-                              search_term.lower() in u["email"].lower()]
-        
-        if min_conversations > 0:
-            filtered_users = [u for u in filtered_users if u["conversations"] >= min_conversations]
-        
+        if "reset_job" in st.session_state:
+            job = jobs.get_job(st.session_state.reset_job)
+            if job["status"] in ("queued", "running"):
+                show_job_progress("reset_job", f"Resetting data for {st.session_state.reset_username}...")
+            else:
+                # The reset ran in a worker process: drop this server's cached copies of the user's data
+                bump_generation(st.session_state.reset_username, "journal", "vectorstore")
+                if job["status"] == "done":
+                    st.success(f"Data reset for {st.session_state.reset_username}!")
+                else:
+                    st.error(f"Resetting data for {st.session_state.reset_username} failed.")
+                del st.session_state.reset_job
+
         # Display user table
         if filtered_users:
             for user in filtered_users:
@@ -1230,18 +580,12 @@ def show_admin_dashboard():
                             col_confirm_yes, col_confirm_no = st.columns(2)
                             with col_confirm_yes:
                                 if st.button(f"Yes, Reset", key=f"confirm_reset_{user['username']}", use_container_width=True):
-                                    # Clear user's journal
-                                    journal_path = get_user_file_path(user['username'], "journal.json")
-                                    if os.path.exists(journal_path):
-                                        os.remove(journal_path)
-                                        # Also remove vectorstore if it exists
-                                        vectorstore_path = get_user_file_path(user['username'], "faiss_index")
-                                        if os.path.exists(vectorstore_path):
-                                            import shutil
-                                            shutil.rmtree(vectorstore_path) # Remove directory for FAISS
-                                        
+                                    # Journal, search index, custom quotes and audio are removed by a background job;
+                                    # entries still queued in this process are written first so none land after it
+                                    storage.flush_user_journals(user['username'])
+                                    st.session_state.reset_job = jobs.submit("reset_user", {"username": user['username']}, username=user['username'])
+                                    st.session_state.reset_username = user['username']
                                     log_admin_activity("User Data Reset", f"Reset data for {user['username']}")
-                                    st.success(f"Data reset for {user['username']}!")
                                     st.session_state[confirm_key] = False  # Reset confirmation flag
                                     st.rerun()
                             with col_confirm_no:
@@ -1260,16 +604,43 @@ def show_admin_dashboard():
     # System Analytics
     st.markdown("<h2> System Analytics</h2>", unsafe_allow_html=True)
     with st.container(border=True): # Wrap system analytics in a container
+        # Full-history aggregates from the fleet analytics job; the user index's totals until its first run
+        fleet = analytics.cached()
+        running = jobs.active_jobs("fleet_analytics")
+        if "analytics_job" not in st.session_state and running:
+            st.session_state.analytics_job = running[0]["id"]
+        col_caption, col_refresh = st.columns([3, 1])
+        with col_refresh:
+            refresh_clicked = st.button("Refresh Analytics", key="refresh_analytics_btn", use_container_width=True,
+                                        disabled="analytics_job" in st.session_state)
+        last_run = jobs.latest_job("fleet_analytics")
+        auto_refresh = (fleet is None or fleet["due"]) and not (last_run and last_run["status"] == "failed")
+        if "analytics_job" not in st.session_state and (refresh_clicked or auto_refresh):
+            st.session_state.analytics_job = jobs.submit("fleet_analytics", {})
+        if "analytics_job" in st.session_state:
+            job = jobs.get_job(st.session_state.analytics_job)
+            if job["status"] in ("queued", "running"):
+                show_job_progress("analytics_job", "Streaming every journal...")
+            else:
+                del st.session_state.analytics_job
+                if job["status"] == "done":
+                    fleet = analytics.cached()
+                else:
+                    st.error("Computing analytics failed; see the job log.")
+        with col_caption:
+            if fleet is not None:
+                computed = datetime.datetime.fromtimestamp(fleet["computed_at"]).strftime("%Y-%m-%d %H:%M")
+                st.caption(f"{fleet['entries']} entries from {fleet['users']} journals, computed {computed} "
+                           f"in {fleet['seconds']}s by {fleet['workers'] or 1} processes"
+                           + (" · journals have changed since" if fleet["stale"] else ""))
+            else:
+                st.caption("Showing index totals until the first full analytics run finishes.")
+
         col1_analytics, col2_analytics = st.columns(2) # Renamed columns
         
         with col1_analytics:
             st.markdown("<h4>Emotion Distribution (All Users)</h4>", unsafe_allow_html=True)
-            # Aggregate all emotions
-            all_emotions = {}
-            for user in stats["user_details"]:
-                for emotion, count in user['emotions_breakdown'].items():
-                    all_emotions[emotion] = all_emotions.get(emotion, 0) + count
-            
+            all_emotions = fleet["emotion_counts"] if fleet is not None else stats["emotion_totals"]
             if all_emotions:
                 emotion_chart_data = [{"emotion": emotion.capitalize(), "count": count}
                                       for emotion, count in all_emotions.items()]
@@ -1289,20 +660,8 @@ def show_admin_dashboard():
         
         with col2_analytics:
             st.markdown("<h4>User Activity Levels</h4>", unsafe_allow_html=True)
-            activity_levels = {"Inactive (0)": 0, "Light (1-5)": 0, "Moderate (6-20)": 0, "Heavy (21+)": 0}
-            
-            for user in stats["user_details"]:
-                conv_count = user["conversations"]
-                if conv_count == 0:
-                    activity_levels["Inactive (0)"] += 1
-                elif conv_count <= 5:
-                    activity_levels["Light (1-5)"] += 1
-                elif conv_count <= 20:
-                    activity_levels["Moderate (6-20)"] += 1
-                else:
-                    activity_levels["Heavy (21+)"] += 1
-            
-            activity_data = [{"level": level, "users": count} for level, count in activity_levels.items()]
+            levels = fleet["activity_levels"] if fleet is not None else stats["activity_levels"]
+            activity_data = [{"level": level, "users": count} for level, count in levels.items()]
             
             if activity_data:
                 activity_chart = alt.Chart(pd.DataFrame(activity_data)).mark_arc(outerRadius=120, innerRadius=80).encode( # Donut chart
@@ -1317,7 +676,187 @@ def show_admin_dashboard():
                 st.altair_chart(activity_chart, use_container_width=True)
             else:
                 st.info("No user activity data to display.")
+
+        if fleet is not None and fleet["daily"]:
+            st.markdown("<h4>Conversations per Day</h4>", unsafe_allow_html=True)
+            daily_chart = alt.Chart(pd.DataFrame(analytics.daily_rows(fleet))).mark_area(
+                opacity=0.6, color="#5d6dbe"
+            ).encode(
+                x=alt.X('date:T', title='Date'),
+                y=alt.Y('entries:Q', title='Journal Entries'),
+                tooltip=[alt.Tooltip('date:T'), 'entries:Q', alt.Tooltip('users:Q', title='Active users')]
+            ).interactive()
+            st.altair_chart(daily_chart, use_container_width=True)
     
+    # Per-stage turn latency for this worker process
+    st.markdown("<h2> System Performance</h2>", unsafe_allow_html=True)
+    with st.container(border=True):
+        stage_stats = metrics.stage_summary()
+        if stage_stats:
+            perf_df = pd.DataFrame([{
+                "Stage": row["stage"],
+                "Calls": row["count"],
+                "Mean (ms)": round(row["mean_ms"], 1),
+                "p50 (ms)": round(row["p50_ms"], 1),
+                "p95 (ms)": round(row["p95_ms"], 1),
+                "p99 (ms)": round(row["p99_ms"], 1),
+            } for row in stage_stats])
+            st.dataframe(perf_df, hide_index=True, use_container_width=True)
+            st.caption("Percentiles are histogram bucket upper bounds for this worker process since it started.")
+            turns = next((row["count"] for row in stage_stats if row["stage"] == "turn_total"), 0)
+            passes = metrics.counters("turn_forward_passes_")
+            if turns and passes:
+                per_turn = ", ".join(f"{name[len('turn_forward_passes_'):]} {count / turns:.2f}"
+                                     for name, count in sorted(passes.items()))
+                st.caption(f"Model forward passes per turn: {per_turn} (quote embeddings are cached after their first turn).")
+        elif not metrics.ENABLED:
+            st.info("Instrumentation is disabled (DILBOT_METRICS=0).")
+        else:
+            st.info("No conversation turns recorded by this worker yet.")
+
+        hedging = hedge_stats()
+        if hedging["calls"]:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("LLM Calls", hedging["calls"])
+            with col2:
+                st.metric("Hedged", f"{hedging['hedge_rate']:.1%}",
+                          help=f"{hedging['hedged']} slow, {hedging['fallbacks']} failed primary calls")
+            with col3:
+                st.metric("Secondary Wins", f"{hedging['secondary_win_rate']:.0%}")
+            with col4:
+                st.metric("Time Saved", f"~{hedging['saved_seconds']:.0f} s",
+                          help="Lower bound: the primary's usual streaming time, for each call the secondary won "
+                               "while the primary had not started answering")
+            if hedging["failures"]:
+                st.caption(f"{hedging['failures']} LLM calls failed on both models.")
+
+    # Memory attribution for this worker process
+    st.markdown("<h2> Memory</h2>", unsafe_allow_html=True)
+    with st.container(border=True):
+        memory = memory_profile.report()
+        memory_profile.publish(memory)
+        sessions = memory["sessions"]
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Worker RSS", f"{memory['rss_bytes'] / 2**20:.0f} MB", help=f"Process {memory['pid']}")
+        with col2:
+            st.metric("Active Sessions", len(sessions))
+        with col3:
+            st.metric("Session State", f"{sum(s['bytes'] for s in sessions.values()) / 2**20:.1f} MB",
+                      help=f"Sampled at most every {memory_profile.SESSION_SAMPLE_SECONDS} s per session")
+
+        if memory["loads"]:
+            loads_df = pd.DataFrame([{
+                "Loaded": name,
+                "RSS Delta (MB)": round(load["rss_delta"] / 2**20, 1),
+                "Load Time (s)": round(load["seconds"], 2),
+                "At": datetime.datetime.fromtimestamp(load["loaded_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+            } for name, load in memory["loads"].items()]).sort_values("RSS Delta (MB)", ascending=False)
+            st.dataframe(loads_df, hide_index=True, use_container_width=True)
+        caches_df = pd.DataFrame([{
+            "Cache": name,
+            "Entries": cache["entries"],
+            "MB": round(cache["bytes"] / 2**20, 2) if cache["bytes"] is not None else None,
+        } for name, cache in memory["caches"].items()])
+        if not caches_df.empty:
+            st.dataframe(caches_df, hide_index=True, use_container_width=True)
+        if sessions:
+            sessions_df = pd.DataFrame([{
+                "User": session["username"] or "(not logged in)",
+                "State (MB)": round(session["bytes"] / 2**20, 2),
+                "Largest Keys": ", ".join(f"{key} ({size / 2**20:.1f} MB)" for key, size in session["largest"]),
+            } for session in sessions.values()]).sort_values("State (MB)", ascending=False)
+            st.dataframe(sessions_df, hide_index=True, use_container_width=True)
+
+        # Allocation tracing slows the worker down, so it only runs while someone is looking
+        col_trace, col_snapshot = st.columns(2)
+        with col_trace:
+            if memory["tracing"]:
+                if st.button("Stop Allocation Tracing", key="stop_tracing_btn", use_container_width=True):
+                    memory_profile.stop_tracing()
+                    st.session_state.pop("memory_snapshot", None)
+                    st.rerun()
+            elif st.button("Start Allocation Tracing", key="start_tracing_btn", use_container_width=True):
+                memory_profile.start_tracing()
+                log_admin_activity("Memory Tracing", "Started tracemalloc")
+                st.rerun()
+        with col_snapshot:
+            if memory["tracing"] and st.button("Take Snapshot", key="memory_snapshot_btn", use_container_width=True):
+                st.session_state.memory_snapshot = memory_profile.snapshot()
+        if st.session_state.get("memory_snapshot"):
+            snapshot_df = pd.DataFrame([{
+                "Location": stat["location"],
+                "KB": round(stat["bytes"] / 1024, 1),
+                "Growth (KB)": round(stat["growth"] / 1024, 1) if stat["growth"] is not None else None,
+                "Blocks": stat["blocks"],
+            } for stat in st.session_state.memory_snapshot])
+            st.dataframe(snapshot_df, hide_index=True, use_container_width=True)
+            st.caption("Growth is measured against the previous snapshot.")
+        elif not memory_profile.ENABLED:
+            st.info("Memory profiling is disabled (DILBOT_MEMORY_PROFILE=0).")
+
+    # Disk usage per user and artifact type, from the last storage scan
+    st.markdown("<h2> Storage</h2>", unsafe_allow_html=True)
+    with st.container(border=True):
+        usage = storage_manager.load_usage_report()
+        col_refresh, col_gc = st.columns(2)
+        with col_refresh:
+            if st.button("Refresh Usage", key="refresh_usage_btn", use_container_width=True) or usage is None:
+                usage = storage_manager.usage_report()
+        with col_gc:
+            if st.button("Run Cleanup Now", key="storage_gc_btn", use_container_width=True):
+                st.session_state.gc_job = jobs.submit("storage_gc", {})
+                log_admin_activity("Storage Cleanup", "Started garbage collection")
+
+        if "gc_job" in st.session_state:
+            job = jobs.get_job(st.session_state.gc_job)
+            if job["status"] in ("queued", "running"):
+                show_job_progress("gc_job", "Looking for stale files...")
+            else:
+                del st.session_state.gc_job
+                usage = storage_manager.load_usage_report()
+                if job["status"] == "done":
+                    st.success(f"Cleanup removed {len(job['result']['removed'])} items and freed "
+                               f"{job['result']['freed_bytes'] / 2**20:.1f} MB.")
+                else:
+                    st.error("Cleanup failed; see the job log.")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total on Disk", f"{usage['total'] / 2**20:.1f} MB")
+        with col2:
+            quota = usage["quota_bytes"]
+            over = sum(1 for user in usage["users"].values() if quota and user["total"] > quota)
+            st.metric("Users Over Quota", over, help=f"Quota: {quota / 2**20:.0f} MB per user" if quota else "No quota set")
+        with col3:
+            last_gc = usage.get("last_gc")
+            st.metric("Last Cleanup", last_gc["ran_at"][:16] if last_gc else "Never",
+                      help=f"Freed {last_gc['freed_bytes'] / 2**20:.1f} MB" if last_gc else None)
+
+        by_type = {**usage["by_artifact"], **{f"shared: {name}": size for name, size in usage["shared"].items()}}
+        if by_type:
+            type_df = pd.DataFrame([{"Artifact": name, "MB": size / 2**20} for name, size in by_type.items()])
+            type_chart = alt.Chart(type_df).mark_bar().encode(
+                x=alt.X("MB:Q", title="MB"),
+                y=alt.Y("Artifact:N", sort="-x", title=None),
+                tooltip=["Artifact", alt.Tooltip("MB:Q", format=".2f")]
+            ).properties(height=260, title="Disk Usage by Artifact Type")
+            st.altair_chart(type_chart, use_container_width=True)
+
+        if usage["users"]:
+            user_usage_df = pd.DataFrame([{
+                "User": username,
+                "Total (MB)": round(user["total"] / 2**20, 2),
+                "Journal (MB)": round(user["artifacts"].get("journal", 0) / 2**20, 2),
+                "Quotes (MB)": round(user["artifacts"].get("vectorstore", 0) / 2**20, 2),
+                "Search Index (MB)": round(user["artifacts"].get("journal_index", 0) / 2**20, 2),
+                "Quota Used": f"{user['quota_used']:.0%}" if user["quota_used"] is not None else "-",
+            } for username, user in usage["users"].items()]).sort_values("Total (MB)", ascending=False)
+            st.dataframe(user_usage_df, hide_index=True, use_container_width=True)
+        gc_note = f" Cleanup also runs automatically every {jobs.GC_INTERVAL_HOURS:g} hours." if jobs.SCHEDULE else ""
+        st.caption(f"Measured {usage['generated_at'][:19]}.{gc_note}")
+
     # Admin logs
     st.markdown("<h2> Admin Activity Logs</h2>", unsafe_allow_html=True)
     with st.container(border=True): # Wrap admin logs in a container
@@ -1340,24 +879,43 @@ def show_admin_dashboard():
         
         with col1_export:
             st.markdown("<h4>Export Application Data</h4>", unsafe_allow_html=True)
-            if st.button("Export All Data (JSON)", key="export_data_btn", use_container_width=True):
-                export_data = {
-                    "export_timestamp": str(datetime.datetime.now()),
-                    "statistics": stats,
-                    "admin_logs": admin_logs
-                }
-                
-                st.download_button(
-                    label="Download Exported Data",
-                    data=json.dumps(export_data, indent=4),
-                    file_name=f"dilbot_admin_export_{datetime.date.today().isoformat()}.json",
-                    mime="application/json",
-                    key="download_export_btn",
-                    use_container_width=True
-                )
-                
-                log_admin_activity("Data Export", "Initiated data export")
-                st.success("Data export ready for download!")
+            last_export = load_export_state().get("last_export")
+            incremental_export = st.checkbox(
+                f"Only users changed since last export ({last_export[:19]})" if last_export else "Only users changed since last export",
+                key="incremental_export", disabled=not last_export
+            )
+            if st.button("Export All Data (NDJSON zip)", key="export_data_btn", use_container_width=True):
+                # The export job only sees disk: write this process's queued entries first
+                # (other processes' late writes are covered by the export's overlap window)
+                storage.flush_user_journals()
+                st.session_state.export_job = jobs.submit("export", {"incremental": incremental_export})
+                st.session_state.pop("export_result", None)
+
+            if "export_job" in st.session_state:
+                job = jobs.get_job(st.session_state.export_job)
+                if job["status"] in ("queued", "running"):
+                    show_job_progress("export_job", "Streaming user profiles and journals to the export archive...")
+                else:
+                    del st.session_state.export_job
+                    if job["status"] == "failed":
+                        st.error("The export failed. Please try again.")
+                    else:
+                        summary = job["result"]["summary"]
+                        log_admin_activity("Data Export", f"Exported {summary['users']} users, {summary['journal_entries']} journal entries")
+                        st.session_state.export_result = job["result"]
+
+            if "export_result" in st.session_state:
+                archive_path = st.session_state.export_result["path"]
+                with open(archive_path, "rb") as archive_file:
+                    st.download_button(
+                        label="Download Exported Data",
+                        data=archive_file,
+                        file_name=os.path.basename(archive_path),
+                        mime="application/zip",
+                        key="download_export_btn",
+                        use_container_width=True
+                    )
+                st.success(f"Data export ready for download! Saved to `{archive_path}`")
         
         with col2_export:
             st.markdown("<h4>Clear Admin Activity Logs</h4>", unsafe_allow_html=True)
@@ -1395,14 +953,6 @@ def show_admin_dashboard():
 
     st.markdown("<p class='footer-caption'>DilBot Admin Panel | Built by Members of CSG Hackathon Team</p>", unsafe_allow_html=True)
             
-def speak(text, username):
-    """Generate and play audio response"""
-    tts = gTTS(text=text, lang='en')
-    audio_path = get_user_file_path(username, "response.mp3")
-    tts.save(audio_path)
-    st.audio(audio_path, format="audio/mp3")
-
-
 def transcribe_audio_file(uploaded_audio):
     """Transcribe uploaded audio file"""
     recognizer = sr.Recognizer()
@@ -1420,13 +970,6 @@ def show_main_app():
 
     st.set_page_config(page_title="DilBot - Emotional AI", page_icon="🧠", layout="wide")
 
-    
-    quote_categories = {
-        "Grief": ["Grief is the price we pay for love.", "Tears are the silent language of grief.", "What we have once enjoyed we can never lose; all that we love deeply becomes a part of us."],
-        "Motivation": ["Believe in yourself and all that you are.", "Tough times never last, but tough people do.", "The only way to do great work is to love what you do."],
-        "Healing": ["Every wound has its own time to heal.", "It's okay to take your time to feel better.", "Healing is not linear, and that's perfectly okay."],
-        "Relationships": ["The best relationships are built on trust.", "Love is not about possession but appreciation.", "Healthy relationships require both people to show up authentically."]
-    }
 
     # ---  CUSTOM CSS  ---
     st.markdown("""
@@ -1925,6 +1468,7 @@ def show_main_app():
         if st.button("Logout", key="logout_btn", use_container_width=True):
             st.session_state.authenticated = False
             st.session_state.username = None
+            st.session_state.memory_owner = None
             st.rerun()
 
     # Input section wrapped in a styled container
@@ -1934,7 +1478,7 @@ def show_main_app():
         with col1:
             # Reverting to direct st.selectbox with a visible label
             st.markdown(" **Choose a quote theme:**") # Custom label for the selectbox
-            selected_category = st.selectbox("Select Quote Theme", list(quote_categories.keys()), label_visibility="collapsed") # Original label hidden
+            selected_category = st.selectbox("Select Quote Theme", list(QUOTE_CATEGORIES.keys()), label_visibility="collapsed") # Original label hidden
             # The custom markdown above provides the visual label, while the st.selectbox's internal label is hidden.
 
         with col2:
@@ -1958,17 +1502,48 @@ def show_main_app():
     vectorstore = None
 
     if uploaded_quotes:
-        custom_quotes = uploaded_quotes.read().decode("utf-8").splitlines()
-        custom_quotes = [quote.strip() for quote in custom_quotes if quote.strip()]
-        vectorstore = build_user_vectorstore(username, custom_quotes)
-        current_quotes = custom_quotes
-        st.success(f" {len(custom_quotes)} custom quotes uploaded and saved!")
-    else:
-        default_quotes = quote_categories[selected_category]
-        vectorstore = load_user_vectorstore(username)
-        if vectorstore is None:
-            vectorstore = build_user_vectorstore(username, default_quotes)
-        current_quotes = default_quotes
+        # The uploader keeps its file across reruns; only ingest a given upload once
+        upload_key = (uploaded_quotes.name, uploaded_quotes.size)
+        if st.session_state.get("ingested_upload") != upload_key:
+            st.session_state.ingested_upload = upload_key
+            # The new store replaces the old one, so only the rest of the user's data counts
+            allowed, quota_message = storage_manager.check_quota(
+                username,
+                storage_manager.estimate_quote_store_bytes(uploaded_quotes.size, count_lines(uploaded_quotes)),
+                replacing=("vectorstore",)
+            )
+            if allowed:
+                st.session_state.ingest_job = jobs.submit(
+                    "ingest_quotes",
+                    {"username": username, "path": jobs.save_upload(username, uploaded_quotes)},
+                    username=username
+                )
+            else:
+                st.error(f"{quota_message} Please upload a smaller quote file.")
+
+        if "ingest_job" in st.session_state:
+            job = jobs.get_job(st.session_state.ingest_job)
+            if job["status"] in ("queued", "running"):
+                # Embedding runs in a worker process; until it is done the previous quotes are used
+                show_job_progress("ingest_job", "Embedding your quotes...")
+            else:
+                del st.session_state.ingest_job
+                bump_generation(username, "vectorstore")  # written by a worker process
+                ingest_stats = (job["result"] or {}).get("stats")
+                if job["status"] == "failed":
+                    st.error("Your quotes could not be processed. Please try uploading the file again.")
+                elif job["result"]["saved"]:
+                    st.success(f" {ingest_stats['added']} custom quotes uploaded and saved! "
+                               f"({ingest_stats['duplicates']} duplicates and {ingest_stats['too_long']} overlong lines skipped)")
+                else:
+                    st.warning("No usable quotes found in the uploaded file.")
+
+        if "ingest_job" not in st.session_state:
+            vectorstore = get_user_cache(username).user_vectorstore()
+
+    if vectorstore is None and not API_URL:
+        # Previously uploaded custom quotes, if any; otherwise the shared category index
+        vectorstore, current_quotes = get_user_cache(username).quote_source(selected_category)
 
     # Input area for user message
     st.markdown("<h3>What's on your mind?</h3>", unsafe_allow_html=True)
@@ -1990,33 +1565,34 @@ def show_main_app():
         if not final_input:
             st.warning(" Please enter something to share or upload a voice message.")
         else:
+            turn_started = time.perf_counter()
             with st.spinner("DilBot is thinking and feeling..."):
-                # Emotion detection 
-                emotion, score = detect_emotion(final_input)
-
-                # Get AI response
-                prompt_template = PromptTemplate(
-                    input_variables=["context", "user_input", "username"],
-                    template="""You are DilBot, an empathetic emotional support AI companion for {username}.
-Use the following emotional quote context to respond gently, supportively, and personally.
-Context quotes:
-{context}
-User's message:
-{user_input}
-Respond as DilBot with warmth, empathy, and understanding. Keep it conversational and supportive."""
-                )
-
-                # Get similar quotes (ORIGINAL LOGIC - NO CHANGE)
-                similar_docs = vectorstore.similarity_search(final_input, k=2)
-                context = "\n".join([doc.page_content for doc in similar_docs])
-
-                # Generate response (ORIGINAL LOGIC - NO CHANGE)
-                groq_llm = ChatGroq(api_key=GROQ_API_KEY, model="llama3-70b-8192")
-                chain = LLMChain(llm=groq_llm, prompt=prompt_template)
-                response = chain.run(context=context, user_input=final_input, username=username)
-
-                # Save to user's journal (ORIGINAL LOGIC - NO CHANGE)
-                save_user_journal(username, final_input, emotion, score, response)
+                if API_URL:
+                    try:
+                        result = get_api_client().turn(final_input, category=selected_category)
+                        bump_generation(username, "journal")  # the API wrote the journal entry
+                    except APIError as e:
+                        st.error(f"DilBot is unavailable right now: {e.message}")
+                        st.stop()
+                else:
+                    # Speech is synthesized by a background job so the reply shows without waiting for it
+                    queue_notice = st.empty()
+                    try:
+                        result = process_turn(
+                            username, final_input, vectorstore, current_quotes, make_llm(),
+                            memory=get_conversation_memory(username), synthesize=None,
+                            on_queue=lambda position: queue_notice.info(
+                                f"DilBot is talking with other people right now. You're #{position} in line...")
+                        )
+                    except RateLimited as e:
+                        st.warning(f"You're sending messages faster than DilBot can answer. "
+                                   f"Take a breath and try again in {e.retry_after:.0f} seconds.")
+                        st.stop()
+                    except QueueTimeout:
+                        st.error("DilBot is very busy right now. Please try again in a minute.")
+                        st.stop()
+                    queue_notice.empty()
+                emotion, score, response = result["emotion"], result["score"], result["response"]
 
                 # Display results with new chat bubble styling
                 st.markdown("<h3 class='chat-title'>DilBot's Conversation:</h3>", unsafe_allow_html=True)
@@ -2030,18 +1606,15 @@ Respond as DilBot with warmth, empathy, and understanding. Keep it conversationa
                                     <p class="black-text">
                     <strong>Emotion Detected:</strong> {emotion.capitalize()} ({round(score*100)}% confidence)</p></div> """,unsafe_allow_html=True
                                 )
+                    if result.get("emotion_profile"):
+                        st.caption(format_emotion_profile(result["emotion_profile"]))
 
-                    if is_crisis(final_input):
+                    if result["crisis"]:
                         st.error(" Crisis detected! Please reach out to a mental health professional immediately. "
                                  "You are not alone. Consider contacting a helpline like the National Suicide Prevention Lifeline (988 in the US) or a local emergency service.")
 
-                    if current_quotes:
-                        model = SentenceTransformer("all-MiniLM-L6-v2")
-                        quote_embeddings = model.encode(current_quotes, convert_to_tensor=True)
-                        user_embedding = model.encode(final_input, convert_to_tensor=True)
-                        sims = util.pytorch_cos_sim(user_embedding, quote_embeddings)[0]
-                        best_match = sims.argmax().item()
-                        selected_quote = current_quotes[best_match]
+                    selected_quote = result["selected_quote"]
+                    if selected_quote:
                         #st.info(f" **Quote for you:** *{selected_quote}*")
                         st.markdown(f"""<div class="custom-info-box"><span class="info-icon">&#x2139;</span><p class="info-text">
                         <strong>Quote for you:</strong> {selected_quote}</p> </div> """, unsafe_allow_html=True)
@@ -2049,8 +1622,12 @@ Respond as DilBot with warmth, empathy, and understanding. Keep it conversationa
                     # DilBot's response presented in a chat bubble
                     st.markdown(f"<div class='bot-message-container'><div class='bot-message'>DilBot: {response}</div></div>", unsafe_allow_html=True)
 
-                    speak(response, username)
+                    if API_URL:
+                        st.audio(result["audio"], format="audio/mp3")
+                    else:
+                        play_when_ready(jobs.submit("tts", {"username": username, "text": response}, username=username))
                     st.session_state.transcribed_text = ""
+            metrics.observe("turn_total", time.perf_counter() - turn_started)
 
             # Add a visual separator after each conversation turn (optional)
             st.markdown("<div class='chat-separator'></div>", unsafe_allow_html=True)
@@ -2060,24 +1637,22 @@ Respond as DilBot with warmth, empathy, and understanding. Keep it conversationa
     st.markdown("---")
     st.header(" Your Personal Dashboard")
 
-    # Load user's journal
-    journal_data = load_user_journal(username)
+    # Load user's journal (cached for the session until it changes)
+    user_cache = get_user_cache(username)
+    aggregates = user_cache.aggregates()
 
-    if journal_data:
+    if aggregates["total"]:
         # Statistics
         st.subheader(" Your Emotional Statistics") # Moved statistics to the top of dashboard for prominence
         with st.container(border=True):
             col1, col2, col3 = st.columns(3)
             with col1:
-                st.metric("Total Conversations", len(journal_data))
+                st.metric("Total Conversations", aggregates["total"])
             with col2:
-                emotions = [entry['emotion'] for entry in journal_data]
-                most_common = max(set(emotions), key=emotions.count) if emotions else "None"
-                st.metric("Most Common Emotion", most_common.capitalize())
+                st.metric("Most Common Emotion", aggregates["most_common_emotion"].capitalize())
             with col3:
-                if journal_data:
-                    avg_confidence = sum(entry['confidence'] for entry in journal_data) / len(journal_data)
-                    st.metric("Avg. Confidence", f"{avg_confidence:.1f}%")
+                if aggregates["avg_confidence"] is not None:
+                    st.metric("Avg. Confidence", f"{aggregates['avg_confidence']:.1f}%")
                 else:
                     st.metric("Avg. Confidence", "N/A") # Handle case with no journal data for avg. confidence
 
@@ -2085,22 +1660,15 @@ Respond as DilBot with warmth, empathy, and understanding. Keep it conversationa
         # Mood tracker
         st.subheader(" Your Daily Mood Tracker")
         with st.container(border=True): # Wrap chart in a container
-            # Prepare data for chart 
-            df_data = []
-            for entry in journal_data:
-                df_data.append({
-                "date": entry["date"],
-                "emotion": entry["emotion"].capitalize(),
-                "confidence": entry["confidence"]
-                })
-            if df_data:
-                df_chart = pd.DataFrame(df_data) # Use pandas DataFrame for better Altair integration
+            # Chart data is prepared once per journal change
+            df_chart = aggregates["chart"]
+            if not df_chart.empty:
 
                 chart = alt.Chart(df_chart).mark_bar().encode(
                 x=alt.X('date:N', title='Date', sort=None), # Sort by date ensures correct order
-                y=alt.Y('count():Q', title='Frequency'),
+                y=alt.Y('sum(count):Q', title='Frequency'),
                 color=alt.Color('emotion:N', title='Emotion', scale=alt.Scale(range=['#4CAF50', '#FFC107', '#E74C3C', '#3498DB', '#9B59B6', '#1ABC9C'])), # Custom colors
-                tooltip=['date:N', 'emotion:N', 'count():Q']
+                tooltip=['date:N', 'emotion:N', alt.Tooltip('sum(count):Q', title='Count')]
                 ).properties(
                     height=350, # Slightly increased height
                     title="Your Emotional Journey Over Time"
@@ -2111,17 +1679,78 @@ Respond as DilBot with warmth, empathy, and understanding. Keep it conversationa
 
         # Recent conversations
         st.subheader("Recent Conversations")
-        recent_entries = journal_data[-5:] if len(journal_data) >= 5 else journal_data
+        recent_entries = user_cache.tail(5)
 
         with st.container(border=True): # Wrap recent conversations in a container
             if recent_entries:
                 for i, entry in enumerate(reversed(recent_entries)):
                     with st.expander(f"{entry['date']} - {entry['emotion'].capitalize()} ({round(entry['confidence'] * 100)}%)"): # Round confidence for display
                         st.markdown(f"**You said:** {entry['user_input']}")
+                        if entry.get("emotion_profile"):
+                            st.caption(format_emotion_profile(entry["emotion_profile"]))
                         st.markdown(f"**DilBot replied:** {entry['response']}")
             else:
                 st.info("No recent conversations yet. Start talking to DilBot!")
 
+        # Semantic search over the user's whole journal history
+        st.subheader("Find Past Conversations Like This")
+        with st.container(border=True):
+            search_query = st.text_input("Describe what you're looking for", key="journal_search_query",
+                                         placeholder="e.g. feeling stressed about exams")
+            col1, col2 = st.columns(2)
+            with col1:
+                date_range = st.date_input(
+                    "Date range",
+                    value=(datetime.date.fromisoformat(aggregates["first_date"]), datetime.date.today()),
+                    key="journal_search_dates"
+                )
+            with col2:
+                emotion_filter = st.multiselect(
+                    "Emotions",
+                    aggregates["emotion_options"],
+                    key="journal_search_emotions"
+                )
+
+            if st.button("Search Journal", key="journal_search_btn", use_container_width=True) and search_query.strip():
+                index_dir = get_user_file_path(username, "journal_index")
+                # Entries saved before the index existed are embedded once, then never again
+                # (the index covers the full history, archived months included)
+                if journal_index.entry_count(index_dir) < aggregates["total"]:
+                    journal_index.backfill(index_dir, get_user_file_path(username, "journal.json"), encode_text)
+
+                start_date, end_date = (date_range if len(date_range) == 2 else (None, None))
+                matches = journal_index.search(
+                    index_dir,
+                    encode_text(search_query.strip()),
+                    k=5,
+                    start_date=start_date,
+                    end_date=end_date,
+                    emotions=emotion_filter
+                )
+                if matches:
+                    for match in matches:
+                        with st.expander(f"{match['date']} - {match['emotion'].capitalize()} (similarity {match['similarity']:.2f})"):
+                            st.markdown(f"**You said:** {match['user_input']}")
+                            st.markdown(f"**DilBot replied:** {match['response']}")
+                else:
+                    st.info("No past conversations match your search.")
+
+        # Older months live in the compressed archive; opened only when asked for
+        journal_path = get_user_file_path(username, "journal.json")
+        archived_months = user_cache.archived_months()
+        if archived_months:
+            with st.expander(f"Archived Conversations ({sum(m['entries'] for m in archived_months.values())})"):
+                month = st.selectbox("Month", sorted(archived_months, reverse=True), key="archive_month")
+                if st.button("Show Month", key="archive_show_btn"):
+                    for entry in journal_archive.iter_archived_month(journal_path, month):
+                        st.markdown(f"**{entry['date']} - {entry['emotion'].capitalize()}**")
+                        st.markdown(f"**You said:** {entry['user_input']}")
+                        st.markdown(f"**DilBot replied:** {entry['response']}")
+                with open(journal_archive.segment_path(journal_path, month), "rb") as f:
+                    st.download_button(f"Download {month} ({archived_months[month]['bytes'] / 1024:.0f} KB, gzip NDJSON)",
+                                       f, file_name=f"dilbot_journal_{month}.ndjson.gz",
+                                       mime="application/gzip", key="archive_download_btn")
+
     else:
         st.markdown("""   <div style="background-color: #2c3e50;
             border-left: 6px solid #64b5f6;
@@ -2142,11 +1771,9 @@ Respond as DilBot with warmth, empathy, and understanding. Keep it conversationa
 
     st.markdown("---")
     st.markdown("<p class='footer-caption'>Built by Members of CSG Hackathon Team | Your data is stored privately and securely</p>", unsafe_allow_html=True)
-# Main app logic
+# Main app logic (unauthenticated sessions stopped at the login page above)
 def main():
-    if not st.session_state.authenticated:
-        show_auth_page()
-    elif st.session_state.is_admin:
+    if st.session_state.is_admin:
         show_admin_dashboard()
     else:
         show_main_app()
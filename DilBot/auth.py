@@ -0,0 +1,126 @@
+# Accounts: the users file, password hashing, signup and login.
+#
+# Standard library only (plus user_index, which is sqlite3), so the login page
+# can be served without importing torch, transformers, LangChain or the journal
+# store. The users file is parsed once and kept until its mtime or size
+# changes, so a login or a "username taken" check is a dict lookup rather than
+# a JSON parse of every account.
+import os, re, json, hashlib, datetime, threading
+import user_index
+
+# Admin configuration
+ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")  # Set in HF Spaces secrets
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")  # Set in HF Spaces secrets
+
+EMAIL_PATTERN = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+MIN_PASSWORD_LENGTH = 6
+
+_users_cache = {"entry": (None, {})}  # (path, mtime, size) and the parsed file, swapped as one value
+_users_lock = threading.Lock()  # one signup writes the users file at a time
+
+
+def hash_password(password):
+    """Hash password using SHA-256 with salt"""
+    salt = "dilbot_secure_salt_2024"  # You can change this
+    return hashlib.sha256((password + salt).encode()).hexdigest()
+
+def get_secure_users_path():
+    """Get path to users file in a hidden directory"""
+    secure_dir = ".secure_data"
+    os.makedirs(secure_dir, exist_ok=True)
+    return os.path.join(secure_dir, "users_encrypted.json")
+
+def _cached_users():
+    """The parsed users file, re-read only when it has changed on disk (shared; do not modify)"""
+    users_path = get_secure_users_path()
+    try:
+        info = os.stat(users_path)
+    except FileNotFoundError:
+        return {}
+    stamp = (os.path.abspath(users_path), info.st_mtime_ns, info.st_size)
+    cached_stamp, users = _users_cache["entry"]
+    if cached_stamp != stamp:
+        try:
+            with open(users_path, "r") as f:
+                users = json.load(f)
+        except (OSError, ValueError):
+            users = {}
+        _users_cache["entry"] = (stamp, users)
+    return users
+
+def load_users():
+    """Load users from secure file"""
+    return dict(_cached_users())
+
+def get_user(username):
+    """One account record, or None"""
+    return _cached_users().get(username)
+
+def username_exists(username):
+    return username in _cached_users()
+
+def save_users(users):
+    """Save users to secure file"""
+    users_path = get_secure_users_path()
+    with open(users_path + ".partial", "w") as f:
+        json.dump(users, f, indent=4)
+    os.replace(users_path + ".partial", users_path)  # readers never see a half-written file
+
+def get_user_file_path(username, filename):
+    """Get path to user-specific file"""
+    user_dir = f"users/{username}"
+    return os.path.join(user_dir, filename)
+
+def create_user_directory(username):
+    """Create user-specific directory structure"""
+    user_dir = f"users/{username}"
+    os.makedirs(user_dir, exist_ok=True)
+    return user_dir
+
+def validate_signup(username, password, email, confirm=None):
+    """First problem with a signup form, or None"""
+    if not all([username, password, email]) or confirm is not None and not confirm:
+        return "Please fill in all fields"
+    if confirm is not None and password != confirm:
+        return "Passwords don't match!"
+    if len(password) < MIN_PASSWORD_LENGTH:
+        return f"Password must be at least {MIN_PASSWORD_LENGTH} characters long!"
+    if not EMAIL_PATTERN.match(email):
+        return "Invalid email format"
+    return None
+
+def signup(username, password, email):
+    """Register new user"""
+    if username_exists(username):
+        return False, "Username already exists"
+    if not EMAIL_PATTERN.match(email):
+        return False, "Invalid email format"
+
+    with _users_lock:
+        users = load_users()  # re-checked under the lock: another signup may have just written
+        if username in users:
+            return False, "Username already exists"
+        users[username] = {
+            "password": hash_password(password),
+            "email": email,
+            "created_at": str(datetime.datetime.now())
+        }
+        save_users(users)
+    user_index.add_user(username, email, users[username]["created_at"])
+    create_user_directory(username)
+    return True, "Account created successfully!"
+
+def login(username, password):
+    """Authenticate user or admin"""
+    # Check if admin login
+    if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+        return True, "Admin login successful!", True
+
+    # Regular user login
+    user = get_user(username)
+    if user is None:
+        return False, "User not found.Please signup.", False
+
+    if user["password"] == hash_password(password):
+        return True, "Login successful!", False
+    return False, "Incorrect password", False
@@ -0,0 +1,400 @@
+# Login and signup page, served before app.py imports anything heavy.
+#
+# app.py shows this page and stops while a session is not authenticated, so a
+# visitor who only logs in or signs up never loads torch, transformers,
+# LangChain or the journal store; those are imported on the first rerun after
+# login. Imports here stay at Streamlit, auth.py and the standard-library API
+# client, and the page injects only the styles it uses.
+import os
+import streamlit as st
+from auth import login, signup, validate_signup
+from api_client import DilBotClient
+
+# Optional remote backend (api.py): login, signup and turns go over HTTP instead of running here
+API_URL = os.getenv("DILBOT_API_URL")
+
+AUTH_STYLES = """
+        <style>
+        @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@300;400;600;700&display=swap');
+        @import url('https://fonts.googleapis.com/css2?family=Merriweather:wght@300;400;700&display=swap');
+        .stApp {
+            background: linear-gradient(135deg, #e0e7ff 0%, #c6e2ff 50%, #b0c4de 100%); /* Light blueish gradient */
+            background-size: cover;
+            background-position: center;
+            background-repeat: no-repeat;
+            background-attachment: fixed;
+            font-family: 'Montserrat', sans-serif;
+            color: #333; /* Default text color to dark for light background */
+        }
+        
+        h1, h2, h3, h4, h5, h6, .stMarkdown, label {
+            font-family: 'Merriweather', serif;
+            color: #1a237e; /* Darker blue for headings */
+        }
+        
+        /* Ensure text area label is dark */
+        .stTextArea > label {
+            color: #333 !important;
+        }
+        .stButton>button {
+            background-image: linear-gradient(to right, #6a11cb 0%, #2575fc 100%); /* Blue-purple gradient */
+            color: white;
+            border-radius: 8px;
+            border: none;
+            padding: 10px 20px;
+            font-size: 16px;
+            font-weight: bold;
+            transition: all 0.2s ease-in-out;
+            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        }
+        .stButton>button:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 6px 12px rgba(0, 0, 0, 0.2);
+        }
+        
+        /* Secondary button style for "Explore Opportunities" */
+        .secondary-button > button {
+            background-color: white;
+            color: #6a11cb;
+            border: 1px solid #6a11cb;
+            box-shadow: none;
+        }
+        .secondary-button > button:hover {
+            background-color: #f0f4f8; /* Light hover */
+            color: #2575fc;
+            box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
+        }
+        .stTextInput>div>div>input, .stTextArea>div>div>textarea, .stSelectbox>div>div>div {
+            border-radius: 8px;
+            border: 1px solid #b3e5fc; /* Light blue border */
+            padding: 10px;
+            background-color: rgba(255, 255, 255, 0.95); /* Nearly opaque white */
+            color: #333; /* Input text color dark */
+        }
+        /* Adjusted stSuccess and stInfo for white text on darker transparent black background */
+        .stSuccess { 
+            border-left: 5px solid #28a745; 
+            background-color: rgba(0, 0, 0, 0.6); /* Transparent black */
+            color: white; /* Make text white */
+            border-radius: 8px;
+            padding: 10px;
+            margin-bottom: 10px;
+        }
+        .stInfo { 
+            border-left: 5px solid #17a2b8; 
+            background-color: rgba(0, 0, 0, 0.6); /* Transparent black */
+            color: white; /* Make text white */
+            border-radius: 8px;
+            padding: 10px;
+            margin-bottom: 10px;
+        }
+        /* Keeping warning/error as original light background for now, as black transparent might not suit warnings well */
+        .stWarning { 
+            border-left: 5px solid #ffc107; 
+            background-color: rgba(255, 255, 255, 0.9); 
+            color: #333; 
+            border-radius: 8px;
+            padding: 10px;
+            margin-bottom: 10px;
+        }
+        .stError { 
+            border-left: 5px solid #dc3545; 
+            background-color: rgba(255, 255, 255, 0.9); 
+            color: #333; 
+            border-radius: 8px;
+            padding: 10px;
+            margin-bottom: 10px;
+        }
+        /* Custom container for content with blur background - used for auth form */
+        .auth-content-container {
+            background-color: rgba(255, 255, 255, 0.8); /* Slightly transparent white */
+            backdrop-filter: blur(8px); /* Blur effect */
+            border-radius: 15px;
+            padding: 30px;
+            margin: 20px auto;
+            max-width: 450px; /* Slimmer for auth forms */
+            box-shadow: 0 10px 25px rgba(0, 0, 0, 0.1);
+            text-align: center; /* Center content within */
+        }
+        
+        .feature-grid {
+            display: grid;
+            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); /* Adjusted for more flexibility */
+            gap: 20px;
+            margin-top: 30px;
+            margin-bottom: 30px;
+            max-width: 900px; /* Max width for the grid itself */
+            margin-left: auto;
+            margin-right: auto;
+        }
+        .feature-item {
+            background-color: rgba(255, 255, 255, 0.9);
+            border-radius: 12px;
+            padding: 20px;
+            text-align: center;
+            box-shadow: 0 4px 10px rgba(0, 0, 0, 0.08);
+            transition: transform 0.2s ease-in-out;
+            border: 1px solid #e0e0e0;
+        }
+        .feature-item:hover {
+            transform: translateY(-5px);
+            box-shadow: 0 8px 15px rgba(0, 0, 0, 0.12);
+        }
+        .feature-item .icon-img {
+            height: 60px; /* Adjust icon size as needed */
+            margin-bottom: 10px;
+            display: block; /* Ensure icon is on its own line */
+            margin-left: auto;
+            margin-right: auto;
+        }
+        .feature-item h3 {
+            font-size: 1.2em;
+            color: #1a237e;
+            margin-bottom: 8px;
+        }
+        .feature-item p {
+            font-size: 0.9em;
+            color: #555;
+            line-height: 1.5;
+        }
+        /* Navbar Styling */
+        .navbar {
+            display: flex;
+            justify-content: center; /* Center the logo and title */
+            align-items: center;
+            padding: 15px 40px;
+            background-color: rgba(255, 255, 255, 0.8); /* Slightly transparent white */
+            backdrop-filter: blur(5px);
+            border-bottom: 1px solid rgba(0, 0, 0, 0.05);
+            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
+            border-radius: 10px;
+            margin-bottom: 20px;
+            /* position: relative; Removed absolute positioning as logout button is gone */
+        }
+        .navbar-logo-container {
+            display: flex;
+            align-items: center;
+            justify-content: center; /* Center the logo and text */
+            flex-grow: 1; /* Allows it to take available space for centering */
+        }
+        .navbar-logo-text {
+            font-family: 'Merriweather', serif;
+            font-size: 24px;
+            font-weight: bold;
+            color: #1a237e;
+            margin-left: 10px; /* Space between logo image and text */
+        }
+        .navbar-logo-img {
+            height: 30px; /* Size of your logo image */
+            vertical-align: middle;
+        }
+        /* AI Powered Educational Platform banner style */
+        .ai-powered-banner {
+            display: inline-flex; /* Use inline-flex to shrink-wrap content */
+            align-items: center;
+            background-color: rgba(255, 255, 255, 0.7); /* Light, semi-transparent */
+            border-radius: 20px;
+            padding: 8px 15px;
+            margin-bottom: 20px;
+            font-size: 14px;
+            font-weight: 600;
+            color: #3f51b5; /* Blue text */
+            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
+            text-align: center; /* Ensure text is centered if container grows */
+            margin-left: auto; /* Center horizontally */
+            margin-right: auto; /* Center horizontally */
+        }
+        .centered-container {
+            display: flex;
+            justify-content: center;
+            width: 100%;
+        }
+        /* Override specific Streamlit elements that don't pick up general styles */
+        .st-emotion-cache-1jmve6n { /* This class is often for st.subheader */
+            color: #1a237e !important; /* Darker blue */
+        }
+        .st-emotion-cache-1gcs47q { /* This class can be for specific text elements */
+             color: #333 !important;
+        }
+        .st-emotion-cache-10q7f27 { /* Example for st.info text */
+             color: #333 !important;
+        }
+        /* Hide the top grey bar */
+        header.st-emotion-cache-1gh8zsi {
+            display: none !important;
+        }
+        div.st-emotion-cache-fis6y8 { 
+            padding-top: 0 !important;
+        }
+        div.st-emotion-cache-z5inrg { 
+            display: none !important;
+        }
+        /* Adjust overall container width */
+        .st-emotion-cache-fg4lbf { 
+            max-width: 1000px !important; /* Adjusted for wider layout */
+            padding-left: 0 !important; 
+            padding-right: 0 !important;
+        }
+        .block-container { 
+            padding-left: 1rem;
+            padding-right: 1rem;
+            color: #333; /* Default text color within block-container */
+        }
+        /* Specific style for button alignment */
+        /* Updated .button-row to stack and add spacing */
+        .button-row {
+            display: flex;
+            flex-direction: column; /* Stack buttons vertically */
+            align-items: center; /* Center buttons horizontally */
+            gap: 20px; /* Space between buttons */
+            margin-top: 20px;
+            width: 100%; /* Ensure row takes full width to center its content */
+        }
+        .button-row > div { /* Target Streamlit column divs within button-row if still used */
+            width: 100%; /* Make columns take full width to center buttons */
+            display: flex;
+            justify-content: center; /* Center the buttons inside their columns */
+        }
+        </style>
+"""
+
+
+def set_auth_styles():
+    st.markdown(AUTH_STYLES, unsafe_allow_html=True)
+
+def get_api_client():
+    """This session's API client (holds the session's bearer token)"""
+    if "api_client" not in st.session_state:
+        st.session_state.api_client = DilBotClient(API_URL)
+    return st.session_state.api_client
+
+def show_auth_page():
+    set_auth_styles()
+    st.markdown(
+        """
+        <div class="navbar">
+            <div class="navbar-logo-container">
+                <img src="https://e7.pngegg.com/pngimages/498/917/png-clipart-computer-icons-desktop-chatbot-icon-blue-angle-thumbnail.png" class="navbar-logo-img">
+                <div class="navbar-logo-text">DilBot</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True
+    )
+
+    st.markdown("<div class='centered-container'><div class='ai-powered-banner'><span>✨</span>AI-Powered Emotional Companion</div></div>", unsafe_allow_html=True)
+
+    st.markdown(
+        """
+        <h1 style='text-align: center; font-size: 3.5em; color: #1a237e;'>Transform Your Emotional Journey</h1>
+        <p style='text-align: center; font-size: 1.2em; color: #555;'>
+            DilBot empowers individuals with AI-driven insights for emotional well-being, personal growth, and self-discovery worldwide.
+        </p>
+        """, unsafe_allow_html=True
+    )
+
+    st.markdown('<div class="button-row">', unsafe_allow_html=True)
+    
+    # Buttons placed directly in a single column layout
+    if st.button("Paid Plan", key="paid_plan_btn", use_container_width=True):
+        st.info("Paid version coming soon") # Text for paid plan button
+    st.markdown('<div class="secondary-button" style="margin-top: 20px;">', unsafe_allow_html=True) # Added margin for spacing
+    if st.button("Login Below FOR FREE", key="login_free_btn", use_container_width=True):
+        st.info("Slide down below") # Text for free login button
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True) # Close button-row
+
+
+    # --- Section for icons and descriptions ---
+    st.markdown("<div class='feature-grid'>", unsafe_allow_html=True)
+    
+    # First Image: Users vast amount satisfied (https://cdn-icons-png.flaticon.com/512/33/33308.png)
+    st.markdown(f"""
+        <div class="feature-item">
+            <img src="https://cdn-icons-png.flaticon.com/512/33/33308.png" class="icon-img">
+            <h3>Users Vastly Satisfied</h3>
+            <p>Our community experiences significant positive emotional shifts.</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # Second Image: Successful User's Emotion's results a happy lifestyle (https://cdn-icons-png.flaticon.com/512/10809/10809501.png)
+    st.markdown(f"""
+        <div class="feature-item">
+            <img src="https://cdn-icons-png.flaticon.com/512/10809/10809501.png" class="icon-img">
+            <h3>Happy Lifestyle</h3>
+            <p>Empowering users to achieve emotional well-being and a happier life.</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # Third Image: 10,000+ Daily Users (https://www.clipartmax.com/png/middle/225-2254363_checklist-comments-form-approved-icon.png)
+    st.markdown(f"""
+        <div class="feature-item">
+            <img src="https://www.clipartmax.com/png/middle/225-2254363_checklist-comments-form-appr.png" class="icon-img">
+            <h3>10,000+ Daily Users</h3>
+            <p>Join our growing community finding support and growth daily.</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # Re-adding the original Empathetic Chatbot feature from previous response for completeness
+    st.markdown("""
+        <div class="feature-item">
+            <span class="icon-img"></span> <h3>Empathetic Chatbot</h3>
+            <p>Connect with an AI that listens and understands your feelings.</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown("</div>", unsafe_allow_html=True)
+    # --- End of icon and description section ---
+
+
+    st.markdown("<div class='auth-content-container'>", unsafe_allow_html=True) # Container for login/signup
+
+    tab1, tab2 = st.tabs(["Login", "Sign Up"])
+    
+    with tab1:
+        st.subheader("Login to Your Account( Admin will use own creditionals )")
+        login_username = st.text_input("Username", key="login_user")
+        login_password = st.text_input("Password", type="password", key="login_pass")
+        
+        if st.button("Login", key="login_btn"):
+            if login_username and login_password:
+                if API_URL:
+                    success, message, is_admin = get_api_client().login(login_username, login_password)
+                else:
+                    success, message, is_admin = login(login_username, login_password)
+                if success:
+                    st.session_state.authenticated = True
+                    st.session_state.username = login_username
+                    st.session_state.is_admin = is_admin
+                    st.session_state.page = "main_app" if not is_admin else "admin_dashboard" # Direct to correct page
+                    st.rerun()
+                else:
+                    st.error(message)
+            else:
+                st.warning("Please fill in all fields")
+    
+    with tab2:
+        st.subheader("Create New Account")
+        signup_username = st.text_input("Choose Username", key="signup_user")
+        signup_email = st.text_input("Email Address", key="signup_email")
+        signup_password = st.text_input("Choose Password", type="password", key="signup_pass")
+        signup_confirm = st.text_input("Confirm Password", type="password", key="signup_confirm")
+        
+        if st.button("Create Account", key="signup_btn"):
+            if all([signup_username, signup_email, signup_password, signup_confirm]):
+                problem = validate_signup(signup_username, signup_password, signup_email, signup_confirm)
+                if problem:
+                    st.error(problem)
+                else:
+                    if API_URL:
+                        success, message = get_api_client().signup(signup_username, signup_password, signup_email)
+                    else:
+                        success, message = signup(signup_username, signup_password, signup_email)
+                    if success:
+                        st.success(message)
+                        st.info("You can now login with your credentials!")
+                    else:
+                        st.error(message)
+            else:
+                st.warning("Please fill in all fields")
+
+    st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,113 @@
+# Benchmark the quote index types from ann_index on synthetic MiniLM-sized vectors.
+#
+# For each corpus size and index type this reports build time, resident memory
+# added by the index, single-query latency (p50/p99) and recall@k against exact
+# flat search. Results are printed as a table and written as JSON.
+#
+#   python benchmarks/bench_ann.py --sizes 1000 100000 1000000 --output ann_results.json
+import os, sys, json, time, argparse
+import numpy as np
+import faiss
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import make_index, train_index, train_size
+
+DIM = 384  # all-MiniLM-L6-v2
+
+
+def current_rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def synthetic_corpus(n, dim, seed=0, chunk=100_000):
+    """Clustered, L2-normalized vectors (real sentence embeddings are far from uniform)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(16, n // 1000), dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        stop = min(n, start + chunk)
+        assign = rng.integers(0, len(centers), size=stop - start)
+        block = centers[assign] + 0.35 * rng.normal(size=(stop - start, dim)).astype(np.float32)
+        vectors[start:stop] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(corpus, count, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, len(corpus), size=count)]
+    queries = picks + 0.1 * rng.normal(size=picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def bench_index(index_type, corpus, queries, truth, k, vector_dtype="float32"):
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    index = make_index(corpus.shape[1], len(corpus), index_type, vector_dtype)
+    if not index.is_trained:
+        sample_size = min(len(corpus), train_size(len(corpus), index_type))
+        sample = corpus[np.random.default_rng(2).choice(len(corpus), sample_size, replace=False)]
+        train_index(index, sample)
+    index.add(corpus)
+    build_seconds = time.perf_counter() - start
+    memory_bytes = current_rss_bytes() - rss_before
+
+    # Single-threaded, one query at a time: what a single DilBot turn sees
+    faiss.omp_set_num_threads(1)
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        t0 = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - t0)
+        found[i] = ids[0]
+    faiss.omp_set_num_threads(os.cpu_count() or 1)
+
+    recall = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "index_type": index_type,
+        "vector_dtype": vector_dtype,
+        "num_vectors": len(corpus),
+        "build_seconds": round(build_seconds, 3),
+        "memory_mb": round(memory_bytes / 2**20, 1),
+        "query_p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "query_p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+        f"recall_at_{k}": round(float(recall), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flat, HNSW and IVF quote indexes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--types", nargs="+", default=["flat", "hnsw", "ivf"])
+    parser.add_argument("--dtypes", nargs="+", default=["float32"], help="float32, float16 and/or int8")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--output", default="ann_results.json")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        corpus = synthetic_corpus(size, DIM)
+        queries = make_queries(corpus, args.queries)
+        exact = faiss.IndexFlatL2(DIM)
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+        del exact
+
+        for index_type in args.types:
+            for vector_dtype in args.dtypes:
+                result = bench_index(index_type, corpus, queries, truth, args.k, vector_dtype)
+                results.append(result)
+                print(f"{size:>9} {index_type:<5} {vector_dtype:<7} build {result['build_seconds']:>8.2f}s  "
+                      f"mem {result['memory_mb']:>8.1f}MB  p50 {result['query_p50_ms']:.3f}ms  "
+                      f"p99 {result['query_p99_ms']:.3f}ms  recall@{args.k} {result[f'recall_at_{args.k}']:.3f}")
+
+    with open(args.output, "w") as f:
+        json.dump({"dim": DIM, "k": args.k, "results": results}, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
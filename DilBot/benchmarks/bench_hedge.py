@@ -0,0 +1,94 @@
+# Benchmark for hedged LLM calls: tail latency with and without a secondary model.
+#
+# Starts two local Groq stand-ins (benchmarks/groq_stub.py): a primary with a
+# slow tail (--tail-rate of requests take --tail-latency seconds) and a fast,
+# steady secondary. Sends the same prompts through make_llm() with hedging off
+# and then on, --concurrency at a time, and reports p50/p95/p99 latency, errors,
+# and hedge_stats() (hedge rate, secondary wins, estimated seconds saved).
+#
+#   python benchmarks/bench_hedge.py --calls 200 --tail-rate 0.05 --tail-latency 8 --hedge-ms 1500
+import os, sys, json, time, argparse, platform
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_router
+import turn_pipeline
+from bench_turn import MESSAGES, git_commit
+from groq_stub import StubConfig, start_stub_server
+
+
+def run(llm, calls, concurrency):
+    def one(index):
+        started = time.perf_counter()
+        try:
+            llm.invoke(MESSAGES[index % len(MESSAGES)] + f" ({index})")
+        except Exception:
+            return time.perf_counter() - started, True
+        return time.perf_counter() - started, False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array([seconds for seconds, _ in results]) * 1000
+    return {
+        "calls": calls,
+        "elapsed_s": round(elapsed, 2),
+        "errors": sum(failed for _, failed in results),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "max_ms": round(float(latencies_ms.max()), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM tail latency with and without hedging")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hedge-ms", type=float, default=1500)
+    parser.add_argument("--latency", type=float, default=0.4, help="primary seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tail-rate", type=float, default=0.05, help="share of primary requests in the slow tail")
+    parser.add_argument("--tail-latency", type=float, default=8.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of primary requests that fail")
+    parser.add_argument("--secondary-latency", type=float, default=0.3)
+    parser.add_argument("--output", default="hedge_results.json")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    primary, primary_url = start_stub_server(StubConfig(
+        args.latency, args.jitter, args.error_rate, seed=1, tail_rate=args.tail_rate, tail_latency=args.tail_latency))
+    secondary, secondary_url = start_stub_server(StubConfig(args.secondary_latency, 0.05, seed=2))
+    turn_pipeline.GROQ_BASE_URL = primary_url
+    turn_pipeline.SECONDARY_BASE_URL = secondary_url
+
+    report = {
+        "commit": git_commit(repo_dir),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "unhedged": run(turn_pipeline.make_llm(hedge_after=0), args.calls, args.concurrency),
+    }
+    report["hedged"] = run(turn_pipeline.make_llm(hedge_after=args.hedge_ms / 1000), args.calls, args.concurrency)
+    report["hedge_stats"] = llm_router.hedge_stats()
+    report["stub_requests"] = {"primary": primary.config.requests, "secondary": secondary.config.requests}
+    primary.shutdown()
+    secondary.shutdown()
+
+    for name in ("unhedged", "hedged"):
+        stats = report[name]
+        print(f"{name:<9} p50 {stats['p50_ms']:>9.1f}ms  p95 {stats['p95_ms']:>9.1f}ms  "
+              f"p99 {stats['p99_ms']:>9.1f}ms  max {stats['max_ms']:>9.1f}ms  errors {stats['errors']}")
+    stats = report["hedge_stats"]
+    print(f"hedge rate {stats['hedge_rate']:.1%}, secondary won {stats['secondary_wins']} "
+          f"of {stats['hedged'] + stats['fallbacks']}, ~{stats['saved_seconds']:.1f}s saved")
+
+    with open(os.path.abspath(args.output), "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
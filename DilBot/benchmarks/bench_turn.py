@@ -0,0 +1,238 @@
+# Benchmark one DilBot conversation turn end to end, without Streamlit.
+#
+# Drives turn_pipeline.process_turn (emotion detection, retrieval, prompt building,
+# LLM call, journal write, best-quote selection, speech synthesis) with the real
+# local models, while Groq and gTTS are replaced by deterministic stubs with a
+# configurable latency. Admission control is off (one user, back to back). Every
+# combination of journal size and quote corpus is run in a scratch directory and
+# reported as per-stage and end-to-end latency, throughput and resident memory. Results are written as JSON; pass an earlier
+# results file with --compare to print the change against that commit.
+#
+#   python benchmarks/bench_turn.py --journal-sizes 10 1000 100000 --quote-sizes category 100000
+#   python benchmarks/bench_turn.py --output after.json --compare before.json
+import os, sys, json, time, argparse, datetime, hashlib, platform, resource, subprocess, tempfile
+import numpy as np
+from langchain_core.language_models.llms import LLM
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from bench_ann import DIM, current_rss_bytes, synthetic_corpus
+from ann_index import make_index, train_index, train_size, wrap_index, build_vectorstore
+from models import load_embeddings
+from storage import QUOTE_CATEGORIES, create_user_directory, get_user_file_path
+from turn_pipeline import process_turn, create_conversation_memory
+
+USERNAME = "bench_user"
+MESSAGES = [
+    "I had a really rough day at work and I feel like nobody listens to me.",
+    "I finally finished my project and I'm proud of how it turned out!",
+    "I miss my grandmother so much, it has been a year since she passed.",
+    "I'm nervous about my exams next week, I can't stop overthinking.",
+    "My friend cancelled on me again and honestly I'm just annoyed.",
+    "Today was calm. I went for a walk and watched the sunset.",
+]
+EMOTIONS = ["joy", "sadness", "anger", "fear", "surprise", "neutral", "disgust"]
+
+
+class StubLLM(LLM):
+    """Stands in for ChatGroq: sleeps for `latency` seconds, then answers deterministically"""
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "dilbot-stub"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest()
+        return f"I hear you, and what you're feeling matters. Take it one step at a time. [{digest}]"
+
+
+def make_stub_tts(latency):
+    """Stands in for gTTS: sleeps, then writes a small placeholder mp3"""
+    def synthesize(text, username):
+        time.sleep(latency)
+        audio_path = get_user_file_path(username, "response.mp3")
+        with open(audio_path, "wb") as f:
+            f.write(b"ID3" + text.encode("utf-8")[:1024])
+        return audio_path
+    return synthesize
+
+
+def write_journal(username, num_entries, seed=0):
+    """Replace the user's journal with num_entries synthetic entries ending today"""
+    rng = np.random.default_rng(seed)
+    today = datetime.datetime.now()
+    journal = []
+    for i in range(num_entries):
+        when = today - datetime.timedelta(minutes=(num_entries - i) * 30)
+        journal.append({
+            "date": str(when.date()),
+            "timestamp": str(when),
+            "user_input": MESSAGES[i % len(MESSAGES)],
+            "emotion": EMOTIONS[int(rng.integers(len(EMOTIONS)))],
+            "confidence": round(float(rng.uniform(40, 99)), 2),
+            "response": "Thank you for sharing that with me."
+        })
+    with open(get_user_file_path(username, "journal.json"), "w") as f:
+        json.dump(journal, f, indent=4)
+
+
+def quote_corpus(spec, embeddings):
+    """Vectorstore and current_quotes for a corpus spec: "category" or a quote count"""
+    if spec == "category":
+        quotes = QUOTE_CATEGORIES["Healing"]
+        return build_vectorstore(quotes, embeddings), quotes
+    # Large uploads: synthetic vectors stand in for embedding every quote
+    num_quotes = int(spec)
+    vectors = synthetic_corpus(num_quotes, DIM)
+    index = make_index(DIM, num_quotes)
+    if not index.is_trained:
+        sample_size = min(num_quotes, train_size(num_quotes))
+        train_index(index, vectors[np.random.default_rng(2).choice(num_quotes, sample_size, replace=False)])
+    vectorstore = wrap_index(index, embeddings)
+    texts = [f"Synthetic quote number {i}: keep going, one day at a time." for i in range(num_quotes)]
+    vectorstore.add_embeddings(list(zip(texts, vectors.tolist())))
+    return vectorstore, []
+
+
+def latency_summary(samples):
+    latencies_ms = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+    }
+
+
+def run_config(journal_entries, corpus_spec, vectorstore, current_quotes, args):
+    write_journal(USERNAME, journal_entries)
+    llm = StubLLM(latency=args.llm_latency)
+    synthesize = make_stub_tts(args.tts_latency)
+    memory = create_conversation_memory(llm)
+
+    samples = {}
+    def record(stage, seconds):
+        samples.setdefault(stage, []).append(seconds)
+
+    for i in range(args.warmup):
+        process_turn(USERNAME, MESSAGES[i % len(MESSAGES)], vectorstore, current_quotes, llm,
+                     memory=memory, synthesize=synthesize, admission=None)
+
+    metrics.add_listener(record)
+    end_to_end = []
+    forward_passes = {}
+    started = time.perf_counter()
+    try:
+        for i in range(args.turns):
+            t0 = time.perf_counter()
+            result = process_turn(USERNAME, MESSAGES[i % len(MESSAGES)], vectorstore, current_quotes, llm,
+                                  memory=memory, synthesize=synthesize, admission=None)
+            end_to_end.append(time.perf_counter() - t0)
+            for kind, passes in result["forward_passes"].items():
+                forward_passes[kind] = forward_passes.get(kind, 0) + passes
+    finally:
+        metrics.remove_listener(record)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "journal_entries": journal_entries,
+        "quote_corpus": corpus_spec,
+        "num_quotes": vectorstore.index.ntotal,
+        "turns": args.turns,
+        "throughput_turns_per_s": round(args.turns / elapsed, 3),
+        "end_to_end": latency_summary(end_to_end),
+        "stages": {stage: latency_summary(values) for stage, values in sorted(samples.items())},
+        "forward_passes_per_turn": {kind: round(passes / args.turns, 2) for kind, passes in forward_passes.items()},
+        "rss_mb": round(current_rss_bytes() / 2**20, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def git_commit(repo_dir):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_comparison(report, baseline):
+    """Print end-to-end and per-stage p50/p95 changes against a baseline results file"""
+    previous = {(r["journal_entries"], r["quote_corpus"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline.get('commit', 'unknown')}:")
+    for result in report["results"]:
+        before = previous.get((result["journal_entries"], result["quote_corpus"]))
+        if before is None:
+            continue
+        print(f"journal {result['journal_entries']:>7}  quotes {result['quote_corpus']:>9}  "
+              f"throughput {before['throughput_turns_per_s']:.2f} -> {result['throughput_turns_per_s']:.2f} turns/s")
+        rows = [("end_to_end", before["end_to_end"], result["end_to_end"])]
+        rows += [(stage, before["stages"][stage], summary) for stage, summary in result["stages"].items()
+                 if stage in before["stages"]]
+        for stage, old, new in rows:
+            for key in ("p50_ms", "p95_ms"):
+                change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                print(f"    {stage:<18} {key:<6} {old[key]:>10.3f} -> {new[key]:>10.3f}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DilBot turn pipeline with stubbed LLM and TTS")
+    parser.add_argument("--journal-sizes", type=int, nargs="+", default=[10, 1_000, 10_000, 100_000])
+    parser.add_argument("--quote-sizes", nargs="+", default=["category", "10000", "100000"],
+                        help='"category" (a built-in theme) and/or numbers of uploaded quotes')
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM sleeps per call")
+    parser.add_argument("--tts-latency", type=float, default=0.0, help="seconds the stub TTS sleeps per call")
+    parser.add_argument("--output", default="turn_results.json")
+    parser.add_argument("--compare", help="earlier results file to print deltas against")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output_path = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    metrics.ENABLED = True
+    report = {
+        "commit": git_commit(repo_dir),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": [],
+    }
+
+    # Users, journals and audio files go to a scratch directory, never the real data
+    with tempfile.TemporaryDirectory(prefix="dilbot-bench-") as workdir:
+        os.chdir(workdir)
+        create_user_directory(USERNAME)
+        embeddings = load_embeddings()
+        for corpus_spec in args.quote_sizes:
+            vectorstore, current_quotes = quote_corpus(corpus_spec, embeddings)
+            for journal_entries in args.journal_sizes:
+                result = run_config(journal_entries, corpus_spec, vectorstore, current_quotes, args)
+                report["results"].append(result)
+                e2e = result["end_to_end"]
+                print(f"journal {journal_entries:>7}  quotes {corpus_spec:>9}  p50 {e2e['p50_ms']:>9.2f}ms  "
+                      f"p95 {e2e['p95_ms']:>9.2f}ms  {result['throughput_turns_per_s']:>7.2f} turns/s  "
+                      f"rss {result['rss_mb']:>7.1f}MB")
+            del vectorstore
+        os.chdir(repo_dir)
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {output_path}")
+
+    if baseline is not None:
+        print_comparison(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# A local stand-in for the Groq chat-completions API, for load tests and benchmarks.
+#
+# Serves POST /openai/v1/chat/completions (the path the Groq client calls under its
+# base URL) with a deterministic reply after a configurable latency, failing a
+# configurable share of requests. A --tail-rate share of requests take
+# --tail-latency instead, to model a provider's slow tail. "stream": true requests are answered as
+# server-sent events: the first chunk arrives after the latency, the rest are
+# spaced by --token-delay.
+#
+#   python benchmarks/groq_stub.py --port 8800 --latency 0.6 --jitter 0.2 --error-rate 0.02
+#   DILBOT_GROQ_BASE_URL=http://127.0.0.1:8800 streamlit run app.py
+import json, time, random, hashlib, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+class StubConfig:
+    def __init__(self, latency=0.5, jitter=0.0, error_rate=0.0, error_status=500, token_delay=0.02, seed=None,
+                 tail_rate=0.0, tail_latency=5.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_delay = token_delay
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def draw(self):
+        """Latency and failure decision for one request"""
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            if self.random.random() < self.tail_rate:
+                delay = self.tail_latency
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+
+def reply_for(messages):
+    """Same prompt, same reply"""
+    prompt = "".join(str(message.get("content", "")) for message in messages)
+    digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest()
+    return f"I hear you, and what you're feeling matters. Take it one step at a time. [{digest}]"
+
+
+def _completion(model, content):
+    return {
+        "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+def _chunk(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path.rstrip("/") != COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        delay, failed = config.draw()
+        time.sleep(delay)
+        if failed:
+            self._send_json(config.error_status, {"error": {"message": "stub failure", "type": "server_error"}})
+            return
+
+        model = body.get("model", "stub")
+        content = reply_for(body.get("messages", []))
+        if not body.get("stream"):
+            self._send_json(200, _completion(model, content))
+            return
+
+        # Chunked, so the connection stays open for the next request (as with the real API)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._send_event(_chunk(model, {"role": "assistant", "content": ""}))
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    time.sleep(config.token_delay)
+                self._send_event(_chunk(model, {"content": word if i == 0 else " " + word}))
+            self._send_event(_chunk(model, {}, "stop"))
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up mid-stream (e.g. a hedged request that lost the race)
+            self.close_connection = True
+
+    def _send_event(self, payload):
+        self._send_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def _send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(config=None, port=0, host="127.0.0.1"):
+    """Serve the stub from a daemon thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), _StubHandler)
+    server.daemon_threads = True
+    server.config = config or StubConfig()
+    threading.Thread(target=server.serve_forever, daemon=True, name="groq-stub").start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Groq chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the reply (or first token)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- jitter on the latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed requests (e.g. 429)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="share of requests that take --tail-latency")
+    parser.add_argument("--tail-latency", type=float, default=5.0, help="seconds before a slow-tail reply")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.error_rate, args.error_status, args.token_delay,
+                        tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    server, base_url = start_stub_server(config, args.port, args.host)
+    print(f"Groq stub listening on {base_url} (set DILBOT_GROQ_BASE_URL={base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
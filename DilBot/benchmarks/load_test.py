@@ -0,0 +1,229 @@
+# Load test: how many simultaneous users can one DilBot worker process handle?
+#
+# Simulated users log in, load their quote store, talk to DilBot for a few turns
+# and open their dashboard, with think time in between; a share of sessions are
+# admins loading the admin statistics. Each thread is one user, as each browser
+# session is a thread in a Streamlit worker. The real storage.login,
+# load_user_vectorstore, save_user_journal (through process_turn),
+# get_admin_stats and search_users run against a scratch directory, and the LLM
+# is ChatGroq pointed at the local Groq stand-in (benchmarks/groq_stub.py) with configurable
+# latency and error rate. Concurrency ramps through --users; each step reports
+# throughput, p50/p95/p99 latency and error rate per operation. --abusive-users
+# adds users who send turns back to back with no pause ("abusive_turn"), to check
+# that admission control keeps everyone else's "turn" latency stable.
+#
+#   python benchmarks/load_test.py --users 1 4 16 64 --step-seconds 60 --llm-latency 0.8 --error-rate 0.02
+#   python benchmarks/load_test.py --users 16 --abusive-users 2
+import os, sys, json, time, random, argparse, platform, tempfile, threading
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+import turn_pipeline
+from bench_turn import MESSAGES, make_stub_tts, git_commit
+from groq_stub import StubConfig, start_stub_server
+from storage import (
+    QUOTE_CATEGORIES, signup, login, build_user_vectorstore, load_user_vectorstore,
+    load_category_store, load_user_journal, get_admin_stats, search_users
+)
+from turn_pipeline import process_turn, make_llm, create_conversation_memory
+
+PASSWORD = "load-test-password"
+CUSTOM_QUOTES = [
+    "You are allowed to be both a masterpiece and a work in progress.",
+    "Small steps every day add up to big changes.",
+    "Rest is not a reward, it is a requirement.",
+    "Your feelings are valid, even the messy ones.",
+]
+
+
+class Recorder:
+    """Latencies and errors per operation for one ramp step"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def timed(self, operation, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(operation, time.perf_counter() - start, failed=True)
+            return None
+        self.record(operation, time.perf_counter() - start, failed=False)
+        return result
+
+    def record(self, operation, seconds, failed):
+        with self.lock:
+            self.latencies.setdefault(operation, []).append(seconds)
+            self.errors[operation] = self.errors.get(operation, 0) + int(failed)
+
+    def summary(self, elapsed):
+        operations = {}
+        with self.lock:
+            for operation, samples in sorted(self.latencies.items()):
+                latencies_ms = np.array(samples) * 1000
+                operations[operation] = {
+                    "count": len(samples),
+                    "errors": self.errors[operation],
+                    "error_rate": round(self.errors[operation] / len(samples), 4),
+                    "throughput_per_s": round(len(samples) / elapsed, 3),
+                    "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+                    "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+                    "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+                }
+        return operations
+
+
+def user_session(username, category, args, recorder, rng, synthesize):
+    """One visit: log in, open the quote store, talk for a few turns, look at the dashboard"""
+    result = recorder.timed("login", login, username, PASSWORD)
+    if not result or not result[0]:
+        return
+
+    vectorstore = recorder.timed("load_vectorstore", load_user_vectorstore, username)
+    current_quotes = []
+    if vectorstore is None:
+        vectorstore, current_quotes = load_category_store(category), QUOTE_CATEGORIES[category]
+
+    llm = make_llm()
+    memory = create_conversation_memory(llm)
+    for _ in range(args.turns_per_session):
+        time.sleep(rng.uniform(0, 2 * args.think_time))
+        result = recorder.timed("turn", process_turn, username, rng.choice(MESSAGES), vectorstore,
+                                current_quotes, llm, memory=memory, synthesize=synthesize)
+        if result is None:
+            break
+
+    time.sleep(rng.uniform(0, 2 * args.think_time))
+    recorder.timed("dashboard", load_user_journal, username)
+
+
+def abusive_user(index, deadline, args, recorder, synthesize):
+    """Mashes "Talk to DilBot": turns back to back, never pausing (rejections count as errors)"""
+    rng = random.Random(-1 - index)
+    username = f"load_user_{index}"
+    category = next(iter(QUOTE_CATEGORIES))
+    vectorstore, current_quotes = load_category_store(category), QUOTE_CATEGORIES[category]
+    llm = make_llm()
+    memory = create_conversation_memory(llm)
+    while time.monotonic() < deadline:
+        if recorder.timed("abusive_turn", process_turn, username, rng.choice(MESSAGES), vectorstore,
+                          current_quotes, llm, memory=memory, synthesize=synthesize) is None:
+            time.sleep(0.05)
+
+
+def admin_session(args, recorder, rng):
+    time.sleep(rng.uniform(0, 2 * args.think_time))
+    recorder.timed("admin_stats", get_admin_stats, include_users=False)
+    recorder.timed("admin_search", search_users, f"load_user_{rng.randrange(10)}", sort="last_activity", limit=50)
+
+
+def virtual_user(index, deadline, args, recorder, synthesize):
+    rng = random.Random(index)
+    username = f"load_user_{index}"
+    categories = list(QUOTE_CATEGORIES)
+    while time.monotonic() < deadline:
+        if rng.random() < args.admin_share:
+            admin_session(args, recorder, rng)
+        else:
+            user_session(username, categories[index % len(categories)], args, recorder, rng, synthesize)
+
+
+def create_users(count):
+    for index in range(count):
+        username = f"load_user_{index}"
+        signup(username, PASSWORD, f"{username}@example.com")
+        # Every fourth user has uploaded their own quotes
+        if index % 4 == 3:
+            build_user_vectorstore(username, CUSTOM_QUOTES)
+
+
+def run_step(num_users, args, synthesize):
+    recorder = Recorder()
+    metrics.reset()
+    deadline = time.monotonic() + args.step_seconds
+    threads = [threading.Thread(target=virtual_user, args=(index, deadline, args, recorder, synthesize), daemon=True)
+               for index in range(num_users)]
+    threads += [threading.Thread(target=abusive_user, args=(num_users + index, deadline, args, recorder, synthesize),
+                                 daemon=True)
+                for index in range(args.abusive_users)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "users": num_users,
+        "elapsed_s": round(elapsed, 2),
+        "operations": recorder.summary(elapsed),
+        "stages": metrics.stage_summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent simulated users against one DilBot worker")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--step-seconds", type=float, default=30.0)
+    parser.add_argument("--turns-per-session", type=int, default=3)
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between user actions, in seconds")
+    parser.add_argument("--abusive-users", type=int, default=0, help="extra users sending turns back to back")
+    parser.add_argument("--admin-share", type=float, default=0.05, help="share of sessions that are admin dashboard views")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--tts-latency", type=float, default=0.3)
+    parser.add_argument("--groq-base-url", help="use an already running Groq-compatible server instead of the built-in stub")
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output_path = os.path.abspath(args.output)
+    metrics.ENABLED = True
+
+    stub = None
+    base_url = args.groq_base_url
+    if base_url is None:
+        config = StubConfig(args.llm_latency, args.llm_jitter, args.error_rate, args.error_status)
+        stub, base_url = start_stub_server(config)
+    turn_pipeline.GROQ_BASE_URL = base_url
+
+    report = {
+        "commit": git_commit(repo_dir),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "steps": [],
+    }
+    synthesize = make_stub_tts(args.tts_latency)
+
+    with tempfile.TemporaryDirectory(prefix="dilbot-load-") as workdir:
+        os.chdir(workdir)
+        create_users(max(args.users) + args.abusive_users)
+        for category in QUOTE_CATEGORIES:
+            load_category_store(category)  # build the shared indexes before the clock starts
+
+        for num_users in args.users:
+            step = run_step(num_users, args, synthesize)
+            report["steps"].append(step)
+            print(f"\n{num_users} concurrent users ({step['elapsed_s']}s)")
+            for operation, stats in step["operations"].items():
+                print(f"    {operation:<16} {stats['throughput_per_s']:>8.2f}/s  p50 {stats['p50_ms']:>9.1f}ms  "
+                      f"p95 {stats['p95_ms']:>9.1f}ms  p99 {stats['p99_ms']:>9.1f}ms  errors {stats['error_rate']:.1%}")
+        os.chdir(repo_dir)
+
+    if stub is not None:
+        report["stub_requests"] = stub.config.requests
+        report["stub_errors"] = stub.config.errors
+        stub.shutdown()
+
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\nResults written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# Compact, pickle-free persistence for quote vectorstores.
+#
+# A store directory holds:
+#   index.faiss   - the FAISS index (optionally float16/int8 scalar-quantized, see ann_index)
+#   texts.bin     - all quote texts as UTF-8, back to back
+#   offsets.npy   - uint64 array of n+1 byte offsets into texts.bin
+#   manifest.json - format version, counts and vector dtype
+#
+# Loading maps texts.bin and offsets.npy read-only and decodes a quote only when a
+# search returns it, so load time no longer grows with the size of the docstore and
+# nothing is ever unpickled. Loaded stores are read-only (CompactFAISS); to change
+# one, build a new vectorstore and save it over the old.
+#
+# A save writes <path>.saving, moves the current store aside to <path>.old, moves
+# the new one in and then deletes <path>.old. A reader arriving between the two
+# moves, or after a crash there, opens <path>.old, so a store never disappears.
+import os, json, mmap, shutil
+from collections.abc import Mapping
+import numpy as np
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+from ann_index import vector_dtype
+
+FORMAT = "dilbot-compact-v1"
+INDEX_FILE = "index.faiss"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+MANIFEST_FILE = "manifest.json"
+STAGING_SUFFIX = ".saving"
+RETIRED_SUFFIX = ".old"
+
+
+def read_index_mmap(index_path):
+    try:
+        return faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        # Older FAISS builds can only mmap IVF lists; fall back to a regular read
+        return faiss.read_index(index_path, faiss.IO_FLAG_READ_ONLY)
+
+
+def _readable_path(path):
+    """path, or the store it is replacing while a save is between its two renames"""
+    if not os.path.exists(os.path.join(path, MANIFEST_FILE)) and \
+            os.path.exists(os.path.join(path + RETIRED_SUFFIX, MANIFEST_FILE)):
+        return path + RETIRED_SUFFIX
+    return path
+
+
+def is_compact_store(path):
+    return os.path.exists(os.path.join(_readable_path(path), MANIFEST_FILE))
+
+
+class _PositionIds(Mapping):
+    """index_to_docstore_id for compact stores: FAISS row i is document str(i)"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise KeyError(i)
+        return str(i)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+
+class CompactDocstore(Docstore):
+    """Read-only docstore decoding texts lazily from a memory-mapped blob"""
+
+    def __init__(self, path):
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        texts_path = os.path.join(path, TEXTS_FILE)
+        if os.path.getsize(texts_path) > 0:
+            with open(texts_path, "rb") as f:
+                self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.blob = b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def text(self, i):
+        return self.blob[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+    def iter_texts(self):
+        for i in range(len(self)):
+            yield self.text(i)
+
+    def search(self, search):
+        i = int(search)
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        return Document(page_content=self.text(i))
+
+
+class CompactFAISS(FAISS):
+    """FAISS vectorstore over a compact store: searches work, anything that would change it raises"""
+
+    def _read_only(self, *args, **kwargs):
+        # Refused up front: FAISS would add to the (memory-mapped) index before the docstore
+        raise NotImplementedError("Compact stores are read-only; build a new vectorstore and save_compact it")
+
+    add_texts = add_embeddings = delete = merge_from = _read_only
+
+    async def aadd_texts(self, *args, **kwargs):
+        self._read_only()
+
+    async def adelete(self, *args, **kwargs):
+        self._read_only()
+
+
+def save_compact(vectorstore, path):
+    """Write a LangChain FAISS vectorstore to `path` in the compact format (atomically)"""
+    staging = path + STAGING_SUFFIX
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    count = vectorstore.index.ntotal
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    with open(os.path.join(staging, TEXTS_FILE), "wb") as f:
+        for i in range(count):
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            f.write(doc.page_content.encode("utf-8"))
+            offsets[i + 1] = f.tell()
+    np.save(os.path.join(staging, OFFSETS_FILE), offsets)
+    faiss.write_index(vectorstore.index, os.path.join(staging, INDEX_FILE))
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump({"format": FORMAT, "count": count, "dim": vectorstore.index.d,
+                   "vector_dtype": vector_dtype(vectorstore.index)}, f, indent=4)
+
+    retired = path + RETIRED_SUFFIX
+    if os.path.exists(path):
+        shutil.rmtree(retired, ignore_errors=True)  # left over from an interrupted save
+        os.replace(path, retired)
+    os.replace(staging, path)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def remove_compact(path):
+    """Delete a store, including a copy moved aside by an interrupted save"""
+    for store_path in (path, path + RETIRED_SUFFIX, path + STAGING_SUFFIX):
+        shutil.rmtree(store_path, ignore_errors=True)
+
+
+def _open_compact(path, embeddings):
+    with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"Unsupported vectorstore format in {path}: {manifest.get('format')}")
+    docstore = CompactDocstore(path)
+    return CompactFAISS(
+        embedding_function=embeddings,
+        index=read_index_mmap(os.path.join(path, INDEX_FILE)),
+        docstore=docstore,
+        index_to_docstore_id=_PositionIds(len(docstore))
+    )
+
+
+def load_compact(path, embeddings):
+    """Open a compact store as a read-only LangChain FAISS vectorstore"""
+    try:
+        return _open_compact(_readable_path(path), embeddings)
+    except FileNotFoundError:
+        # A save finished while we were opening its predecessor; the new store is in place now
+        return _open_compact(_readable_path(path), embeddings)
+
+
+def store_texts(vectorstore):
+    """Iterate the texts of any FAISS vectorstore in index order"""
+    if isinstance(vectorstore.docstore, CompactDocstore):
+        return vectorstore.docstore.iter_texts()
+    return (vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content
+            for i in range(vectorstore.index.ntotal))
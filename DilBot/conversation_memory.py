@@ -0,0 +1,110 @@
+# Rolling conversation memory for DilBot prompts.
+#
+# The last few turns are kept verbatim. Older turns are folded into a running
+# summary every few turns, and the rendered history is trimmed to a hard token
+# budget, so prompt size stays bounded no matter how long a session runs.
+#
+# add_turn() only reports that a summary is due; the caller runs
+# refresh_summary() off the request path (turn_pipeline does it in a
+# background thread, inside an admission slot). Until it finishes, the
+# turns being folded are still rendered verbatim.
+import re, threading
+
+SUMMARY_PROMPT = """Update the running summary of a supportive conversation between a user and DilBot.
+Keep it under 120 words. Keep names, ongoing situations, feelings, and anything DilBot promised.
+Current summary:
+{summary}
+New turns to fold in:
+{turns}
+Updated summary:"""
+
+
+def make_token_counter(tokenizer=None):
+    """Return a function counting tokens with a local tokenizer (regex fallback if none)"""
+    if tokenizer is not None:
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    word_pattern = re.compile(r"\w+|[^\w\s]")
+    return lambda text: len(word_pattern.findall(text))
+
+
+def format_turns(turns):
+    return "\n".join(f"User: {user}\nDilBot: {bot}" for user, bot in turns)
+
+
+class ConversationMemory:
+    """Last K turns verbatim plus a periodically refreshed summary of everything older"""
+
+    def __init__(self, summarize, count_tokens, recent_turns=4, summary_every=4):
+        self.summarize = summarize          # summarize(summary, turns_text) -> new summary
+        self.count_tokens = count_tokens
+        self.recent_turns = recent_turns
+        self.summary_every = summary_every
+        self.summary = ""
+        self.recent = []                    # verbatim turns, newest last
+        self.unsummarized = []              # evicted from `recent`, waiting to be folded
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def add_turn(self, user_input, response):
+        """Record a turn; True when older turns are due to be folded in with refresh_summary()"""
+        with self._lock:
+            self.recent.append((user_input, response))
+            while len(self.recent) > self.recent_turns:
+                self.unsummarized.append(self.recent.pop(0))
+            if len(self.unsummarized) >= self.summary_every and not self._summarizing:
+                self._summarizing = True
+                return True
+        return False
+
+    def refresh_summary(self):
+        """Fold the waiting turns into the summary (one LLM call, made without holding the lock)"""
+        with self._lock:
+            self._summarizing = True
+            summary, batch = self.summary, list(self.unsummarized)
+        try:
+            if not batch:
+                return
+            summary = self.summarize(
+                summary=summary or "(none yet)",
+                turns=format_turns(batch)
+            ).strip()
+            with self._lock:
+                self.summary = summary
+                del self.unsummarized[:len(batch)]  # turns evicted meanwhile stay for the next summary
+        finally:
+            with self._lock:
+                self._summarizing = False
+
+    def render(self, max_tokens):
+        """Render history for the prompt, dropping oldest material until it fits max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        with self._lock:
+            summary, turns = self.summary, self.unsummarized + self.recent
+        while True:
+            parts = []
+            if summary:
+                parts.append(f"Summary of earlier conversation: {summary}")
+            if turns:
+                parts.append(format_turns(turns))
+            history = "\n".join(parts)
+            if self.count_tokens(history) <= max_tokens:
+                return history
+            if turns:
+                turns = turns[1:]
+                continue
+            return self.truncate(history, max_tokens)
+
+    def truncate(self, text, max_tokens):
+        """Longest prefix of text within max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        # Binary search on characters: the tokenizer is only called O(log n) times
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count_tokens(text[:mid]) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low]
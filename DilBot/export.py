@@ -0,0 +1,146 @@
+# Streaming admin export: every user's profile and journal as NDJSON inside a zip.
+#
+# Entries are read one at a time (journal_archive.iter_full_journal: archived
+# months first, then the hot journal) and written through a small buffer
+# straight into the zip member, so memory use is bounded by the buffer size
+# rather than by the total amount of user data.
+#
+# An entry's timestamp is taken when it is queued, and it reaches disk up to
+# DILBOT_JOURNAL_FLUSH_MS later (longer when a write is retried), possibly after
+# an export has read the journal. Incremental exports therefore look back
+# EXPORT_OVERLAP before the previous export and skip the entries it recorded
+# as already exported ("recent_entries" in the export state).
+import os, json, zipfile, datetime
+from journal_archive import iter_full_journal
+
+EXPORT_DIR = "data/exports"
+EXPORT_STATE_PATH = "data/export_state.json"
+WRITE_CHUNK = 256 * 1024
+EXPORT_OVERLAP = datetime.timedelta(minutes=10)  # well beyond the journal flush window and its retries
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def load_export_state():
+    """Load the timestamp of the last completed export"""
+    if os.path.exists(EXPORT_STATE_PATH):
+        with open(EXPORT_STATE_PATH, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_export_state(state):
+    os.makedirs(os.path.dirname(EXPORT_STATE_PATH), exist_ok=True)
+    with open(EXPORT_STATE_PATH, "w") as f:
+        json.dump(state, f, indent=4)
+
+
+class _ChunkedWriter:
+    """Buffer NDJSON lines and flush them to a zip member in fixed-size chunks"""
+
+    def __init__(self, stream, chunk_size=WRITE_CHUNK):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.size = 0
+        self.lines = 0
+
+    def write_record(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self.parts.append(line)
+        self.size += len(line)
+        self.lines += 1
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.stream.write(b"".join(self.parts))
+            self.parts = []
+            self.size = 0
+
+
+def user_changed_since(user_data, journal_path, since):
+    """True if the user registered or wrote to their journal after `since`"""
+    if since is None:
+        return True
+    created_at = _parse_time(user_data.get("created_at"))
+    if created_at is not None and created_at > since:  # records without created_at fall back to the journal
+        return True
+    return os.path.exists(journal_path) and \
+        datetime.datetime.fromtimestamp(os.path.getmtime(journal_path)) > since
+
+
+def export_user_data(users, journal_path_for, admin_logs=(), incremental=False, export_dir=EXPORT_DIR):
+    """Write users.ndjson, journals.ndjson and admin_logs.ndjson into a zip on disk.
+
+    With incremental=True only users changed since the last export are included,
+    and only their journal entries newer than that export. Returns (path, summary).
+    """
+    state = load_export_state()
+    since = _parse_time(state.get("last_export")) if incremental else None
+    started_at = datetime.datetime.now()
+    window_start = since - EXPORT_OVERLAP if since else None
+    already_exported = {tuple(key) for key in state.get("recent_entries", [])} if since else set()
+    recent_entries = []  # (username, timestamp) of exported entries the next export's window overlaps
+
+    os.makedirs(export_dir, exist_ok=True)
+    kind = "incremental" if since else "full"
+    archive_path = os.path.join(export_dir, f"dilbot_export_{kind}_{started_at.strftime('%Y%m%d_%H%M%S')}.zip")
+    partial_path = archive_path + ".partial"
+    summary = {"users": 0, "journal_entries": 0, "since": str(since) if since else None}
+
+    with zipfile.ZipFile(partial_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        changed = []
+        with archive.open("users.ndjson", "w", force_zip64=True) as stream:
+            writer = _ChunkedWriter(stream)
+            for username, user_data in users.items():
+                journal_path = journal_path_for(username)
+                if not user_changed_since(user_data, journal_path, window_start):
+                    continue
+                # Never export password hashes
+                profile = {k: v for k, v in user_data.items() if k != "password"}
+                writer.write_record({"username": username, **profile})
+                changed.append(username)
+            writer.flush()
+            summary["users"] = writer.lines
+
+        with archive.open("journals.ndjson", "w", force_zip64=True) as stream:
+            writer = _ChunkedWriter(stream)
+            for username in changed:
+                for entry in iter_full_journal(journal_path_for(username)):
+                    # Entries after window_start that the previous export did not have
+                    # (entries without a timestamp only go into full exports)
+                    written_at = _parse_time(entry.get("timestamp"))
+                    if written_at is None:
+                        if since:
+                            continue
+                    else:
+                        key = (username, entry["timestamp"])
+                        if (window_start and written_at <= window_start) or key in already_exported:
+                            continue
+                        if written_at > started_at - EXPORT_OVERLAP:
+                            recent_entries.append(key)
+                    writer.write_record({"username": username, **entry})
+            writer.flush()
+            summary["journal_entries"] = writer.lines
+
+        with archive.open("admin_logs.ndjson", "w", force_zip64=True) as stream:
+            writer = _ChunkedWriter(stream)
+            for log_entry in admin_logs:
+                writer.write_record(log_entry)
+            writer.flush()
+
+        archive.writestr("manifest.json", json.dumps({
+            "export_timestamp": str(started_at),
+            "kind": kind,
+            **summary
+        }, indent=4))
+
+    # Only a complete archive gets its final name and advances the incremental cursor
+    os.replace(partial_path, archive_path)
+    save_export_state({"last_export": str(started_at), "last_archive": archive_path,
+                       "recent_entries": recent_entries})
+    return archive_path, summary
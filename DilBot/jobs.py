@@ -0,0 +1,394 @@
+# Background job queue for heavy DilBot work, backed by SQLite (no broker needed).
+#
+#   job_id = jobs.submit("ingest_quotes", {"path": ...}, username="alice")
+#   jobs.get_job(job_id)  # {"status": "running", "progress": 0.4, "message": "...", ...}
+#
+# Jobs are claimed by a pool of worker processes: started by the app
+# (start_workers, DILBOT_JOB_WORKERS of them) or run on their own with
+# `python jobs.py --workers 4`. A failed job is retried with exponential backoff
+# up to max_attempts. A job whose worker died (no heartbeat for
+# STALE_AFTER seconds) goes back on the queue. With DILBOT_JOB_WORKERS=0,
+# submit() runs the job inline and returns once it has finished. Recurring jobs
+# (SCHEDULE) are queued by whichever worker notices first that one is due.
+#
+# Jobs are claimed by priority, then in order of submission: speech for a turn
+# (PRIORITIES) goes ahead of queued batch work, and with two or more workers the
+# first one only takes interactive jobs, so a reply is never stuck behind a long
+# export or analytics run.
+import os, json, time, atexit, shutil, sqlite3, logging, argparse, threading, traceback, multiprocessing
+from contextlib import closing
+from journal_archive import ARCHIVE_AFTER_DAYS
+
+JOBS_DB_PATH = os.getenv("DILBOT_JOBS_DB", "data/jobs.db")
+JOB_WORKERS = int(os.getenv("DILBOT_JOB_WORKERS", "2"))
+POLL_INTERVAL = 0.5  # seconds between queue polls when idle
+HEARTBEAT_INTERVAL = 15  # seconds between heartbeats of a running job
+STALE_AFTER = 120  # seconds without a heartbeat before a running job is requeued
+RETRY_BASE_DELAY = 2  # seconds; doubled on every retry
+UPLOAD_DIR = "uploads"  # per-user, for files waiting to be ingested
+SCHEDULE_CHECK_INTERVAL = 60  # seconds between checks for due recurring jobs
+
+# Recurring jobs: kind -> seconds between runs
+GC_INTERVAL_HOURS = float(os.getenv("DILBOT_GC_INTERVAL_HOURS", "6"))
+SCHEDULE = {"storage_gc": GC_INTERVAL_HOURS * 3600} if GC_INTERVAL_HOURS > 0 else {}
+if ARCHIVE_AFTER_DAYS > 0:
+    SCHEDULE["archive_journals"] = 24 * 3600
+
+# Job priorities (lower is claimed first): kind -> priority, batch work otherwise
+INTERACTIVE, BATCH = 0, 1
+PRIORITIES = {"tts": INTERACTIVE}
+
+logger = logging.getLogger("dilbot")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    username TEXT,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    priority INTEGER NOT NULL DEFAULT 1,
+    progress REAL,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    run_after REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority, id);
+CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (kind, username);
+"""
+
+
+def connect():
+    os.makedirs(os.path.dirname(JOBS_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    _add_priority_column(conn)
+    conn.executescript(_INDEXES)
+    return conn
+
+
+def _add_priority_column(conn):
+    """Queues created before job priorities: existing jobs become batch work"""
+    if any(column["name"] == "priority" for column in conn.execute("PRAGMA table_info(jobs)")):
+        return
+    try:
+        conn.execute(f"ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT {BATCH}")
+    except sqlite3.OperationalError:
+        # Another process added it first
+        if not any(column["name"] == "priority" for column in conn.execute("PRAGMA table_info(jobs)")):
+            raise
+
+
+def _as_dict(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["args"] = json.loads(job["args"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def submit(kind, args, username=None, max_attempts=3):
+    """Queue a job and return its id (with no workers configured, run it right away)"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    now = time.time()
+    with closing(connect()) as conn:
+        job_id = conn.execute(
+            "INSERT INTO jobs (kind, username, args, max_attempts, priority, created_at, run_after) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, username, json.dumps(args), max_attempts, PRIORITIES.get(kind, BATCH), now, now)
+        ).lastrowid
+    if JOB_WORKERS == 0:
+        with closing(connect()) as conn:
+            while run_next(conn, job_id):
+                pass
+    return job_id
+
+
+def get_job(job_id):
+    with closing(connect()) as conn:
+        return _as_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def latest_job(kind, username=None):
+    with closing(connect()) as conn:
+        return _as_dict(conn.execute(
+            "SELECT * FROM jobs WHERE kind = ? AND username IS ? ORDER BY id DESC LIMIT 1", (kind, username)
+        ).fetchone())
+
+
+def active_jobs(kind=None):
+    """Queued and running jobs, optionally of one kind"""
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE status IN ('queued', 'running') AND (? IS NULL OR kind = ?) ORDER BY id",
+            (kind, kind)
+        ).fetchall()
+    return [_as_dict(row) for row in rows]
+
+
+def prune_finished(older_than_seconds):
+    """Delete finished jobs older than the cutoff (keeping each kind's latest, which the schedule needs)"""
+    with closing(connect()) as conn:
+        return conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ? "
+            "AND id NOT IN (SELECT MAX(id) FROM jobs GROUP BY kind)",
+            (time.time() - older_than_seconds,)
+        ).rowcount
+
+
+def submit_due(conn):
+    """Queue every recurring job whose last run was created more than its interval ago"""
+    for kind, interval in SCHEDULE.items():
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last = conn.execute("SELECT MAX(created_at) FROM jobs WHERE kind = ?", (kind,)).fetchone()[0]
+            if last is None or last <= now - interval:
+                conn.execute("INSERT INTO jobs (kind, args, priority, created_at, run_after) VALUES (?, '{}', ?, ?, ?)",
+                             (kind, PRIORITIES.get(kind, BATCH), now, now))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def set_progress(conn, job_id, fraction=None, message=None):
+    conn.execute("UPDATE jobs SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+                 (fraction, message, time.time(), job_id))
+
+
+def _heartbeat(job_id, stop):
+    """Keep a running job's heartbeat fresh so it is not mistaken for an orphan"""
+    with closing(connect()) as conn:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+
+def _claim(conn, job_id=None, max_priority=BATCH):
+    """Atomically move the next due job up to max_priority (or the given one) from queued to running"""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Jobs whose worker died mid-run go back on the queue
+        conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running' AND heartbeat_at < ?",
+                     (now - STALE_AFTER,))
+        if job_id is None:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? AND priority <= ? "
+                "ORDER BY priority, id LIMIT 1", (now, max_priority)
+            ).fetchone()
+        else:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ? AND status = 'queued' AND run_after <= ?",
+                               (job_id, now)).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, heartbeat_at = ?, "
+                "error = NULL WHERE id = ?", (now, now, row["id"])
+            )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return _as_dict(row)
+
+
+def run_next(conn, job_id=None, max_priority=BATCH):
+    """Claim and run one job; returns False when nothing was due (or job_id is finished)"""
+    job = _claim(conn, job_id, max_priority)
+    if job is None:
+        if job_id is not None:
+            # Inline mode: wait out a retry backoff rather than return an unfinished job
+            pending = conn.execute("SELECT run_after FROM jobs WHERE id = ? AND status = 'queued'",
+                                   (job_id,)).fetchone()
+            if pending is not None:
+                time.sleep(max(0.0, pending["run_after"] - time.time()))
+                return True
+        return False
+
+    def progress(fraction=None, message=None):
+        set_progress(conn, job["id"], fraction, message)
+
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job["id"], stop), daemon=True).start()
+    try:
+        result = HANDLERS[job["kind"]](job["args"], progress)
+    except Exception:
+        error = traceback.format_exc()
+        attempts = job["attempts"] + 1
+        if attempts < job["max_attempts"]:
+            conn.execute("UPDATE jobs SET status = 'queued', error = ?, run_after = ? WHERE id = ?",
+                         (error, time.time() + RETRY_BASE_DELAY * 2 ** (attempts - 1), job["id"]))
+        else:
+            conn.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                         (error, time.time(), job["id"]))
+        logger.warning("job %s (%s) attempt %d failed", job["id"], job["kind"], attempts)
+        return True
+    finally:
+        stop.set()
+
+    conn.execute("UPDATE jobs SET status = 'done', progress = 1.0, result = ?, finished_at = ? WHERE id = ?",
+                 (json.dumps(result), time.time(), job["id"]))
+    return True
+
+
+# Handlers: handler(args, progress) -> JSON-serializable result
+def ingest_quotes_job(args, progress):
+    from storage import ingest_user_quotes
+
+    def report(fraction, stats):
+        progress(fraction, f"{stats['added']} quotes embedded ({stats['duplicates']} duplicates skipped)")
+
+    with open(args["path"], "rb") as quotes_file:
+        vectorstore, stats = ingest_user_quotes(args["username"], quotes_file, progress=report)
+    os.remove(args["path"])
+    return {"stats": stats, "saved": vectorstore is not None}
+
+
+def tts_job(args, progress):
+    from turn_pipeline import synthesize_speech
+    return {"audio_path": synthesize_speech(args["text"], args["username"])}
+
+
+def export_job(args, progress):
+    from export import export_user_data
+    from storage import load_users, get_user_file_path, get_admin_logs
+    progress(None, "Streaming user profiles and journals to the export archive...")
+    archive_path, summary = export_user_data(
+        load_users(),
+        lambda name: get_user_file_path(name, "journal.json"),
+        admin_logs=get_admin_logs(),
+        incremental=args.get("incremental", False)
+    )
+    return {"path": archive_path, "summary": summary}
+
+
+def reset_user_job(args, progress):
+    from storage import reset_user_data
+    return {"removed": reset_user_data(args["username"])}
+
+
+def storage_gc_job(args, progress):
+    from storage_manager import collect_garbage
+    return collect_garbage(dry_run=args.get("dry_run", False), progress=progress)
+
+
+def archive_journals_job(args, progress):
+    from journal_archive import archive_old_entries
+    from storage import load_users, get_user_file_path
+    usernames = [args["username"]] if args.get("username") else sorted(load_users())
+    older_than_days = args.get("older_than_days", ARCHIVE_AFTER_DAYS)
+    moved = {}
+    for i, username in enumerate(usernames):
+        if i % 50 == 0:
+            progress(i / max(len(usernames), 1), f"Archiving old journal entries ({i}/{len(usernames)})")
+        count = archive_old_entries(get_user_file_path(username, "journal.json"), older_than_days)
+        if count:
+            moved[username] = count
+    return {"users": len(moved), "entries": sum(moved.values())}
+
+
+def fleet_analytics_job(args, progress):
+    import analytics
+    from storage import load_users, get_user_file_path
+    journal_paths = [get_user_file_path(username, "journal.json") for username in sorted(load_users())]
+    result = analytics.refresh(journal_paths, args.get("workers", analytics.ANALYTICS_WORKERS), progress)
+    return {key: result[key] for key in ("users", "entries", "seconds", "workers", "version")}
+
+
+HANDLERS = {
+    "ingest_quotes": ingest_quotes_job,
+    "tts": tts_job,
+    "export": export_job,
+    "reset_user": reset_user_job,
+    "storage_gc": storage_gc_job,
+    "archive_journals": archive_journals_job,
+    "fleet_analytics": fleet_analytics_job,
+}
+
+
+def save_upload(username, uploaded_file):
+    """Copy an uploaded file to the user's upload directory so a worker process can read it"""
+    upload_dir = os.path.join("users", username, UPLOAD_DIR)
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{int(time.time() * 1000)}-{os.path.basename(uploaded_file.name)}")
+    uploaded_file.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(uploaded_file, f)
+    return path
+
+
+# Workers
+def worker_loop(parent_pid=None, max_priority=BATCH):
+    with closing(connect()) as conn:
+        next_schedule_check = 0
+        while True:
+            if parent_pid is not None and os.getppid() != parent_pid:
+                logger.info("job worker %d exiting: its parent process is gone", os.getpid())
+                return
+            try:
+                if time.time() >= next_schedule_check:
+                    submit_due(conn)
+                    next_schedule_check = time.time() + SCHEDULE_CHECK_INTERVAL
+                if not run_next(conn, max_priority=max_priority):
+                    time.sleep(POLL_INTERVAL)
+            except sqlite3.OperationalError:
+                logger.exception("job queue unavailable")
+                time.sleep(POLL_INTERVAL * 10)
+
+
+def start_workers(num_workers=JOB_WORKERS):
+    """Start worker processes (spawned, so they never inherit a half-loaded model or lock)
+
+    They are not daemonic, so a job can run its own process pool (quote ingest,
+    fleet analytics); they are terminated at interpreter exit instead, and stop
+    by themselves if this process is killed. With two or more, the first is kept
+    for interactive jobs.
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for i in range(num_workers):
+        max_priority = INTERACTIVE if i == 0 and num_workers > 1 else BATCH
+        process = context.Process(target=worker_loop, args=(os.getpid(), max_priority),
+                                  name=f"dilbot-job-worker-{i}")
+        process.start()
+        workers.append(process)
+    atexit.register(_stop_workers, workers)
+    return workers
+
+
+def _stop_workers(workers):
+    # Registered after multiprocessing's own exit handler, so it runs first; a running job is retried later
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    for process in workers:
+        process.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run DilBot background job workers")
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    workers = start_workers(args.workers)
+    for process in workers:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# Cold-tier archive for journal entries older than DILBOT_ARCHIVE_AFTER_DAYS.
+#
+# Old entries move out of journal.json into one gzip-compressed NDJSON segment
+# per month (journal_archive/2024-03.ndjson.gz). index.json next to them keeps
+# per-month aggregates (entry count, emotion counts, confidence sum, per-day
+# emotion counts), so the dashboard's totals and charts never open a segment.
+# Hot reads (load_user_journal) only see recent entries. Archived months stay
+# readable by date range, exportable and downloadable per month.
+#
+# An interrupted archive run is safe to repeat: index.json records the
+# timestamp of the last archived entry ("archived_through"), segments drop
+# anything newer than that before adding a batch, and journal.json is only
+# replaced after the index is saved.
+import os, json, gzip, textwrap, datetime
+from journal_store import iter_journal_entries, journal_lock
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("DILBOT_ARCHIVE_AFTER_DAYS", "90"))  # 0 = never archive
+ARCHIVE_DIR = "journal_archive"
+INDEX_FILE = "index.json"
+
+
+def archive_dir(journal_path):
+    return os.path.join(os.path.dirname(journal_path), ARCHIVE_DIR)
+
+
+def segment_path(journal_path, month):
+    return os.path.join(archive_dir(journal_path), f"{month}.ndjson.gz")
+
+
+def load_index(journal_path):
+    index_path = os.path.join(archive_dir(journal_path), INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            return json.load(f)
+    return {"archived_through": None, "months": {}}
+
+
+def _save_index(journal_path, index):
+    index_path = os.path.join(archive_dir(journal_path), INDEX_FILE)
+    with open(index_path + ".partial", "w") as f:
+        json.dump(index, f, indent=4)
+    os.replace(index_path + ".partial", index_path)
+
+
+def _read_segment(path):
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _month_stats(entries, path):
+    emotion_counts = {}
+    daily = {}
+    for entry in entries:
+        emotion_counts[entry["emotion"]] = emotion_counts.get(entry["emotion"], 0) + 1
+        day = daily.setdefault(entry["date"], {})
+        day[entry["emotion"]] = day.get(entry["emotion"], 0) + 1
+    return {
+        "entries": len(entries),
+        "emotion_counts": emotion_counts,
+        "confidence_sum": sum(entry["confidence"] for entry in entries),
+        "daily": daily,
+        "first_date": entries[0]["date"],
+        "last_date": entries[-1]["date"],
+        "bytes": os.path.getsize(path),
+    }
+
+
+def _write_segment(journal_path, index, month, batch, archived_through):
+    """Add a batch to a month's segment (dropping leftovers of an interrupted run) and re-index it"""
+    path = segment_path(journal_path, month)
+    entries = [entry for entry in _read_segment(path)
+               if archived_through is not None and entry["timestamp"] <= archived_through]
+    entries.extend(batch)
+    with gzip.open(path + ".partial", "wt", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(path + ".partial", path)
+    index["months"][month] = _month_stats(entries, path)
+
+
+def archive_old_entries(journal_path, older_than_days=ARCHIVE_AFTER_DAYS, today=None):
+    """Move entries dated more than older_than_days ago into monthly segments; returns how many moved"""
+    if older_than_days <= 0 or not os.path.exists(journal_path):
+        return 0
+    cutoff = str((today or datetime.date.today()) - datetime.timedelta(days=older_than_days))
+    with journal_lock(journal_path):
+        index = load_index(journal_path)
+        archived_through = index["archived_through"]
+        os.makedirs(archive_dir(journal_path), exist_ok=True)
+
+        moved = 0
+        kept = 0
+        last_archived = None
+        month, batch = None, []
+        # Entries are in write order, so months arrive one after another
+        with open(journal_path + ".partial", "w", encoding="utf-8") as hot:
+            hot.write("[")
+            for entry in iter_journal_entries(journal_path):
+                if entry["date"] >= cutoff:
+                    hot.write(("," if kept else "") + "\n" + textwrap.indent(json.dumps(entry, indent=4), "    "))
+                    kept += 1
+                    continue
+                if archived_through is not None and entry["timestamp"] <= archived_through:
+                    continue  # archived by an interrupted run, still in journal.json
+                if entry["date"][:7] != month:
+                    if batch:
+                        _write_segment(journal_path, index, month, batch, archived_through)
+                    month, batch = entry["date"][:7], []
+                batch.append(entry)
+                moved += 1
+                last_archived = entry["timestamp"]
+            if batch:
+                _write_segment(journal_path, index, month, batch, archived_through)
+            hot.write("\n]")
+
+        if last_archived is not None:
+            index["archived_through"] = last_archived
+            _save_index(journal_path, index)
+        os.replace(journal_path + ".partial", journal_path)
+    return moved
+
+
+def summary(journal_path):
+    """Aggregates over all archived months, from the index alone"""
+    index = load_index(journal_path)
+    result = {"entries": 0, "emotion_counts": {}, "confidence_sum": 0.0, "daily": {},
+              "first_date": None, "last_date": None, "months": {}}
+    for month in sorted(index["months"]):
+        stats = index["months"][month]
+        result["entries"] += stats["entries"]
+        result["confidence_sum"] += stats["confidence_sum"]
+        for emotion, count in stats["emotion_counts"].items():
+            result["emotion_counts"][emotion] = result["emotion_counts"].get(emotion, 0) + count
+        result["daily"].update(stats["daily"])
+        result["first_date"] = result["first_date"] or stats["first_date"]
+        result["last_date"] = stats["last_date"]
+        result["months"][month] = {"entries": stats["entries"], "bytes": stats["bytes"]}
+    return result
+
+
+def iter_archived_entries(journal_path, start_date=None, end_date=None):
+    """Archived entries in write order, opening only the months that overlap the date range"""
+    index = load_index(journal_path)
+    for month in sorted(index["months"]):
+        stats = index["months"][month]
+        if (start_date and stats["last_date"] < str(start_date)) or (end_date and stats["first_date"] > str(end_date)):
+            continue
+        for entry in _read_segment(segment_path(journal_path, month)):
+            if (start_date and entry["date"] < str(start_date)) or (end_date and entry["date"] > str(end_date)):
+                continue
+            yield entry
+
+
+def iter_archived_month(journal_path, month):
+    """Archived entries of one "YYYY-MM" month, in write order"""
+    if month not in load_index(journal_path)["months"]:
+        return
+    yield from _read_segment(segment_path(journal_path, month))
+
+
+def iter_full_journal(journal_path):
+    """Every entry, archived months first, then the hot journal"""
+    yield from iter_archived_entries(journal_path)
+    yield from iter_journal_entries(journal_path)
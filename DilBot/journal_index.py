@@ -0,0 +1,290 @@
+# Per-user semantic index over journal entries.
+#
+# Layout of an index directory (users/<name>/journal_index):
+#   vectors.f32  - raw float32 rows, one normalized embedding per entry (append-only)
+#   meta.jsonl   - one JSON line per entry (timestamp, date, emotion, user_input, response)
+#   meta.idx     - uint64 byte offsets into meta.jsonl, one per entry
+#   info.json    - embedding dimension
+#
+# Rows are only ever appended, so saving a turn costs one small write per file
+# and history is never re-embedded. Searches run against an in-process cache of
+# the vectors plus date/emotion columns, so filtering and scoring are a single
+# vectorized pass even at tens of thousands of entries.
+#
+# An entry is embedded by its user_input only: the turn already computed that
+# embedding, so indexing costs no extra model pass. The response is kept in
+# meta.jsonl and returned with each match.
+#
+# Entries are added under the journal's lock (storage._write_journal_batch and
+# backfill), and backfill matches entries by timestamp rather than position,
+# so an entry is never indexed twice. Entries without a timestamp (written
+# before timestamps existed) are not indexed.
+#
+# The cache remembers the file sizes and the vectors file's inode it was built
+# from, and is dropped whenever they differ from disk, so an index another
+# process deleted, rebuilt or appended to is reloaded, never appended to.
+import os, json, threading
+import numpy as np
+from memory_profile import register_cache
+from journal_store import journal_lock
+from journal_archive import iter_full_journal
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.jsonl"
+OFFSETS_FILE = "meta.idx"
+INFO_FILE = "info.json"
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _cache_stats():
+    """(indexes, bytes) held by the in-process cache"""
+    with _lock:
+        cached = list(_cache.values())
+    return len(cached), sum(entry[key].nbytes for entry in cached
+                            for key in ("vectors", "offsets", "dates", "emotions") if key in entry)
+
+
+register_cache("journal_index", _cache_stats)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _read_dim(index_dir):
+    info_path = os.path.join(index_dir, INFO_FILE)
+    if os.path.exists(info_path):
+        with open(info_path, "r") as f:
+            return json.load(f)["dim"]
+    return None
+
+
+def _stamp(index_dir):
+    """(vectors size, offsets size, vectors inode): what a cached view was loaded from"""
+    try:
+        info = os.stat(os.path.join(index_dir, VECTORS_FILE))
+        vectors_size, inode = info.st_size, info.st_ino
+    except FileNotFoundError:
+        vectors_size, inode = 0, None
+    offsets_path = os.path.join(index_dir, OFFSETS_FILE)
+    offsets_size = os.path.getsize(offsets_path) if os.path.exists(offsets_path) else 0
+    return vectors_size, offsets_size, inode
+
+
+def invalidate(index_dir):
+    """Forget the cached view (the index was changed or removed by someone else)"""
+    with _lock:
+        _cache.pop(index_dir, None)
+
+
+def _load(index_dir):
+    """Load (or reuse) the in-memory view of an index directory"""
+    dim = _read_dim(index_dir)
+    if dim is None:
+        _cache.pop(index_dir, None)
+        return None
+
+    vectors_path = os.path.join(index_dir, VECTORS_FILE)
+    offsets_path = os.path.join(index_dir, OFFSETS_FILE)
+    stamp = _stamp(index_dir)
+    vectors_size, offsets_size, _ = stamp
+
+    cached = _cache.get(index_dir)
+    if cached and cached["stamp"] == stamp:
+        return cached
+
+    # A crash between the three appends can leave one file a row ahead; the
+    # shortest file decides how many entries are complete.
+    count = min(vectors_size // (4 * dim), offsets_size // 8)
+    vectors = np.fromfile(vectors_path, dtype=np.float32, count=count * dim).reshape(count, dim)
+    offsets = np.fromfile(offsets_path, dtype=np.uint64, count=count)
+
+    dates, emotions = [], []
+    with open(os.path.join(index_dir, META_FILE), "rb") as f:
+        for offset in offsets:
+            f.seek(int(offset))
+            meta = json.loads(f.readline())
+            dates.append(meta["date"])
+            emotions.append(meta["emotion"])
+
+    cached = {"dim": dim, "count": 0, "stamp": None}
+    _reserve(cached, max(count, 64))
+    cached["vectors"][:count] = vectors
+    cached["offsets"][:count] = offsets
+    cached["dates"][:count] = np.array(dates, dtype="datetime64[D]")
+    cached["emotions"][:count] = emotions
+    cached["count"] = count
+    cached["stamp"] = stamp
+    _cache[index_dir] = cached
+    return cached
+
+
+def _reserve(cached, capacity):
+    """Grow the cached columns geometrically so appends stay amortized O(1)"""
+    current = cached["vectors"].shape[0] if "vectors" in cached else 0
+    if capacity <= current:
+        return
+    capacity = max(capacity, current * 2)
+    count = cached["count"]
+    columns = {
+        "vectors": np.zeros((capacity, cached["dim"]), dtype=np.float32),
+        "offsets": np.zeros(capacity, dtype=np.uint64),
+        "dates": np.zeros(capacity, dtype="datetime64[D]"),
+        "emotions": np.empty(capacity, dtype=object),
+    }
+    for name, column in columns.items():
+        if name in cached:
+            column[:count] = cached[name][:count]
+        cached[name] = column
+
+
+def _truncate_torn_rows(index_dir, dim):
+    """Cut every file back to the rows complete in all of them, so the next append stays aligned"""
+    vectors_path = os.path.join(index_dir, VECTORS_FILE)
+    offsets_path = os.path.join(index_dir, OFFSETS_FILE)
+    meta_path = os.path.join(index_dir, META_FILE)
+    vectors_size = os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0
+    offsets_size = os.path.getsize(offsets_path) if os.path.exists(offsets_path) else 0
+    meta_size = os.path.getsize(meta_path) if os.path.exists(meta_path) else 0
+    count = min(vectors_size // (4 * dim), offsets_size // 8)
+
+    meta_end = 0
+    if count:
+        last_offset = int(np.fromfile(offsets_path, dtype=np.uint64, count=1, offset=(count - 1) * 8)[0])
+        with open(meta_path, "rb") as f:
+            f.seek(last_offset)
+            meta_end = last_offset + len(f.readline())
+    if (vectors_size, offsets_size, meta_size) != (count * 4 * dim, count * 8, meta_end):
+        for path, size in ((vectors_path, count * 4 * dim), (offsets_path, count * 8), (meta_path, meta_end)):
+            if os.path.exists(path):
+                os.truncate(path, size)
+    cached = _cache.get(index_dir)
+    if cached is not None and cached["stamp"] != _stamp(index_dir):
+        _cache.pop(index_dir, None)  # truncated here, or changed by another process
+
+
+def add_entry(index_dir, entry, embedding):
+    """Append one journal entry and its precomputed embedding (call under the journal lock); False if not indexed"""
+    if not entry.get("timestamp"):
+        return False  # backfill could not tell it apart from other entries
+    vector = _normalize(embedding)
+    os.makedirs(index_dir, exist_ok=True)
+
+    with _lock:
+        dim = _read_dim(index_dir)
+        if dim is None:
+            dim = int(vector.shape[0])
+            with open(os.path.join(index_dir, INFO_FILE), "w") as f:
+                json.dump({"dim": dim}, f)
+        if vector.shape[0] != dim:
+            raise ValueError(f"Embedding has dimension {vector.shape[0]}, index expects {dim}")
+        _truncate_torn_rows(index_dir, dim)
+
+        meta = {
+            "timestamp": entry["timestamp"],
+            "date": entry["date"],
+            "emotion": entry["emotion"],
+            "user_input": entry["user_input"],
+            "response": entry["response"],
+        }
+        with open(os.path.join(index_dir, META_FILE), "ab") as f:
+            offset = f.tell()
+            f.write((json.dumps(meta) + "\n").encode("utf-8"))
+        with open(os.path.join(index_dir, VECTORS_FILE), "ab") as f:
+            f.write(vector.tobytes())
+        with open(os.path.join(index_dir, OFFSETS_FILE), "ab") as f:
+            f.write(np.uint64(offset).tobytes())
+
+        # Keep an already-loaded cache current instead of reloading from disk
+        cached = _cache.get(index_dir)
+        if cached is not None:
+            count = cached["count"]
+            _reserve(cached, count + 1)
+            cached["vectors"][count] = vector
+            cached["offsets"][count] = offset
+            cached["dates"][count] = np.datetime64(entry["date"], "D")
+            cached["emotions"][count] = entry["emotion"]
+            cached["count"] = count + 1
+            cached["stamp"] = _stamp(index_dir)
+    return True
+
+
+def entry_count(index_dir):
+    """Number of entries currently indexed"""
+    with _lock:
+        cached = _load(index_dir)
+    return 0 if cached is None else cached["count"]
+
+
+def search(index_dir, query_embedding, k=5, start_date=None, end_date=None, emotions=None):
+    """Find the k most similar past entries, optionally filtered by date range and emotions"""
+    with _lock:
+        cached = _load(index_dir)
+    if cached is None or cached["count"] == 0:
+        return []
+
+    count = cached["count"]
+    mask = np.ones(count, dtype=bool)
+    if start_date:
+        mask &= cached["dates"][:count] >= np.datetime64(str(start_date), "D")
+    if end_date:
+        mask &= cached["dates"][:count] <= np.datetime64(str(end_date), "D")
+    if emotions:
+        mask &= np.isin(cached["emotions"][:count], [e.lower() for e in emotions])
+
+    candidates = np.flatnonzero(mask)
+    if candidates.size == 0:
+        return []
+
+    query = _normalize(query_embedding)
+    if candidates.size == count:
+        scores = cached["vectors"][:count] @ query  # no filter: score the view, skip the gather copy
+    else:
+        scores = cached["vectors"][candidates] @ query
+    k = min(k, candidates.size)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+
+    results = []
+    with open(os.path.join(index_dir, META_FILE), "rb") as f:
+        for i in top:
+            f.seek(int(cached["offsets"][candidates[i]]))
+            meta = json.loads(f.readline())
+            meta["similarity"] = float(scores[i])
+            results.append(meta)
+    return results
+
+
+def _indexed_timestamps(index_dir):
+    with _lock:
+        cached = _load(index_dir)
+    if cached is None:
+        return set()
+    timestamps = set()
+    with open(os.path.join(index_dir, META_FILE), "rb") as f:
+        for offset in cached["offsets"][:cached["count"]]:
+            f.seek(int(offset))
+            timestamps.add(json.loads(f.readline())["timestamp"])
+    return timestamps
+
+
+def backfill(index_dir, journal_path, encode):
+    """Index journal entries (archived months included) that are not in the index yet, in one encode call.
+
+    Holds the journal lock throughout, so the journal writer cannot index the
+    same entries in between.
+    """
+    with journal_lock(journal_path):
+        indexed = _indexed_timestamps(index_dir)
+        missing = [entry for entry in iter_full_journal(journal_path)
+                   if entry.get("timestamp") and entry["timestamp"] not in indexed]
+        if not missing:
+            return 0
+        embeddings = encode([entry["user_input"] for entry in missing])
+        for entry, embedding in zip(missing, embeddings):
+            add_entry(index_dir, entry, embedding)
+    return len(missing)
@@ -0,0 +1,117 @@
+# Write-behind queue for journal entries, so a turn never waits on the disk.
+#
+#   queue = WriteBehindQueue(write_batch)
+#   queue.submit("alice", entry)              # returns immediately
+#   queue.submit("alice", entry, durable=True)  # returns once the entry is on disk
+#   queue.pending("alice")                     # queued, not yet written
+#
+# A background thread hands each key's queued items to write_batch(key, items,
+# durable) at most DILBOT_JOURNAL_FLUSH_MS after they were submitted (sooner
+# once DILBOT_JOURNAL_MAX_PENDING items are waiting), so a crash loses at most
+# that window. DILBOT_JOURNAL_DURABLE=1 makes every submit synchronous and
+# fsynced. Pending items are flushed at interpreter exit.
+import os, time, atexit, logging, threading
+import metrics
+
+FLUSH_INTERVAL = float(os.getenv("DILBOT_JOURNAL_FLUSH_MS", "500")) / 1000
+MAX_PENDING = int(os.getenv("DILBOT_JOURNAL_MAX_PENDING", "64"))  # items across all keys before an early flush
+DURABLE = os.getenv("DILBOT_JOURNAL_DURABLE", "0") == "1"
+RETRY_DELAY = 1.0  # seconds before a failed batch is written again
+
+logger = logging.getLogger("dilbot")
+
+
+class WriteBehindQueue:
+    def __init__(self, write_batch, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING, durable=DURABLE):
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.durable = durable
+        self._pending = {}  # key -> [item, ...] in submit order
+        self._count = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._key_locks = {}  # one writer per key, so batches land in submit order
+        self._thread = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="journal-write-behind", daemon=True)
+            self._thread.start()
+
+    def submit(self, key, item, durable=None):
+        """Queue an item for key; with durable (or DILBOT_JOURNAL_DURABLE) wait until it is fsynced"""
+        durable = self.durable if durable is None else durable
+        with self._lock:
+            self._pending.setdefault(key, []).append(item)
+            self._count += 1
+            metrics.set_gauge("journal_pending_entries", self._count)
+            if not durable and not self._closed:
+                self._ensure_thread()
+                if self._count >= self.max_pending:
+                    self._wake.set()
+        if durable or self._closed:
+            self.flush(key, durable=True)
+
+    def pending(self, key):
+        """Items for key that are queued or being written (a copy)"""
+        with self._lock:
+            return list(self._pending.get(key, ()))
+
+    def discard(self, key):
+        """Drop queued items for key (its data is being deleted)"""
+        with self._key_lock(key):
+            with self._lock:
+                self._count -= len(self._pending.pop(key, ()))
+                metrics.set_gauge("journal_pending_entries", self._count)
+
+    def flush(self, key=None, durable=False):
+        """Write queued items now (for one key, or all); errors propagate to the caller"""
+        keys = [key] if key is not None else self._keys()
+        for k in keys:
+            with self._key_lock(k):
+                with self._lock:
+                    items = list(self._pending.get(k, ()))
+                if not items:
+                    continue
+                with metrics.span("journal_flush"):
+                    self.write_batch(k, items, durable)
+                # Items stay visible to pending() until they are on disk
+                with self._lock:
+                    remaining = self._pending.get(k, [])[len(items):]
+                    if remaining:
+                        self._pending[k] = remaining
+                    else:
+                        self._pending.pop(k, None)
+                    self._count -= len(items)
+                    metrics.set_gauge("journal_pending_entries", self._count)
+
+    def _keys(self):
+        with self._lock:
+            return list(self._pending)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            for key in self._keys():
+                try:
+                    self.flush(key)
+                except Exception:
+                    logger.exception("Journal write-behind flush failed for %s; retrying", key)
+                    time.sleep(RETRY_DELAY)
+
+    def close(self):
+        """Flush everything durably and stop queueing in the background"""
+        self._closed = True
+        self._wake.set()
+        try:
+            self.flush(durable=True)
+        except Exception:
+            logger.exception("Journal write-behind flush at exit failed")
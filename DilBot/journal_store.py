@@ -0,0 +1,58 @@
+# Streaming access to on-disk journals (users/<name>/journal.json).
+#
+# journal.json is a single JSON array. These helpers walk it entry by entry
+# with a fixed-size read buffer, so callers that only aggregate or copy
+# entries never hold a whole journal in memory. journal_lock() serializes
+# everything that rewrites a journal, across threads and processes.
+import os, json, fcntl
+from contextlib import contextmanager
+
+READ_CHUNK = 64 * 1024
+
+
+def iter_journal_entries(journal_path, chunk_size=READ_CHUNK):
+    """Yield journal entries one at a time from a JSON-array journal file"""
+    if not os.path.exists(journal_path):
+        return
+    decoder = json.JSONDecoder()
+    with open(journal_path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            # Skip whitespace and the array punctuation between entries
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+                if buffer[pos] == "[":
+                    started = True
+                elif buffer[pos] == "]":
+                    return
+                pos += 1
+            if pos < len(buffer) and started:
+                try:
+                    entry, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                else:
+                    yield entry
+                    continue
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+@contextmanager
+def journal_lock(journal_path):
+    """Exclusive lock for read-modify-write of one journal (and its archive)"""
+    os.makedirs(os.path.dirname(journal_path) or ".", exist_ok=True)
+    with open(journal_path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,335 @@
+# Hedged LLM calls: a primary model with a secondary fallback, to cut tail latency.
+#
+#   llm = HedgedLLM(primary=lambda http_client: ChatGroq(..., http_client=http_client),
+#                   secondary=lambda http_client: ChatGroq(model=..., http_client=http_client), hedge_after=2.0)
+#   LLMChain(llm=llm, prompt=...).run(...)
+#
+# The primary is streamed. If it has not produced a first token within
+# hedge_after seconds (DILBOT_LLM_HEDGE_MS, off unless set), or fails before
+# then, the same prompt goes to the secondary model/provider as well, and
+# whichever finishes first with a complete answer wins. Attempts share one
+# pooled HTTP client, so a turn reuses a kept-alive connection instead of
+# paying a TCP and TLS handshake; the loser's connection alone is shut down, so
+# a loser still waiting for its first byte gives back its thread at once
+# instead of at the request timeout. hedge_stats() reports
+# how often requests were hedged, which side won, and an estimate of the time
+# saved.
+import time, socket, threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Optional
+import httpx
+import httpcore
+from langchain_core.language_models.llms import LLM
+import metrics
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "hedged": 0,            # secondary started because the primary was slow
+    "fallbacks": 0,         # secondary started because the primary failed
+    "secondary_wins": 0,
+    "failures": 0,          # every started attempt failed
+    "saved_seconds": 0.0,   # estimated, see _estimate_saving
+    "primary_stream_seconds": None,  # moving average, first token to last, of unhedged primary calls
+}
+_STREAM_AVERAGE_WEIGHT = 0.1
+
+
+def _bump(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+    metrics.increment(f"llm_{key}", amount)
+
+
+def hedge_stats():
+    """Counts plus hedge rate, secondary win rate and estimated seconds saved"""
+    with _stats_lock:
+        stats = dict(_stats)
+    calls = stats["calls"] or 1
+    stats["hedge_rate"] = (stats["hedged"] + stats["fallbacks"]) / calls
+    stats["secondary_win_rate"] = stats["secondary_wins"] / max(stats["hedged"] + stats["fallbacks"], 1)
+    return stats
+
+
+class _TrackedStream(httpcore.NetworkStream):
+    """A pooled connection that tells its backend which attempt is using it"""
+
+    def __init__(self, stream, backend, handle):
+        self._stream = stream
+        self._backend = backend
+        self._handle = handle
+
+    def read(self, max_bytes, timeout=None):
+        return self._stream.read(max_bytes, timeout)
+
+    def write(self, buffer, timeout=None):
+        self._backend.using(self._handle)  # every request starts by writing, on its own thread
+        self._stream.write(buffer, timeout)
+
+    def close(self):
+        self._stream.close()
+        self._backend.forget(self._handle)
+
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        try:
+            stream = self._stream.start_tls(ssl_context, server_hostname, timeout)
+        except Exception:
+            self._backend.forget(self._handle)  # the plain stream closed itself
+            raise
+        return _TrackedStream(stream, self._backend, self._handle)
+
+    def get_extra_info(self, info):
+        return self._stream.get_extra_info(info)
+
+
+class _AbortableBackend(httpcore.SyncBackend):
+    """Network backend whose connections another thread can cut, one attempt at a time.
+
+    Closing a socket does not wake a thread blocked reading it; shutting it
+    down does. A duplicate of each socket is kept for that (shutdown acts on
+    the connection, so it also reaches the TLS socket wrapped around it), and
+    each attempt's thread is bound to the connection it last wrote to, so
+    aborting an attempt leaves the other pooled connections alone.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._in_use = {}  # attempt -> socket handle
+        self._aborted = set()
+
+    def bind(self, attempt):
+        """Attribute this thread's requests to attempt (until release)"""
+        self._local.attempt = attempt
+
+    def release(self):
+        attempt, self._local.attempt = getattr(self._local, "attempt", None), None
+        with self._lock:
+            self._in_use.pop(attempt, None)
+            self._aborted.discard(attempt)
+
+    def connect_tcp(self, *args, **kwargs):
+        stream = super().connect_tcp(*args, **kwargs)
+        handle = stream.get_extra_info("socket").dup()
+        self.using(handle)
+        return _TrackedStream(stream, self, handle)
+
+    def using(self, handle):
+        attempt = getattr(self._local, "attempt", None)
+        if attempt is None:
+            return
+        with self._lock:
+            self._in_use[attempt] = handle
+            if attempt in self._aborted:
+                _shutdown(handle)
+
+    def forget(self, handle):
+        with self._lock:
+            for attempt in [a for a, used in self._in_use.items() if used is handle]:
+                del self._in_use[attempt]
+            handle.close()
+
+    def abort(self, attempt):
+        with self._lock:
+            self._aborted.add(attempt)
+            if attempt in self._in_use:
+                _shutdown(self._in_use[attempt])
+
+
+def _shutdown(handle):
+    try:
+        handle.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed by either side
+
+
+class _PoolTransport(httpx.BaseTransport):
+    """httpx transport over an httpcore connection pool with a custom network backend"""
+
+    def __init__(self, network_backend):
+        # httpx's own defaults for limits and TLS
+        self._pool = httpcore.ConnectionPool(ssl_context=httpx.create_ssl_context(), max_connections=100,
+                                             max_keepalive_connections=20, keepalive_expiry=5.0,
+                                             network_backend=network_backend)
+
+    def handle_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=request.url.raw_scheme, host=request.url.raw_host, port=request.url.port,
+                             target=request.url.raw_path),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = self._pool.handle_request(core_request)
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=_ResponseStream(response.stream), extensions=response.extensions)
+
+    def close(self):
+        self._pool.close()
+
+
+class _ResponseStream(httpx.SyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __iter__(self):
+        with _httpx_errors():
+            yield from self._stream
+
+    def close(self):
+        self._stream.close()
+
+
+_HTTPCORE_ERRORS = (httpcore.TimeoutException, httpcore.NetworkError, httpcore.ProtocolError,
+                    httpcore.UnsupportedProtocol, httpcore.ProxyError)
+
+
+@contextmanager
+def _httpx_errors():
+    """Raise httpcore errors as the httpx errors of the same name, as httpx's own transport does"""
+    try:
+        yield
+    except _HTTPCORE_ERRORS as e:
+        raise getattr(httpx, type(e).__name__, httpx.TransportError)(str(e)) from e
+
+
+_backend = _AbortableBackend()
+
+
+@lru_cache(maxsize=None)
+def _http_client():
+    """The process-wide pooled client every attempt shares (connections are kept alive between calls)"""
+    return httpx.Client(transport=_PoolTransport(_backend))
+
+
+class _Attempt:
+    def __init__(self, name, make_model):
+        self.name = name
+        self.make_model = make_model
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        self.finished_at = None
+        self.text = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def cancel(self):
+        """Stop the attempt, even one blocked before its first byte"""
+        self.cancelled.set()
+        _backend.abort(self)
+
+    def run(self, prompt, stop, changed):
+        parts = []
+        stream = None
+        _backend.bind(self)
+        try:
+            stream = self.make_model(_http_client()).stream(prompt, stop=stop)
+            for chunk in stream:
+                if self.cancelled.is_set():
+                    return
+                if self.first_token_at is None:
+                    self.first_token_at = time.monotonic()
+                    changed.set()
+                parts.append(getattr(chunk, "content", chunk))
+            self.text = "".join(parts)
+        except Exception as e:
+            self.error = e
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            _backend.release()
+            self.finished_at = time.monotonic()
+            self.done.set()
+            changed.set()
+
+    @property
+    def succeeded(self):
+        return self.done.is_set() and self.error is None and self.text is not None
+
+
+class HedgedLLM(LLM):
+    """LangChain LLM racing a secondary model against a slow primary.
+
+    primary and secondary take an httpx client and return the chat model to
+    stream from on it (built per attempt, on the shared pooled client).
+    """
+    primary: Callable[[httpx.Client], Any]
+    secondary: Optional[Callable[[httpx.Client], Any]] = None
+    hedge_after: float = 2.0  # seconds without a first token before the secondary is tried
+
+    @property
+    def _llm_type(self):
+        return "dilbot-hedged"
+
+    def _start(self, name, make_model, prompt, stop, changed):
+        attempt = _Attempt(name, make_model)
+        threading.Thread(target=attempt.run, args=(prompt, stop, changed), daemon=True,
+                         name=f"llm-{name}").start()
+        return attempt
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        _bump("calls")
+        changed = threading.Event()
+        primary = self._start("primary", self.primary, prompt, stop, changed)
+        secondary = None
+        hedge_at = primary.started_at + self.hedge_after
+        while True:
+            waiting_to_hedge = secondary is None and self.secondary is not None and primary.first_token_at is None
+            timeout = max(0.0, hedge_at - time.monotonic()) if waiting_to_hedge else None
+            changed.wait(timeout)
+            changed.clear()
+
+            winner = next((a for a in (primary, secondary) if a is not None and a.succeeded), None)
+            if winner is not None:
+                loser = secondary if winner is primary else primary
+                if loser is not None and not loser.done.is_set():
+                    loser.cancel()
+                self._record(winner, primary, secondary)
+                return winner.text
+
+            if secondary is None and self.secondary is not None:
+                slow = primary.first_token_at is None and time.monotonic() >= hedge_at
+                if primary.error is not None or slow:
+                    _bump("fallbacks" if primary.error is not None else "hedged")
+                    secondary = self._start("secondary", self.secondary, prompt, stop, changed)
+                    continue
+
+            attempts = [a for a in (primary, secondary) if a is not None]
+            if all(a.done.is_set() for a in attempts) and (secondary is not None or self.secondary is None):
+                _bump("failures")
+                raise attempts[-1].error or RuntimeError("LLM returned no answer")
+
+    def _record(self, winner, primary, secondary):
+        metrics.observe(f"llm_{winner.name}", winner.finished_at - winner.started_at)
+        if primary.first_token_at is not None:
+            metrics.observe("llm_first_token", primary.first_token_at - primary.started_at)
+        if winner is primary:
+            if secondary is None and primary.first_token_at is not None:
+                stream_seconds = primary.finished_at - primary.first_token_at
+                with _stats_lock:
+                    average = _stats["primary_stream_seconds"]
+                    _stats["primary_stream_seconds"] = stream_seconds if average is None else \
+                        average + _STREAM_AVERAGE_WEIGHT * (stream_seconds - average)
+            return
+        _bump("secondary_wins")
+        saved = self._estimate_saving(winner, primary)
+        if saved is not None:
+            _bump("saved_seconds", saved)
+            metrics.observe("llm_hedge_saved", saved)
+
+    @staticmethod
+    def _estimate_saving(winner, primary):
+        """Lower bound on the time the secondary saved over waiting for the primary.
+
+        A primary still waiting for its first token when the secondary finished
+        needed at least its usual first-to-last-token streaming time more. For a
+        primary that failed or had started streaming, nothing is claimed.
+        """
+        if primary.error is not None or primary.first_token_at is not None:
+            return None
+        with _stats_lock:
+            return _stats["primary_stream_seconds"]
@@ -0,0 +1,200 @@
+# Memory attribution for one DilBot worker process.
+#
+#   @track_load("emotion_model")       # RSS delta and load time of each model/index load
+#   register_cache("journal_index", fn)  # fn() -> (entries, bytes) for an in-process cache
+#   record_session(session_id, username, st.session_state)  # sampled per-session state size
+#
+# report() gathers all of it for the admin dashboard, and publish() copies it
+# into metrics gauges (run on every /metrics scrape). RSS deltas are measured
+# around the first (cached) load in a process that may be doing other work at
+# the same time, so treat them as attribution, not exact accounting.
+# tracemalloc is off by default; start_tracing()/snapshot() turn it on only
+# while an admin is looking, because tracing slows every allocation.
+import os, sys, time, resource, functools, threading, tracemalloc
+import metrics
+
+ENABLED = os.getenv("DILBOT_MEMORY_PROFILE", "1") != "0"
+SESSION_SAMPLE_SECONDS = 60  # a session's state is measured at most this often
+SESSION_STALE_AFTER = 3600  # seconds before a silent session drops out of the report
+MAX_DEPTH = 6  # how deep deep_sizeof follows containers and attributes
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_loads = {}
+_caches = {}
+_sessions = {}
+_lock = threading.Lock()
+_tracing = {"previous": None}  # last snapshot, for growth between snapshots
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def track_load(name, per_argument=False):
+    """Decorator recording RSS delta and seconds of each call (place it under lru_cache)"""
+    def decorate(load):
+        @functools.wraps(load)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return load(*args, **kwargs)
+            before = rss_bytes()
+            started = time.perf_counter()
+            result = load(*args, **kwargs)
+            key = f"{name}:{args[0]}" if per_argument and args else name
+            with _lock:
+                _loads[key] = {
+                    "rss_delta": rss_bytes() - before,
+                    "seconds": time.perf_counter() - started,
+                    "loaded_at": time.time(),
+                }
+            return result
+        return wrapper
+    return decorate
+
+
+def register_cache(name, stats):
+    """stats() -> (entries, bytes); called whenever a report is built"""
+    _caches[name] = stats
+
+
+def lru_cache_stats(*cached_functions):
+    """(entries, None) for functools.lru_cache loaders whose size is attributed by their load deltas"""
+    return lambda: (sum(fn.cache_info().currsize for fn in cached_functions), None)
+
+
+def deep_sizeof(obj, seen=None, depth=0):
+    """Approximate bytes held by an object graph (numpy arrays and DataFrames by their buffers)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or depth > MAX_DEPTH:
+        return 0
+    seen.add(id(obj))
+    if hasattr(obj, "nbytes") and hasattr(obj, "dtype"):  # numpy array
+        return sys.getsizeof(obj, 0)  # includes the buffer only when the array owns it (not for views)
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):  # pandas DataFrame
+        return int(obj.memory_usage(deep=True).sum())
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict) or (hasattr(obj, "items") and hasattr(obj, "keys")):  # dicts, session state
+        try:
+            items = list(obj.items())
+        except Exception:
+            items = []
+        size += sum(deep_sizeof(k, seen, depth + 1) + deep_sizeof(v, seen, depth + 1) for k, v in items)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen, depth + 1) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen, depth + 1)
+    return size
+
+
+def record_session(session_id, username, state):
+    """Measure a session's state (at most every SESSION_SAMPLE_SECONDS)"""
+    if not ENABLED:
+        return
+    now = time.time()
+    with _lock:
+        entry = _sessions.get(session_id)
+        if entry and now - entry["measured_at"] < SESSION_SAMPLE_SECONDS:
+            entry["seen_at"] = now
+            return
+    per_key = {key: deep_sizeof(value) for key, value in state.items()}
+    with _lock:
+        _sessions[session_id] = {
+            "username": username,
+            "bytes": sum(per_key.values()),
+            "largest": sorted(per_key.items(), key=lambda kv: -kv[1])[:3],
+            "measured_at": now,
+            "seen_at": now,
+        }
+
+
+def _live_sessions():
+    now = time.time()
+    with _lock:
+        for session_id in [sid for sid, entry in _sessions.items() if now - entry["seen_at"] > SESSION_STALE_AFTER]:
+            del _sessions[session_id]
+        return {sid: dict(entry) for sid, entry in _sessions.items()}
+
+
+def report():
+    """Everything for the admin dashboard: RSS, loads, cache sizes, sessions, tracing state"""
+    caches = {}
+    for name, stats in list(_caches.items()):
+        try:
+            entries, size = stats()
+        except Exception as e:
+            caches[name] = {"entries": None, "bytes": None, "error": str(e)}
+            continue
+        caches[name] = {"entries": entries, "bytes": size}
+    with _lock:
+        loads = {name: dict(load) for name, load in _loads.items()}
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes(),
+        "loads": loads,
+        "caches": caches,
+        "sessions": _live_sessions(),
+        "tracing": tracemalloc.is_tracing(),
+    }
+
+
+def publish(current=None):
+    """Copy the report into metrics gauges"""
+    current = current or report()
+    metrics.set_gauge("memory_rss_bytes", current["rss_bytes"])
+    for name, load in current["loads"].items():
+        metrics.set_gauge(f"memory_load_rss_delta_bytes_{_metric_name(name)}", load["rss_delta"])
+    for name, cache in current["caches"].items():
+        if cache["entries"] is not None:
+            metrics.set_gauge(f"memory_cache_entries_{_metric_name(name)}", cache["entries"])
+        if cache["bytes"] is not None:
+            metrics.set_gauge(f"memory_cache_bytes_{_metric_name(name)}", cache["bytes"])
+    metrics.set_gauge("memory_sessions", len(current["sessions"]))
+    metrics.set_gauge("memory_session_state_bytes", sum(s["bytes"] for s in current["sessions"].values()))
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name.lower())
+
+
+# tracemalloc, on demand
+def start_tracing(frames=10):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _tracing["previous"] = None
+
+
+def stop_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _tracing["previous"] = None
+
+
+def snapshot(limit=20, group_by="lineno"):
+    """Top allocation sites since tracing started, with growth since the previous snapshot"""
+    if not tracemalloc.is_tracing():
+        return []
+    current = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    previous = _tracing["previous"]
+    _tracing["previous"] = current
+    if previous is not None:
+        stats = current.compare_to(previous, group_by)
+        return [{"location": str(stat.traceback[0]), "bytes": stat.size, "growth": stat.size_diff,
+                 "blocks": stat.count} for stat in stats[:limit]]
+    return [{"location": str(stat.traceback[0]), "bytes": stat.size, "growth": None, "blocks": stat.count}
+            for stat in current.statistics(group_by)[:limit]]
+
+
+if ENABLED:
+    metrics.add_collector(publish)
@@ -0,0 +1,197 @@
+# Lightweight per-stage latency instrumentation.
+#
+#   with span("similarity_search"):
+#       docs = vectorstore.similarity_search(...)
+#
+# Each named stage feeds a fixed-bucket histogram (log-spaced from 0.1 ms to ~100 s),
+# so recording is a bisect plus a few integer increments and memory never grows.
+# With DILBOT_METRICS=0, span() returns a shared no-op context manager.
+import os, time, logging, threading, bisect
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv("DILBOT_METRICS", "1") != "0"
+METRICS_PORT = int(os.getenv("DILBOT_METRICS_PORT", "0"))  # 0 = no HTTP endpoint
+# Interface for the endpoint; it is unauthenticated, so anything beyond loopback must be asked for
+METRICS_HOST = os.getenv("DILBOT_METRICS_HOST", "127.0.0.1")
+
+# Upper bounds in seconds: 0.1 ms * 1.5^i, up to ~100 s
+BUCKETS = tuple(0.0001 * 1.5 ** i for i in range(35))
+
+_NOOP = nullcontext()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_listeners = []
+_collectors = []
+_lock = threading.Lock()
+
+logger = logging.getLogger("dilbot")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Approximate quantile: upper bound of the bucket holding the q-th observation"""
+        if self.total == 0:
+            return None
+        rank = q * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+
+def observe(stage, seconds):
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+    for listener in _listeners:
+        listener(stage, seconds)
+
+
+def add_listener(listener):
+    """Call listener(stage, seconds) for every raw observation (benchmarks want exact samples)"""
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def span(stage):
+    """Time a block of code under the given stage name"""
+    return _Span(stage) if ENABLED else _NOOP
+
+
+def increment(name, amount=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def counters(prefix=""):
+    """Current counter values, optionally only those whose name starts with prefix"""
+    with _lock:
+        return {name: value for name, value in _counters.items() if name.startswith(prefix)}
+
+
+def set_gauge(name, value):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def add_collector(collector):
+    """collector() runs before each /metrics render, to refresh gauges"""
+    _collectors.append(collector)
+
+
+def stage_summary():
+    """Per-stage count, mean and p50/p95/p99 in milliseconds"""
+    with _lock:
+        items = list(_histograms.items())
+        summary = []
+        for stage, histogram in sorted(items):
+            summary.append({
+                "stage": stage,
+                "count": histogram.total,
+                "mean_ms": histogram.sum / histogram.total * 1000 if histogram.total else 0.0,
+                "p50_ms": histogram.quantile(0.50) * 1000,
+                "p95_ms": histogram.quantile(0.95) * 1000,
+                "p99_ms": histogram.quantile(0.99) * 1000,
+            })
+    return summary
+
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format"""
+    for collector in list(_collectors):
+        collector()
+    lines = ["# TYPE dilbot_stage_seconds histogram"]
+    with _lock:
+        for stage, histogram in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'dilbot_stage_seconds_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'dilbot_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.total}')
+            lines.append(f'dilbot_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'dilbot_stage_seconds_count{{stage="{stage}"}} {histogram.total}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE dilbot_{name} counter")
+            lines.append(f"dilbot_{name} {value}")
+        for name, value in sorted(_gauges.items()):
+            lines.append(f"# TYPE dilbot_{name} gauge")
+            lines.append(f"dilbot_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics from a daemon thread; returns the server, or None if disabled/port taken"""
+    if not ENABLED or not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # Usually another worker process already owns the port; this one's metrics are not served
+        logger.warning("Metrics endpoint not started on %s:%d (%s); this process's metrics are not exported",
+                       host, port, e)
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="dilbot-metrics").start()
+    return server
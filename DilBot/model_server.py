@@ -0,0 +1,279 @@
+# Shared model server: one process owns the emotion and sentence models and
+# serves every DilBot worker over a Unix socket.
+#
+#   python model_server.py --socket data/model_server.sock
+#   DILBOT_MODEL_SERVER=data/model_server.sock streamlit run app.py
+#
+# Without it, every Streamlit, API and job worker loads its own copy of both
+# models. With DILBOT_MODEL_SERVER set, models.detect_emotion_profile,
+# models.encode_text and models.load_embeddings become thin clients of this
+# server. Requests arriving within DILBOT_MODEL_BATCH_WAIT_MS of each other are
+# served by one batched forward pass (up to DILBOT_MODEL_MAX_BATCH texts).
+#
+# Clients pickle their requests, so only the server's own user may connect: the
+# socket is created owner-only, and the handshake key is either
+# DILBOT_MODEL_SERVER_KEY or a random one the server writes, owner-only, next to
+# the socket (<socket>.key) for clients to read.
+import os, math, time, queue, logging, argparse, secrets, threading
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import metrics
+
+SOCKET_PATH = os.getenv("DILBOT_MODEL_SERVER", "data/model_server.sock")
+# Shared secret for the connection handshake; unset, each server start makes a random one
+AUTH_KEY = os.getenv("DILBOT_MODEL_SERVER_KEY", "").encode()
+MAX_BATCH = int(os.getenv("DILBOT_MODEL_MAX_BATCH", "64"))  # texts per forward pass
+BATCH_WAIT = float(os.getenv("DILBOT_MODEL_BATCH_WAIT_MS", "5")) / 1000
+CLIENT_TIMEOUT = 120  # seconds to wait for a reply
+
+logger = logging.getLogger("dilbot")
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+# Server
+class _Request:
+    def __init__(self, texts, token_counts=None):
+        self.texts = texts
+        self.token_counts = token_counts or [None] * len(texts)
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchingModelServer:
+    """One queue and one batching thread per model; connection threads wait on their request"""
+
+    def __init__(self, max_batch=MAX_BATCH, batch_wait=BATCH_WAIT):
+        from models import detect_emotion_profiles, load_emotion_model, load_sentence_model
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        load_emotion_model()
+        self.sentence_model = load_sentence_model()
+        self.handlers = {
+            "emotion": detect_emotion_profiles,
+            "encode": self._encode,
+        }
+        self.queues = {kind: queue.Queue() for kind in self.handlers}
+        self.stats = {kind: {"requests": 0, "texts": 0, "batches": 0} for kind in self.handlers}
+        for kind in self.handlers:
+            threading.Thread(target=self._batch_loop, args=(kind,), name=f"batch-{kind}", daemon=True).start()
+
+    def _encode(self, texts, token_counts):
+        metrics.increment("model_forward_passes_encode", math.ceil(len(texts) / self.max_batch))
+        return list(self.sentence_model.encode(texts, batch_size=self.max_batch))
+
+    def submit(self, kind, texts, token_counts=None):
+        request = _Request(texts, token_counts)
+        self.queues[kind].put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _batch_loop(self, kind):
+        requests = self.queues[kind]
+        while True:
+            batch = [requests.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.batch_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+
+            texts = [text for request in batch for text in request.texts]
+            token_counts = [count for request in batch for count in request.token_counts]
+            try:
+                results = self.handlers[kind](texts, token_counts)
+            except Exception as e:
+                logger.exception("Model batch failed (%s, %d texts)", kind, len(texts))
+                for request in batch:
+                    request.error = ModelServerError(f"{kind} failed: {e}")
+                    request.done.set()
+                continue
+            stats = self.stats[kind]
+            stats["requests"] += len(batch)
+            stats["texts"] += len(texts)
+            stats["batches"] += 1
+            position = 0
+            for request in batch:
+                request.result = results[position:position + len(request.texts)]
+                position += len(request.texts)
+                request.done.set()
+
+    def handle(self, conn):
+        """Serve one client connection: (op, payload) in, ("ok", result) or ("error", message) out
+
+        A model payload is a list of texts, or (texts, token_counts) for texts the client has tokenized.
+        """
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if op == "stats":
+                        reply = ("ok", self.stats)
+                    elif op in self.handlers:
+                        texts, token_counts = payload if isinstance(payload, tuple) else (payload, None)
+                        reply = ("ok", self.submit(op, texts, token_counts))
+                    else:
+                        reply = ("error", f"Unknown operation: {op}")
+                except Exception as e:
+                    reply = ("error", str(e))
+                conn.send(reply)
+
+
+def key_path(socket_path):
+    return socket_path + ".key"
+
+
+def _write_key(socket_path):
+    """A fresh random handshake key, saved owner-only for the clients"""
+    key = secrets.token_bytes(32)
+    partial = key_path(socket_path) + ".partial"
+    fd = os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(partial, key_path(socket_path))
+    return key
+
+
+def _client_key(socket_path):
+    if AUTH_KEY:
+        return AUTH_KEY
+    with open(key_path(socket_path), "rb") as f:
+        return f.read()
+
+
+def serve(socket_path=SOCKET_PATH, max_batch=MAX_BATCH, batch_wait=BATCH_WAIT):
+    server = BatchingModelServer(max_batch, batch_wait)
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # left behind by a server that did not shut down cleanly
+    previous_umask = os.umask(0o077)  # the socket is owner-only from the moment it is bound
+    try:
+        auth_key = AUTH_KEY or _write_key(socket_path)
+        listener = Listener(socket_path, family="AF_UNIX", authkey=auth_key)
+    finally:
+        os.umask(previous_umask)
+    with listener:
+        logger.info("Model server listening on %s", socket_path)
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception:
+                logger.exception("Rejected a model server connection")
+                continue
+            threading.Thread(target=server.handle, args=(conn,), daemon=True).start()
+
+
+# Client
+class ModelClient:
+    """Thread-safe client; each thread keeps its own connection"""
+
+    def __init__(self, socket_path=SOCKET_PATH, timeout=CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                # The key is read per connection: a restarted server has a new one
+                conn = self._local.conn = Client(self.socket_path, family="AF_UNIX",
+                                                 authkey=_client_key(self.socket_path))
+            except (FileNotFoundError, PermissionError, ConnectionError) as e:
+                raise ModelServerError(f"No model server at {self.socket_path} "
+                                       f"(start it with `python model_server.py`): {e}")
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def call(self, op, payload=None):
+        # One reconnect covers a server restart between calls
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.send((op, payload))
+                if not conn.poll(self.timeout):
+                    self._drop_connection()
+                    raise ModelServerError(f"Model server did not answer {op} within {self.timeout}s")
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                self._drop_connection()
+                if attempt == 2:
+                    raise ModelServerError(f"Lost the connection to the model server at {self.socket_path}")
+        if status != "ok":
+            raise ModelServerError(result)
+        return result
+
+    def detect_emotion_profile(self, text, token_count=None):
+        return self.call("emotion", ([text], [token_count]))[0]
+
+    def encode(self, text):
+        """Same shapes as SentenceTransformer.encode: one vector for a string, an array for a list"""
+        if isinstance(text, str):
+            return self.call("encode", [text])[0]
+        return np.asarray(self.call("encode", list(text)))
+
+    def stats(self):
+        return self.call("stats")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client(socket_path=SOCKET_PATH):
+    """The process-wide client for a socket"""
+    with _clients_lock:
+        if socket_path not in _clients:
+            _clients[socket_path] = ModelClient(socket_path)
+        return _clients[socket_path]
+
+
+class RemoteEmbeddings(Embeddings):
+    """LangChain embeddings served by the model server (drop-in for HuggingFaceEmbeddings)"""
+
+    def __init__(self, socket_path=SOCKET_PATH):
+        from models import EMBEDDING_MODEL
+        self.socket_path = socket_path
+        self.model_name = EMBEDDING_MODEL  # bulk ingest workers load this model themselves
+
+    def embed_documents(self, texts):
+        return [vector.tolist() for vector in client(self.socket_path).call("encode", list(texts))]
+
+    def embed_query(self, text):
+        return client(self.socket_path).call("encode", [text])[0].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve DilBot's emotion and sentence models over a Unix socket")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT * 1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    serve(args.socket, args.max_batch, args.batch_wait_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Local models shared by the Streamlit app, the benchmarks and any headless caller.
+# Each loader runs once per process.
+#
+# Inputs longer than the emotion model's 512-token window are not truncated:
+# detect_emotion_profile() splits them into sentence-aligned segments of about
+# DILBOT_EMOTION_SEGMENT_TOKENS tokens, classifies all segments in batched
+# forward passes, and averages the per-segment distributions (weighted by
+# segment length) into the overall label.
+#
+# With DILBOT_MODEL_SERVER set, detect_emotion_profile, encode_text and
+# load_embeddings hand the work to the shared model server (model_server.py)
+# and this process never loads the model weights; only the tokenizer (used to
+# count prompt tokens) stays local. The heavy libraries are imported on first
+# use for the same reason.
+#
+# Every batch through a model increments model_forward_passes_<kind> in
+# metrics, counted in the process that runs it (the model server, when there
+# is one).
+import os, re, math
+from functools import lru_cache
+import metrics
+from memory_profile import track_load, register_cache, lru_cache_stats
+
+EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Unix socket of a running model server; unset = models run in this process
+MODEL_SERVER = os.getenv("DILBOT_MODEL_SERVER")
+
+EMOTION_MAX_TOKENS = 512  # the emotion model's window, special tokens included
+EMOTION_SEGMENT_TOKENS = int(os.getenv("DILBOT_EMOTION_SEGMENT_TOKENS", "128"))
+EMOTION_BATCH_SIZE = int(os.getenv("DILBOT_EMOTION_BATCH_SIZE", "16"))  # segments per forward pass
+ENCODE_BATCH_SIZE = 32  # SentenceTransformer.encode's default
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+# Emotion detection
+@lru_cache(maxsize=None)
+@track_load("emotion_model")
+def load_emotion_model():
+    from transformers import pipeline
+    return pipeline(
+        "text-classification",
+        model=EMOTION_MODEL,
+        top_k=1,
+        device=-1
+    )
+
+
+@lru_cache(maxsize=None)
+@track_load("tokenizer")
+def load_tokenizer():
+    """Just the emotion model's tokenizer, for counting prompt tokens without loading the weights"""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(EMOTION_MODEL)
+
+
+@lru_cache(maxsize=None)
+@track_load("sentence_model")
+def load_sentence_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+@lru_cache(maxsize=None)
+@track_load("embeddings")
+def load_embeddings():
+    """LangChain embeddings for the quote stores (served remotely with DILBOT_MODEL_SERVER)"""
+    if MODEL_SERVER:
+        from model_server import RemoteEmbeddings
+        return RemoteEmbeddings(MODEL_SERVER)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+
+register_cache("models", lru_cache_stats(load_emotion_model, load_tokenizer, load_sentence_model, load_embeddings))
+
+
+def split_segments(text, max_tokens=EMOTION_SEGMENT_TOKENS):
+    """(start, end, tokens) character spans: whole sentences packed up to max_tokens, long sentences windowed"""
+    tokenizer = load_tokenizer()
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if match.start() > start:
+            sentences.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        sentences.append((start, len(text)))
+    if not sentences:
+        return []
+
+    # One tokenizer call for all sentences; offsets let long sentences be cut at token boundaries
+    encoded = tokenizer([text[a:b] for a, b in sentences], add_special_tokens=False, return_offsets_mapping=True)
+    segments = []
+    seg_start, seg_end, seg_tokens = None, None, 0
+    for (a, b), offsets in zip(sentences, encoded["offset_mapping"]):
+        if len(offsets) > max_tokens:
+            if seg_tokens:
+                segments.append((seg_start, seg_end, seg_tokens))
+                seg_start, seg_tokens = None, 0
+            for i in range(0, len(offsets), max_tokens):
+                window = offsets[i:i + max_tokens]
+                segments.append((a + window[0][0], a + window[-1][1], len(window)))
+            continue
+        if seg_tokens and seg_tokens + len(offsets) > max_tokens:
+            segments.append((seg_start, seg_end, seg_tokens))
+            seg_start, seg_tokens = None, 0
+        if seg_start is None:
+            seg_start = a
+        seg_end = b
+        seg_tokens += len(offsets)
+    if seg_tokens:
+        segments.append((seg_start, seg_end, seg_tokens))
+    return segments
+
+
+def emotion_passes(inputs):
+    """Forward passes the emotion model needs for this many inputs (texts or segments)"""
+    return math.ceil(inputs / EMOTION_BATCH_SIZE)
+
+
+def detect_emotion_profiles(texts, token_counts=None):
+    """detect_emotion_profile for many texts, with every text's segments in the same batched forward passes
+
+    token_counts (without special tokens, one per text, None where unknown)
+    skips tokenizing texts a caller has already tokenized.
+    """
+    tokenizer = load_tokenizer()
+    if token_counts is None:
+        token_counts = [None] * len(texts)
+    untokenized = [text for text, count in zip(texts, token_counts) if count is None]
+    tokenized = iter(len(ids) for ids in tokenizer(untokenized)["input_ids"]) if untokenized else iter(())
+    special = tokenizer.num_special_tokens_to_add()
+    lengths = [next(tokenized) if count is None else count + special for count in token_counts]
+    plans = []  # per text: [(start, end, tokens)], or None when it fits in one pass
+    inputs = []
+    for text, length in zip(texts, lengths):
+        if length <= EMOTION_MAX_TOKENS:
+            plans.append(None)
+            inputs.append(text)
+        else:
+            segments = split_segments(text)
+            plans.append(segments)
+            inputs.extend(text[start:end] for start, end, _ in segments)
+    predictions = load_emotion_model()(inputs, top_k=None, batch_size=EMOTION_BATCH_SIZE, truncation=True)
+    metrics.increment("model_forward_passes_emotion", emotion_passes(len(inputs)))
+
+    results = []
+    position = 0
+    for segments in plans:
+        if segments is None:
+            best = max(predictions[position], key=lambda p: p["score"])
+            results.append((best["label"].lower(), best["score"], None))
+            position += 1
+            continue
+        results.append(_aggregate_segments(segments, predictions[position:position + len(segments)]))
+        position += len(segments)
+    return results
+
+
+def _aggregate_segments(segments, predictions):
+    """Length-weighted mean of the segments' distributions -> (label, score, profile)"""
+    total_tokens = sum(tokens for _, _, tokens in segments)
+    distribution = {}
+    profile_segments = []
+    for (start, end, tokens), scores in zip(segments, predictions):
+        best = max(scores, key=lambda p: p["score"])
+        profile_segments.append({"start": start, "end": end, "emotion": best["label"].lower(),
+                                 "score": round(best["score"], 4)})
+        for p in scores:
+            label = p["label"].lower()
+            distribution[label] = distribution.get(label, 0.0) + p["score"] * tokens / total_tokens
+    label = max(distribution, key=distribution.get)
+    profile = {
+        "distribution": {k: round(v, 4) for k, v in sorted(distribution.items(), key=lambda kv: -kv[1])},
+        "segments": profile_segments,
+    }
+    return label, distribution[label], profile
+
+
+def detect_emotion_profile(text, token_count=None):
+    """(label, score, profile); profile is None when the text fits the model in one pass.
+
+    Otherwise profile = {"distribution": {label: probability}, "segments":
+    [{"start", "end", "emotion", "score"}]}, with character offsets into text.
+    """
+    if MODEL_SERVER:
+        from model_server import client
+        return client(MODEL_SERVER).detect_emotion_profile(text, token_count)
+    return detect_emotion_profiles([text], None if token_count is None else [token_count])[0]
+
+
+def detect_emotion(text):
+    """(label, score); long inputs are classified segment by segment (see detect_emotion_profile)"""
+    label, score, _ = detect_emotion_profile(text)
+    return label, score
+
+
+def encode_text(text):
+    """MiniLM embedding(s) as numpy, the same vectors HuggingFaceEmbeddings stores in the quote indexes"""
+    if MODEL_SERVER:
+        from model_server import client
+        return client(MODEL_SERVER).encode(text)
+    metrics.increment("model_forward_passes_encode", 1 if isinstance(text, str) else
+                      math.ceil(len(text) / ENCODE_BATCH_SIZE))
+    return load_sentence_model().encode(text)
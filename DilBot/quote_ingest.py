@@ -0,0 +1,168 @@
+# Bulk quote-corpus ingestion.
+#
+# Lines are streamed from a binary file object, normalized, length-limited and
+# deduplicated by a compact hash set, then embedded in fixed-size batches and
+# added to a FAISS vectorstore incrementally. Only the current batch (and, with
+# a process pool, a bounded number of in-flight batches) is held in memory.
+import hashlib, re, unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from ann_index import make_index, train_index, wrap_index, choose_index_type, train_size
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BATCH_SIZE = 256
+MAX_QUOTE_LENGTH = 500
+PROGRESS_EVERY = 1000  # lines
+
+_whitespace = re.compile(r"\s+")
+_worker_embeddings = None
+
+
+def normalize_quote(line):
+    """Canonical form used for both storage and duplicate detection"""
+    line = unicodedata.normalize("NFKC", line)
+    return _whitespace.sub(" ", line).strip()
+
+
+def _quote_digest(quote):
+    # 8 bytes is plenty to tell apart a few million quotes and keeps the seen-set small
+    return hashlib.blake2b(quote.casefold().encode("utf-8"), digest_size=8).digest()
+
+
+def _init_worker(model_name):
+    global _worker_embeddings
+    _worker_embeddings = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_in_worker(batch):
+    return _worker_embeddings.embed_documents(batch)
+
+
+def _stream_size(stream):
+    try:
+        position = stream.tell()
+        stream.seek(0, 2)
+        size = stream.tell()
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def count_lines(stream, chunk_size=1024 * 1024):
+    """Count lines in a seekable binary stream without keeping them, then rewind"""
+    position = stream.tell()
+    count = 0
+    last = b"\n"
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        count += chunk.count(b"\n")
+        last = chunk[-1:]
+    stream.seek(position)
+    return count + (last != b"\n")
+
+
+def iter_unique_quotes(stream, stats, max_length=MAX_QUOTE_LENGTH):
+    """Yield normalized, deduplicated quotes from a binary line stream"""
+    seen = set()
+    for raw in stream:
+        stats["lines"] += 1
+        quote = normalize_quote(raw.decode("utf-8", errors="replace"))
+        if not quote:
+            continue
+        if len(quote) > max_length:
+            stats["too_long"] += 1
+            continue
+        digest = _quote_digest(quote)
+        if digest in seen:
+            stats["duplicates"] += 1
+            continue
+        seen.add(digest)
+        yield quote
+
+
+def _batches(quotes, batch_size):
+    batch = []
+    for quote in quotes:
+        batch.append(quote)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_quotes(stream, embeddings, vectorstore=None, batch_size=BATCH_SIZE, max_length=MAX_QUOTE_LENGTH,
+                  workers=0, progress=None, index_type=None):
+    """Stream quotes from `stream` into `vectorstore` (created on the first batch if None).
+
+    A new vectorstore gets an index type chosen from the file's line count (see
+    ann_index); IVF and quantized indexes buffer just enough leading vectors to train.
+    progress(fraction_or_None, stats) is called every PROGRESS_EVERY lines and at the end.
+    With workers > 0 batches are embedded across a process pool; at most 2 * workers
+    batches are in flight at a time. Returns (vectorstore, stats).
+    """
+    stats = {"lines": 0, "added": 0, "duplicates": 0, "too_long": 0}
+    total_bytes = _stream_size(stream)
+    last_reported = 0
+    expected = count_lines(stream) if vectorstore is None and total_bytes is not None else 0
+    stats["index_type"] = choose_index_type(expected, index_type)
+    pending = []  # (text, vector) pairs held back until the index is trained
+
+    def report():
+        if progress:
+            fraction = stream.tell() / total_bytes if total_bytes else None
+            progress(fraction, dict(stats))
+
+    def add_pairs(pairs):
+        nonlocal vectorstore, pending
+        if vectorstore is None:
+            dim = len(pairs[0][1])
+            vectorstore = wrap_index(make_index(dim, expected, stats["index_type"]), embeddings)
+        if not vectorstore.index.is_trained:
+            pending.extend(pairs)
+            if len(pending) < train_size(expected, stats["index_type"]) and not final:
+                return
+            if final:
+                # Every unique quote is in `pending`, fewer than the line count promised (blank lines,
+                # duplicates): size the still-empty index for them, so IVF never has more lists than points
+                stats["index_type"] = choose_index_type(len(pending), index_type)
+                vectorstore = wrap_index(make_index(len(pending[0][1]), len(pending), stats["index_type"]),
+                                         embeddings)
+            train_index(vectorstore.index, np.array([vector for _, vector in pending], dtype=np.float32))
+            pairs, pending = pending, []
+        vectorstore.add_embeddings(pairs)
+
+    def add_batch(batch, vectors):
+        nonlocal last_reported
+        add_pairs(list(zip(batch, vectors)))
+        stats["added"] += len(batch)
+        if stats["lines"] - last_reported >= PROGRESS_EVERY:
+            last_reported = stats["lines"]
+            report()
+
+    final = False
+    batches = _batches(iter_unique_quotes(stream, stats, max_length), batch_size)
+    if workers > 0:
+        model_name = getattr(embeddings, "model_name", EMBEDDING_MODEL)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name,)) as pool:
+            in_flight = []
+            for batch in batches:
+                in_flight.append((batch, pool.submit(_embed_in_worker, batch)))
+                if len(in_flight) >= 2 * workers:
+                    done_batch, future = in_flight.pop(0)
+                    add_batch(done_batch, future.result())
+            for done_batch, future in in_flight:
+                add_batch(done_batch, future.result())
+    else:
+        for batch in batches:
+            add_batch(batch, embeddings.embed_documents(batch))
+
+    if pending:
+        final = True
+        add_pairs([])
+    report()
+    return vectorstore, stats
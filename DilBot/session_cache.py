@@ -0,0 +1,94 @@
+# Per-session cache of one user's journal, dashboard aggregates and quote store.
+# Aggregates cover archived months too, read from the archive index only.
+#
+# Streamlit reruns the whole script on every widget change; with this cache a
+# rerun that changes nothing reads no files and runs no models. Each cached
+# value remembers the storage generation it was loaded at, and storage bumps
+# the generation write-through (save_user_journal, build_user_vectorstore,
+# ingest_user_quotes, reset_user_data), so the next read after a write reloads.
+from collections import Counter
+import pandas as pd
+from journal_archive import summary as archive_summary
+from storage import (QUOTE_CATEGORIES, generation, get_user_file_path, load_user_journal,
+                     load_user_vectorstore, load_category_store)
+
+
+def journal_aggregates(journal, archived=None):
+    """Dashboard numbers and chart data, computed in one pass over the hot journal plus the archive index"""
+    emotion_counts = Counter(entry["emotion"] for entry in journal)
+    daily = Counter((entry["date"], entry["emotion"]) for entry in journal)
+    total = len(journal)
+    confidence_sum = sum(entry["confidence"] for entry in journal)
+    first_date = journal[0]["date"] if journal else None
+    if archived and archived["entries"]:
+        emotion_counts.update(archived["emotion_counts"])
+        for date, counts in archived["daily"].items():
+            daily.update({(date, emotion): count for emotion, count in counts.items()})
+        total += archived["entries"]
+        confidence_sum += archived["confidence_sum"]
+        first_date = archived["first_date"]
+    return {
+        "total": total,
+        "emotion_counts": dict(emotion_counts),
+        "most_common_emotion": emotion_counts.most_common(1)[0][0] if emotion_counts else "None",
+        "avg_confidence": confidence_sum / total if total else None,
+        "first_date": first_date,
+        "emotion_options": sorted({emotion.capitalize() for emotion in emotion_counts}),
+        "chart": pd.DataFrame(
+            [{"date": date, "emotion": emotion.capitalize(), "count": count}
+             for (date, emotion), count in sorted(daily.items())],
+            columns=["date", "emotion", "count"]
+        ),
+    }
+
+
+class UserStateCache:
+    def __init__(self, username):
+        self.username = username
+        self._journal = None
+        self._aggregates = None
+        self._archived = None
+        self._journal_generation = None
+        self._vectorstore = None
+        self._vectorstore_generation = None
+
+    def _refresh_journal(self):
+        current = generation(self.username, "journal")
+        if current != self._journal_generation:
+            self._journal = load_user_journal(self.username)
+            self._archived = archive_summary(get_user_file_path(self.username, "journal.json"))
+            self._aggregates = journal_aggregates(self._journal, self._archived)
+            self._journal_generation = current
+
+    def journal(self):
+        """The hot (not yet archived) journal (shared; do not modify)"""
+        self._refresh_journal()
+        return self._journal
+
+    def tail(self, count=5):
+        self._refresh_journal()
+        return self._journal[-count:]
+
+    def aggregates(self):
+        self._refresh_journal()
+        return self._aggregates
+
+    def archived_months(self):
+        """Archived "YYYY-MM" -> {"entries", "bytes"}, from the archive index"""
+        self._refresh_journal()
+        return self._archived["months"]
+
+    def user_vectorstore(self):
+        """The user's uploaded-quote store, or None"""
+        current = generation(self.username, "vectorstore")
+        if current != self._vectorstore_generation:
+            self._vectorstore = load_user_vectorstore(self.username)
+            self._vectorstore_generation = current
+        return self._vectorstore
+
+    def quote_source(self, category):
+        """Same as storage.load_quote_source, without touching disk when nothing changed"""
+        vectorstore = self.user_vectorstore()
+        if vectorstore is None:
+            vectorstore = load_category_store(category)  # already cached per process
+        return vectorstore, QUOTE_CATEGORIES[category]
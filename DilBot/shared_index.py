@@ -0,0 +1,63 @@
+# Central, read-only indexes for the built-in quote categories.
+#
+# Each category is embedded once into <root>/<category>/ (a compact_store directory
+# plus source.json) and opened memory-mapped, so every user and every worker process
+# shares the same on-disk pages instead of keeping a private copy per user.
+import os, json, hashlib, fcntl
+from ann_index import build_vectorstore
+from compact_store import save_compact, load_compact
+
+SHARED_INDEX_DIR = os.getenv("DILBOT_SHARED_INDEX_DIR", "shared/quote_index")
+SOURCE_FILE = "source.json"
+
+
+def category_dir(category, root=SHARED_INDEX_DIR):
+    slug = "".join(c.lower() if c.isalnum() else "_" for c in category)
+    return os.path.join(root, slug)
+
+
+def _fingerprint(quotes, model_name):
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    for quote in quotes:
+        digest.update(b"\0" + quote.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _is_current(path, fingerprint):
+    source_path = os.path.join(path, SOURCE_FILE)
+    if not os.path.exists(source_path):
+        return False
+    with open(source_path, "r") as f:
+        return json.load(f).get("fingerprint") == fingerprint
+
+
+def ensure_category_indexes(quote_categories, embeddings, root=SHARED_INDEX_DIR):
+    """Build any missing or outdated category index; safe to call from every worker"""
+    model_name = getattr(embeddings, "model_name", "")
+    os.makedirs(root, exist_ok=True)
+    # One builder at a time across processes; the others wait and then find the index current
+    with open(os.path.join(root, ".build.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        for category, quotes in quote_categories.items():
+            path = category_dir(category, root)
+            fingerprint = _fingerprint(quotes, model_name)
+            if _is_current(path, fingerprint):
+                continue
+
+            # save_compact moves the old directory aside before moving the new one in, and
+            # readers fall back to the old one in between; readers that already opened
+            # the old files keep their mapping, new ones see the new index
+            save_compact(build_vectorstore(quotes, embeddings), path)
+            with open(os.path.join(path, SOURCE_FILE), "w") as f:
+                json.dump({"category": category, "model": model_name, "fingerprint": fingerprint}, f, indent=4)
+
+
+def open_category_store(category, embeddings, root=SHARED_INDEX_DIR):
+    """Open a shared category index as a read-only LangChain vectorstore"""
+    return load_compact(category_dir(category, root), embeddings)
+
+
+def is_default_copy(texts, quote_categories):
+    """True if a per-user store only holds one built-in category (a legacy private copy)"""
+    texts = set(texts)
+    return any(texts == set(quotes) for quotes in quote_categories.values())
@@ -0,0 +1,301 @@
+# Users, journals, quote vectorstores and admin logs on local disk.
+# Nothing here depends on Streamlit, so the app, benchmarks and load tests share it.
+# Accounts live in auth.py (kept free of model imports) and are re-exported here.
+import os, json, datetime, shutil, logging, threading
+from functools import lru_cache
+from langchain_community.vectorstores import FAISS
+import journal_index
+import user_index
+from journal_store import journal_lock
+from journal_queue import WriteBehindQueue
+from memory_profile import track_load, register_cache, lru_cache_stats
+from journal_archive import summary as archive_summary
+from auth import (
+    ADMIN_USERNAME, ADMIN_PASSWORD, hash_password, get_secure_users_path, load_users, save_users,
+    create_user_directory, get_user_file_path, signup, login
+)
+from models import load_embeddings
+from quote_ingest import ingest_quotes
+from ann_index import build_vectorstore
+from shared_index import ensure_category_indexes, open_category_store, is_default_copy
+from compact_store import save_compact, load_compact, is_compact_store, remove_compact, store_texts
+
+# Processes used to embed large quote uploads (0 embeds in the app process)
+QUOTE_INGEST_WORKERS = int(os.getenv("DILBOT_INGEST_WORKERS", "0"))
+
+ADMIN_LOG_PATH = "data/admin_log.json"  # Persistent and visible
+
+logger = logging.getLogger("dilbot")
+
+# Built-in quote themes; their indexes are built once and shared by all users
+QUOTE_CATEGORIES = {
+    "Grief": ["Grief is the price we pay for love.", "Tears are the silent language of grief.", "What we have once enjoyed we can never lose; all that we love deeply becomes a part of us."],
+    "Motivation": ["Believe in yourself and all that you are.", "Tough times never last, but tough people do.", "The only way to do great work is to love what you do."],
+    "Healing": ["Every wound has its own time to heal.", "It's okay to take your time to feel better.", "Healing is not linear, and that's perfectly okay."],
+    "Relationships": ["The best relationships are built on trust.", "Love is not about possession but appreciation.", "Healthy relationships require both people to show up authentically."]
+}
+
+
+# Per-user generation counters, bumped by every write in this process so that
+# session caches (session_cache.py) know when their copy is stale
+_generations = {}
+_generations_lock = threading.Lock()
+
+
+def generation(username, artifact):
+    """Current generation of a user's "journal" or "vectorstore" in this process"""
+    return _generations.get((username, artifact), 0)
+
+def _bump_generations(username, artifacts):
+    with _generations_lock:
+        for artifact in artifacts:
+            _generations[(username, artifact)] = _generations.get((username, artifact), 0) + 1
+
+def bump_generation(username, *artifacts):
+    """Invalidate cached copies of the given artifacts (writes made by other processes call this too)"""
+    _bump_generations(username, artifacts)
+    if "journal" in artifacts:
+        journal_index.invalidate(get_user_file_path(username, "journal_index"))
+
+
+# Quote vectorstores
+@lru_cache(maxsize=None)
+def prepare_category_indexes():
+    """Build the shared built-in category indexes once per deployment"""
+    ensure_category_indexes(QUOTE_CATEGORIES, load_embeddings())
+    return True
+
+@lru_cache(maxsize=None)
+@track_load("category_store", per_argument=True)
+def load_category_store(category):
+    """Memory-mapped, read-only vectorstore shared by every user of this category"""
+    prepare_category_indexes()
+    return open_category_store(category, load_embeddings())
+
+register_cache("category_stores", lru_cache_stats(load_category_store))
+
+def build_user_vectorstore(username, quotes):
+    """Build and save user-specific vectorstore (custom quotes only)"""
+    embeddings = load_embeddings()
+    vectorstore = build_vectorstore(quotes, embeddings)  # flat, HNSW or IVF depending on corpus size
+
+    # Save vectorstore for user
+    save_compact(vectorstore, get_user_file_path(username, "vectorstore"))
+    bump_generation(username, "vectorstore")
+    return vectorstore
+
+def ingest_user_quotes(username, quotes_file, progress=None):
+    """Stream an uploaded quote file into a new user-specific vectorstore"""
+    embeddings = load_embeddings()
+    vectorstore, stats = ingest_quotes(quotes_file, embeddings, workers=QUOTE_INGEST_WORKERS, progress=progress)
+    if vectorstore is not None:
+        save_compact(vectorstore, get_user_file_path(username, "vectorstore"))
+        bump_generation(username, "vectorstore")
+    return vectorstore, stats
+
+@track_load("user_vectorstore")
+def load_user_vectorstore(username):
+    """Load user-specific vectorstore (custom quotes only)"""
+    vectorstore_path = get_user_file_path(username, "vectorstore")
+    if is_compact_store(vectorstore_path):
+        return load_compact(vectorstore_path, load_embeddings())
+    if os.path.exists(os.path.join(vectorstore_path, "index.pkl")):
+        # Legacy pickled store: unpickled one last time, then rewritten in the compact format
+        vectorstore = FAISS.load_local(vectorstore_path, load_embeddings(), allow_dangerous_deserialization=True)
+        # Older versions saved a private copy of a built-in category for every user
+        if vectorstore.index.ntotal <= max(len(quotes) for quotes in QUOTE_CATEGORIES.values()) and \
+                is_default_copy(store_texts(vectorstore), QUOTE_CATEGORIES):
+            shutil.rmtree(vectorstore_path, ignore_errors=True)
+            return None
+        save_compact(vectorstore, vectorstore_path)
+        return load_compact(vectorstore_path, load_embeddings())
+    return None
+
+def load_quote_source(username, category):
+    """Vectorstore and quotes for a turn: uploaded quotes if any, else the shared category index"""
+    vectorstore = load_user_vectorstore(username)
+    if vectorstore is None:
+        vectorstore = load_category_store(category)
+    return vectorstore, QUOTE_CATEGORIES[category]
+
+# Journals
+def _write_journal_batch(username, items, durable=False):
+    """Append queued (entry, embedding) pairs to the journal in one rewrite, then index them"""
+    journal_path = get_user_file_path(username, "journal.json")
+    with journal_lock(journal_path):
+        journal = []
+        if os.path.exists(journal_path):
+            with open(journal_path, "r") as f:
+                journal = json.load(f)
+
+        journal.extend(entry for entry, _ in items)
+        with open(journal_path + ".partial", "w") as f:
+            json.dump(journal, f, indent=4)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(journal_path + ".partial", journal_path)
+        if durable:
+            dir_fd = os.open(os.path.dirname(journal_path), os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        # Indexed under the journal lock, so a concurrent backfill cannot index these entries too
+        index_dir = get_user_file_path(username, "journal_index")
+        try:
+            for entry, embedding in items:
+                if embedding is not None:
+                    journal_index.add_entry(index_dir, entry, embedding)
+        except Exception:
+            # The batch is on disk and must not be retried; journal search backfills what is missing
+            logger.exception("Could not index journal entries for %s", username)
+
+    try:
+        user_index.record_entries(username, [entry for entry, _ in items])
+    except Exception:
+        # The journal is already written, so this batch must not be retried; a rebuild catches up
+        logger.exception("Could not update the user index for %s", username)
+
+# Journal writes leave the turn right away; see journal_queue for the loss window
+_journal_queue = WriteBehindQueue(_write_journal_batch)
+
+def save_user_journal(username, user_input, emotion, score, response, embedding=None, durable=None,
+                      emotion_profile=None):
+    """Queue a journal entry for specific user (and index it when the turn's embedding is given).
+
+    Returns once the entry is queued; with durable=True, once it is fsynced to disk.
+    Long inputs carry their per-segment emotion_profile (models.detect_emotion_profile).
+    """
+    entry = {
+        "date": str(datetime.date.today()),
+        "timestamp": str(datetime.datetime.now()),
+        "user_input": user_input,
+        "emotion": emotion,
+        "confidence": round(score * 100, 2),
+        "response": response
+    }
+    if emotion_profile is not None:
+        entry["emotion_profile"] = emotion_profile
+    _journal_queue.submit(username, (entry, embedding), durable=durable)
+    # Not bump_generation: this process's own index writes keep its cached index current
+    _bump_generations(username, ("journal",))
+
+def flush_user_journals(username=None, durable=True):
+    """Write queued journal entries now (one user's, or everyone's)"""
+    _journal_queue.flush(username, durable=durable)
+
+def load_user_journal(username):
+    """Load journal for specific user, including entries still queued for writing"""
+    # Snapshot the queue before reading the file: an entry written in between shows up in both
+    pending = [entry for entry, _ in _journal_queue.pending(username)]
+    journal_path = get_user_file_path(username, "journal.json")
+    journal = []
+    if os.path.exists(journal_path):
+        with open(journal_path, "r") as f:
+            journal = json.load(f)
+    if pending:
+        last_written = journal[-1]["timestamp"] if journal else ""
+        journal.extend(entry for entry in pending if entry["timestamp"] > last_written)
+    return journal
+
+def reset_user_data(username):
+    """Delete a user's journal (and archive), search index, quote store, audio and pending uploads; returns what was removed"""
+    _journal_queue.discard(username)
+    removed = []
+    for name in ("journal.json", "journal_archive", "journal_index", "vectorstore", "response.mp3", "uploads"):
+        path = get_user_file_path(username, name)
+        if name == "vectorstore" and is_compact_store(path):
+            remove_compact(path)  # also a copy an interrupted save left aside
+        elif os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        else:
+            continue
+        removed.append(name)
+    user_index.clear_activity(username)
+    bump_generation(username, "journal", "vectorstore")
+    return removed
+
+# Admin statistics and logs
+def _user_activity(username):
+    """(conversations, last activity date or None, emotion counts) from the journal and its archive"""
+    # (archived months come from the archive index, not the segments)
+    journal_data = load_user_journal(username)
+    archived = archive_summary(get_user_file_path(username, "journal.json"))
+    emotion_counts = dict(archived["emotion_counts"])
+    for entry in journal_data:
+        emotion_counts[entry['emotion']] = emotion_counts.get(entry['emotion'], 0) + 1
+    last_activity = journal_data[-1]["date"] if journal_data else archived["last_date"]
+    return len(journal_data) + archived["entries"], last_activity, emotion_counts
+
+def rebuild_user_index():
+    """Rebuild the admin user index from the users file and every journal; returns the number of users.
+
+    Entries written while the journals are being read can be counted twice or
+    not at all; the next rebuild corrects them.
+    """
+    users = load_users()
+    rows = []
+    for username, user_data in users.items():
+        conversations, last_activity, emotion_counts = _user_activity(username)
+        rows.append((username, user_data["email"], user_data["created_at"], conversations, last_activity,
+                     emotion_counts))
+    user_index.replace_all(rows)
+    return len(rows)
+
+def ensure_user_index():
+    """Build the user index on first use (existing deployments start without one)"""
+    if not user_index.is_built():
+        rebuild_user_index()
+
+def search_users(prefix="", **filters):
+    """One page of users from the index plus the total match count; see user_index.search"""
+    ensure_user_index()
+    return user_index.search(prefix, **filters)
+
+def get_admin_stats(include_users=True):
+    """Get comprehensive admin statistics from the user index (no journal scans)
+
+    Without include_users, user_details is left empty; use search_users for pages of users.
+    """
+    ensure_user_index()
+    today = datetime.date.today()
+    stats = user_index.overview(today, today - datetime.timedelta(days=7))
+    stats["registrations"] = user_index.registrations_by_day()
+    stats["emotion_totals"] = user_index.emotion_totals()
+    stats["activity_levels"] = user_index.activity_levels()
+    stats["user_details"] = user_index.all_user_details() if include_users else []
+    return stats
+
+def log_admin_activity(action, details="", admin=None):
+    """Log admin activities"""
+    log_entry = {
+        "timestamp": str(datetime.datetime.now()),
+        "action": action,
+        "details": details,
+        "admin": admin
+    }
+
+    admin_log = []
+    if os.path.exists(ADMIN_LOG_PATH):
+        with open(ADMIN_LOG_PATH, "r") as f:
+            admin_log = json.load(f)
+
+    admin_log.append(log_entry)
+
+    # Keep only last 100 entries
+    admin_log = admin_log[-100:]
+
+    os.makedirs("data", exist_ok=True)
+    with open(ADMIN_LOG_PATH, "w") as f:
+        json.dump(admin_log, f, indent=4)
+
+def get_admin_logs():
+    """Get admin activity logs"""
+    if os.path.exists(ADMIN_LOG_PATH):
+        with open(ADMIN_LOG_PATH, "r") as f:
+            return json.load(f)
+    return []
@@ -0,0 +1,243 @@
+# Disk accounting, quotas and garbage collection for DilBot's data directories.
+#
+# usage_report() measures bytes per user and per artifact type (journal, journal
+# search index, quote store, audio, uploads) plus the shared directories, and
+# saves the result for the admin dashboard. collect_garbage() removes what
+# nothing will read again: directories of deleted users, old response audio,
+# abandoned uploads and half-written stores, old export archives and finished
+# job records. It runs as the recurring "storage_gc" job (jobs.SCHEDULE).
+# check_quota() enforces DILBOT_USER_QUOTA_MB when users upload quotes; journal
+# writes are never refused, so a user over quota only shows up in the usage report.
+import os, json, time, shutil, datetime
+import jobs
+from ann_index import VECTOR_DTYPE
+from compact_store import STAGING_SUFFIX, RETIRED_SUFFIX
+from export import EXPORT_DIR
+from shared_index import SHARED_INDEX_DIR
+from storage import ADMIN_LOG_PATH, load_users, get_user_file_path
+
+USERS_DIR = "users"
+USAGE_REPORT_PATH = "data/storage_usage.json"
+
+USER_QUOTA_MB = float(os.getenv("DILBOT_USER_QUOTA_MB", "200"))  # 0 = unlimited
+AUDIO_TTL_HOURS = float(os.getenv("DILBOT_AUDIO_TTL_HOURS", "24"))
+UPLOAD_TTL_HOURS = float(os.getenv("DILBOT_UPLOAD_TTL_HOURS", "24"))
+EXPORT_KEEP = int(os.getenv("DILBOT_EXPORT_KEEP", "3"))
+JOB_HISTORY_DAYS = float(os.getenv("DILBOT_JOB_HISTORY_DAYS", "7"))
+ABANDONED_AFTER = 3600  # seconds before a half-written file or an unknown user's directory is removed
+
+# Artifact type of each entry in a user directory
+ARTIFACTS = {
+    "journal.json": "journal",
+    "journal_archive": "journal_archive",
+    "journal_index": "journal_index",
+    "vectorstore": "vectorstore",
+    "response.mp3": "audio",
+    jobs.UPLOAD_DIR: "uploads",
+}
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+_VECTOR_BYTES = {"float32": 4, "float16": 2, "int8": 1}
+_INDEX_OVERHEAD_BYTES = 272  # per quote: HNSW links (worst case of the index types) and text offsets
+
+
+def path_bytes(path):
+    """Bytes used by a file or a directory tree (0 if missing)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass  # removed while we were walking
+    return total
+
+
+def artifact_type(name):
+    if name in ARTIFACTS:
+        return ARTIFACTS[name]
+    if name.endswith((STAGING_SUFFIX, RETIRED_SUFFIX)):
+        return "staging"
+    return "other"
+
+
+def user_usage(username):
+    """{artifact type: bytes} for one user"""
+    usage = {}
+    user_dir = os.path.join(USERS_DIR, username)
+    if not os.path.isdir(user_dir):
+        return usage
+    for name in os.listdir(user_dir):
+        kind = artifact_type(name)
+        usage[kind] = usage.get(kind, 0) + path_bytes(os.path.join(user_dir, name))
+    return usage
+
+
+def shared_usage():
+    return {
+        "quote_indexes": path_bytes(SHARED_INDEX_DIR),
+        "exports": path_bytes(EXPORT_DIR),
+        "job_queue": sum(path_bytes(jobs.JOBS_DB_PATH + suffix) for suffix in ("", "-wal", "-shm")),
+        "admin_log": path_bytes(ADMIN_LOG_PATH),
+    }
+
+
+def usage_report(save=True):
+    """Measure everything; saved to USAGE_REPORT_PATH for the admin dashboard"""
+    users = {}
+    by_artifact = {}
+    if os.path.isdir(USERS_DIR):
+        for username in sorted(os.listdir(USERS_DIR)):
+            artifacts = user_usage(username)
+            total = sum(artifacts.values())
+            users[username] = {
+                "artifacts": artifacts,
+                "total": total,
+                "quota_used": total / (USER_QUOTA_MB * 2**20) if USER_QUOTA_MB > 0 else None,
+            }
+            for kind, size in artifacts.items():
+                by_artifact[kind] = by_artifact.get(kind, 0) + size
+    shared = shared_usage()
+    report = {
+        "generated_at": str(datetime.datetime.now()),
+        "quota_bytes": int(USER_QUOTA_MB * 2**20) if USER_QUOTA_MB > 0 else None,
+        "users": users,
+        "by_artifact": by_artifact,
+        "shared": shared,
+        "total": sum(by_artifact.values()) + sum(shared.values()),
+    }
+    if save:
+        previous = load_usage_report()
+        if previous and "last_gc" in previous:
+            report["last_gc"] = previous["last_gc"]
+        _save_report(report)
+    return report
+
+
+def load_usage_report():
+    if os.path.exists(USAGE_REPORT_PATH):
+        with open(USAGE_REPORT_PATH, "r") as f:
+            return json.load(f)
+    return None
+
+
+def _save_report(report):
+    os.makedirs(os.path.dirname(USAGE_REPORT_PATH), exist_ok=True)
+    with open(USAGE_REPORT_PATH + ".partial", "w") as f:
+        json.dump(report, f, indent=4)
+    os.replace(USAGE_REPORT_PATH + ".partial", USAGE_REPORT_PATH)
+
+
+# Quotas
+def estimate_quote_store_bytes(upload_bytes, num_quotes):
+    """Rough size of the quote store built from an upload"""
+    per_quote = EMBEDDING_DIM * _VECTOR_BYTES.get(VECTOR_DTYPE, 4) + _INDEX_OVERHEAD_BYTES
+    return upload_bytes + num_quotes * per_quote
+
+
+def check_quota(username, incoming_bytes=0, replacing=()):
+    """(allowed, message) for adding incoming_bytes; artifacts in `replacing` are about to be overwritten"""
+    if USER_QUOTA_MB <= 0:
+        return True, ""
+    usage = user_usage(username)
+    used = sum(size for kind, size in usage.items() if kind not in replacing)
+    quota = USER_QUOTA_MB * 2**20
+    if used + incoming_bytes <= quota:
+        return True, ""
+    return False, (f"This would use {(used + incoming_bytes) / 2**20:.1f} MB of your "
+                   f"{USER_QUOTA_MB:g} MB storage quota.")
+
+
+# Garbage collection
+def _age(path, now):
+    try:
+        return now - os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+def _remove(path, reason, removed, dry_run):
+    size = path_bytes(path)
+    if not dry_run:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    removed.append({"path": path, "reason": reason, "bytes": size})
+
+
+def collect_garbage(dry_run=False, progress=None):
+    """Remove stale and orphaned artifacts; returns what was (or, with dry_run, would be) removed"""
+    now = time.time()
+    removed = []
+    known_users = set(load_users())
+    active_uploads = {job["args"].get("path") for job in jobs.active_jobs("ingest_quotes")}
+
+    usernames = sorted(os.listdir(USERS_DIR)) if os.path.isdir(USERS_DIR) else []
+    for i, username in enumerate(usernames):
+        if progress and i % 50 == 0:
+            progress(i / max(len(usernames), 1) * 0.9, f"Checking users ({i}/{len(usernames)})")
+        user_dir = os.path.join(USERS_DIR, username)
+        # An unreadable or empty users file must never look like "every user was deleted"
+        if known_users and username not in known_users:
+            if _age(user_dir, now) > ABANDONED_AFTER:
+                _remove(user_dir, "user no longer exists", removed, dry_run)
+            continue
+        if not os.path.isdir(user_dir):
+            continue
+
+        audio_path = get_user_file_path(username, "response.mp3")
+        if os.path.exists(audio_path) and _age(audio_path, now) > AUDIO_TTL_HOURS * 3600:
+            _remove(audio_path, "old response audio", removed, dry_run)
+
+        upload_dir = get_user_file_path(username, jobs.UPLOAD_DIR)
+        if os.path.isdir(upload_dir):
+            for name in os.listdir(upload_dir):
+                path = os.path.join(upload_dir, name)
+                if path not in active_uploads and _age(path, now) > UPLOAD_TTL_HOURS * 3600:
+                    _remove(path, "abandoned upload", removed, dry_run)
+
+        for name in os.listdir(user_dir):
+            path = os.path.join(user_dir, name)
+            if name.endswith(STAGING_SUFFIX) and _age(path, now) > ABANDONED_AFTER:
+                _remove(path, "half-written store", removed, dry_run)
+            # A store moved aside by an interrupted save is only garbage once its replacement is in place
+            elif name.endswith(RETIRED_SUFFIX) and os.path.exists(path[:-len(RETIRED_SUFFIX)]) and \
+                    _age(path, now) > ABANDONED_AFTER:
+                _remove(path, "replaced store", removed, dry_run)
+
+        if os.path.isdir(get_user_file_path(username, "journal_index")) and \
+                not os.path.exists(get_user_file_path(username, "journal.json")):
+            _remove(get_user_file_path(username, "journal_index"), "index of a deleted journal", removed, dry_run)
+
+    if progress:
+        progress(0.9, "Checking exports and job history")
+    if os.path.isdir(EXPORT_DIR):
+        archives = []
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            if name.endswith(".partial"):
+                if _age(path, now) > ABANDONED_AFTER:
+                    _remove(path, "unfinished export", removed, dry_run)
+            elif name.endswith(".zip"):
+                archives.append(path)
+        archives.sort(key=os.path.getmtime, reverse=True)
+        for path in archives[EXPORT_KEEP:]:
+            _remove(path, "superseded export", removed, dry_run)
+
+    pruned_jobs = 0 if dry_run else jobs.prune_finished(JOB_HISTORY_DAYS * 86400)
+
+    result = {
+        "ran_at": str(datetime.datetime.now()),
+        "dry_run": dry_run,
+        "removed": removed,
+        "freed_bytes": sum(item["bytes"] for item in removed),
+        "pruned_jobs": pruned_jobs,
+    }
+    report = usage_report(save=False)
+    report["last_gc"] = {key: value for key, value in result.items() if key != "removed"}
+    report["last_gc"]["removed_count"] = len(removed)
+    _save_report(report)
+    return result
@@ -0,0 +1,13 @@
+import os, sys
+import pytest
+
+DILBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DILBOT_DIR)
+sys.path.insert(0, os.path.join(DILBOT_DIR, "benchmarks"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory: DilBot keeps users/, data/ and shared/ relative to the working directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
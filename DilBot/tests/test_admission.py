@@ -0,0 +1,98 @@
+import time, threading
+import pytest
+import admission
+from admission import AdmissionController, RateLimited, QueueTimeout
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_allows_a_burst_then_refills(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    controller = AdmissionController(rate_per_min=6, burst=3)
+    for _ in range(3):
+        controller.acquire_token("alice")
+    with pytest.raises(RateLimited) as limited:
+        controller.acquire_token("alice")
+    assert limited.value.retry_after == pytest.approx(10.0)
+    controller.acquire_token("bob")  # buckets are per user
+
+    clock.now += 10
+    controller.acquire_token("alice")
+    with pytest.raises(RateLimited):
+        controller.acquire_token("alice")
+
+
+def test_zero_rate_turns_the_limit_off():
+    controller = AdmissionController(rate_per_min=0, burst=1)
+    for _ in range(10):
+        controller.acquire_token("alice")
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_waiting_users_are_served_round_robin():
+    controller = AdmissionController(concurrency=1, max_pending_per_user=3)
+    order = []
+    release = threading.Event()
+
+    def turn(username, label):
+        with controller.slot(username):
+            order.append(label)
+            if label == "first":
+                release.wait(5)
+
+    threads = []
+    # alice holds the only slot, then queues two more; bob and carol queue one each
+    for username, label in [("alice", "first"), ("alice", "a2"), ("alice", "a3"), ("bob", "b1"), ("carol", "c1")]:
+        queued = controller.stats()["queued"]
+        thread = threading.Thread(target=turn, args=(username, label))
+        thread.start()
+        threads.append(thread)
+        _wait_until(lambda: order or controller.stats()["queued"] > queued)
+
+    assert controller.stats() == {"in_flight": 1, "queued": 4, "queued_users": 3, "concurrency": 1}
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert order == ["first", "a2", "b1", "c1", "a3"]
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_position_follows_the_rotation():
+    controller = AdmissionController(concurrency=0)
+    waiters = [controller._enqueue(name) for name in ("alice", "alice", "bob")]
+    assert [controller.position(w) for w in waiters] == [1, 3, 2]
+    for waiter in waiters:
+        controller._release(waiter)
+    assert controller.stats()["queued"] == 0
+
+
+def test_too_many_pending_requests_per_user():
+    controller = AdmissionController(concurrency=0, max_pending_per_user=1)
+    waiter = controller._enqueue("alice")
+    with pytest.raises(RateLimited):
+        controller._enqueue("alice")
+    controller._release(waiter)
+
+
+def test_queue_timeout_leaves_the_queue(monkeypatch):
+    monkeypatch.setattr(admission, "POSITION_POLL", 0.01)
+    controller = AdmissionController(concurrency=0, queue_timeout=0.05)
+    positions = []
+    with pytest.raises(QueueTimeout):
+        with controller.slot("alice", on_wait=positions.append):
+            pass
+    assert positions == [1]
+    assert controller.stats() == {"in_flight": 0, "queued": 0, "queued_users": 0, "concurrency": 0}
@@ -0,0 +1,76 @@
+import os, json, datetime
+import pytest
+import analytics
+import jobs
+import journal_archive
+import user_index
+
+
+def _write_journal(path, dates_and_emotions):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    entries = [{"date": date, "timestamp": f"{date} 10:00:{i:02d}", "user_input": "hi", "emotion": emotion,
+                "confidence": 80.0, "response": "ok"} for i, (date, emotion) in enumerate(dates_and_emotions)]
+    with open(path, "w") as f:
+        json.dump(entries, f)
+    return path
+
+
+@pytest.fixture
+def journals(workdir):
+    return [
+        _write_journal(str(workdir / "users/alice/journal.json"),
+                       [("2024-01-02", "joy"), ("2024-01-02", "sadness"), ("2024-06-01", "joy")]),
+        _write_journal(str(workdir / "users/bob/journal.json"), [("2024-06-01", "anger")]),
+        str(workdir / "users/carol/journal.json"),  # never wrote anything
+    ]
+
+
+def test_aggregates_cover_archived_and_hot_entries(journals):
+    journal_archive.archive_old_entries(journals[0], older_than_days=30, today=datetime.date(2024, 6, 2))
+    result = analytics.aggregate_journals(journals)
+    assert result["users"] == 3 and result["entries"] == 4
+    assert result["emotion_counts"] == {"joy": 2, "sadness": 1, "anger": 1}
+    assert result["daily"] == {"2024-01-02": {"entries": 2, "users": 1}, "2024-06-01": {"entries": 2, "users": 2}}
+    assert result["activity_levels"] == {"Inactive (0)": 1, "Light (1-5)": 2, "Moderate (6-20)": 0,
+                                         "Heavy (21+)": 0}
+    assert [row["entries"] for row in analytics.daily_rows(result)] == [2, 2]
+
+
+def test_parallel_chunks_merge_to_the_in_process_result(journals, monkeypatch):
+    monkeypatch.setattr(analytics, "CHUNK_USERS", 1)
+    reports = []
+    parallel, processes = analytics.compute(journals, workers=2, progress=lambda share, message: reports.append(share))
+    assert processes == 2
+    assert parallel == analytics.compute(journals, workers=0)[0]
+    assert reports[-1] == 1.0
+
+
+def test_cached_result_goes_stale_when_a_journal_changes(journals, monkeypatch):
+    assert analytics.cached() is None
+    user_index.add_user("alice", "a@example.com", "2024-01-01")
+    analytics.refresh(journals, workers=4)  # one chunk: streamed inline, no pool
+    cached = analytics.cached()
+    assert cached["entries"] == 4 and not cached["stale"] and not cached["due"]
+    assert cached["workers"] == 0
+
+    user_index.record_entries("alice", [{"emotion": "joy", "date": "2024-06-02"}])
+    assert analytics.cached()["stale"]
+    assert not analytics.cached()["due"]
+    monkeypatch.setattr(analytics, "REFRESH_MINUTES", 0)
+    assert analytics.cached()["due"]
+
+
+def test_fleet_analytics_job(workdir, monkeypatch):
+    pytest.importorskip("langchain")
+    from storage import signup
+    monkeypatch.setattr(jobs, "JOB_WORKERS", 0)
+    signup("alice", "secret1", "a@example.com")
+    _write_journal(str(workdir / "users/alice/journal.json"), [("2024-06-01", "joy")])
+    job = jobs.get_job(jobs.submit("fleet_analytics", {"workers": 0}))
+    assert job["status"] == "done"
+    assert (job["result"]["users"], job["result"]["entries"]) == (1, 1)
+    assert analytics.cached()["users"] == 1
+
+
+def test_job_worker_exits_when_its_parent_is_gone(workdir):
+    jobs.worker_loop(parent_pid=-1)  # returns instead of polling forever
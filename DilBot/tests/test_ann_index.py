@@ -0,0 +1,41 @@
+import io
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import ann_index
+import quote_ingest
+
+
+def test_choose_index_type_by_corpus_size():
+    assert ann_index.choose_index_type(10, "auto") == "flat"
+    assert ann_index.choose_index_type(ann_index.FLAT_MAX_QUOTES + 1, "auto") == "hnsw"
+    assert ann_index.choose_index_type(ann_index.HNSW_MAX_QUOTES + 1, "auto") == "ivf"
+    assert ann_index.choose_index_type(10, "IVF") == "ivf"
+
+
+def test_ivf_list_count_never_exceeds_the_points():
+    assert ann_index.ivf_list_count(0) == 1
+    assert ann_index.ivf_list_count(5) == 5
+    assert ann_index.ivf_list_count(10000) == 400
+    assert ann_index.ivf_list_count(10**12) == 65536
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf"])
+def test_build_vectorstore_finds_the_nearest_text(index_type):
+    texts = [f"quote {i}" for i in range(50)]
+    vectorstore = ann_index.build_vectorstore(texts, DeterministicFakeEmbedding(size=16), index_type)
+    assert vectorstore.index.ntotal == 50
+    assert vectorstore.similarity_search("quote 7", k=1)[0].page_content == "quote 7"
+
+
+def test_ivf_ingest_with_mostly_duplicate_lines():
+    # 2000 lines would size IVF at ivf_list_count(2000) lists, but only 30 quotes are unique
+    lines = [f"quote {i % 30}" for i in range(2000)]
+    stream = io.BytesIO("\n".join(lines).encode("utf-8"))
+    vectorstore, stats = quote_ingest.ingest_quotes(stream, DeterministicFakeEmbedding(size=16), index_type="ivf")
+    assert stats["added"] == 30
+    assert stats["index_type"] == "ivf"
+    index = faiss.extract_index_ivf(vectorstore.index)
+    assert index.nlist <= 30 and vectorstore.index.ntotal == 30
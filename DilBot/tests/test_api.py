@@ -0,0 +1,55 @@
+import json, base64
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain")
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+import api
+
+
+@pytest.fixture
+def client(workdir):
+    return TestClient(api.app)  # not entered, so no model processes are started
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_tokens_round_trip_and_reject_tampering(monkeypatch):
+    token = api.issue_token("alice", False)
+    assert api.read_token(f"Bearer {token}") == ("alice", False)
+
+    payload, signature = base64.urlsafe_b64decode(token).decode().rsplit(":", 1)
+    forged = base64.urlsafe_b64encode(f"{payload.replace(':0:', ':1:')}:{signature}".encode()).decode()
+    for header in (f"Bearer {forged}", "Bearer not-a-token", None):
+        with pytest.raises(HTTPException) as error:
+            api.read_token(header)
+        assert error.value.status_code == 401
+
+    monkeypatch.setattr(api, "API_TOKEN_TTL", -1)
+    with pytest.raises(HTTPException, match="expired"):
+        api.read_token(f"Bearer {api.issue_token('alice', False)}")
+
+
+def test_signup_login_and_journal(client, workdir):
+    assert client.post("/signup", json={"username": "alice", "password": "secret1", "email": "a@example.com"}
+                       ).json()["success"]
+    assert not client.post("/login", json={"username": "alice", "password": "wrong"}).json()["success"]
+    login = client.post("/login", json={"username": "alice", "password": "secret1"}).json()
+    assert login["success"] and not login["is_admin"]
+
+    with open(workdir / "users" / "alice" / "journal.json", "w") as f:
+        json.dump([{"date": "2024-03-01", "timestamp": "2024-03-01 10:00:00", "user_input": "hi",
+                    "emotion": "joy", "confidence": 90.0, "response": "hello"},
+                   {"date": "2024-03-02", "timestamp": "2024-03-02 10:00:00", "user_input": "meh",
+                    "emotion": "sadness", "confidence": 80.0, "response": "I hear you"}], f)
+    journal = client.get("/journal", params={"emotion": "Sadness"}, headers=_auth(login["token"])).json()
+    assert journal["total"] == 1 and journal["entries"][0]["user_input"] == "meh"
+
+    assert client.get("/journal").status_code == 401
+    assert client.get("/admin/stats", headers=_auth(login["token"])).status_code == 403
+    assert client.post("/turn", json={"message": "   "}, headers=_auth(login["token"])).status_code == 400
+    assert client.post("/turn", json={"message": "hi", "category": "Nope"},
+                       headers=_auth(login["token"])).status_code == 400
@@ -0,0 +1,55 @@
+import os, sys, subprocess
+import auth
+import user_index
+from conftest import DILBOT_DIR
+
+
+def test_signup_then_login(workdir):
+    assert auth.signup("alice", "secret1", "alice@example.com") == (True, "Account created successfully!")
+    assert os.path.isdir("users/alice")
+    assert auth.get_user_file_path("alice", "journal.json") == os.path.join("users/alice", "journal.json")
+    assert auth.login("alice", "secret1") == (True, "Login successful!", False)
+    assert auth.login("alice", "wrong") == (False, "Incorrect password", False)
+    assert auth.login("bob", "secret1")[0] is False
+    assert user_index.search(prefix="alice")[1] == 1
+
+
+def test_signup_rejects_taken_names_and_bad_emails(workdir):
+    auth.signup("alice", "secret1", "alice@example.com")
+    assert auth.signup("alice", "other1", "a2@example.com") == (False, "Username already exists")
+    assert auth.signup("bob", "secret1", "not-an-email") == (False, "Invalid email format")
+    assert auth.load_users()["alice"]["email"] == "alice@example.com"
+
+
+def test_admin_login(workdir, monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_USERNAME", "root")
+    monkeypatch.setattr(auth, "ADMIN_PASSWORD", "hunter22")
+    assert auth.login("root", "hunter22") == (True, "Admin login successful!", True)
+
+
+def test_validate_signup():
+    assert auth.validate_signup("", "secret1", "a@example.com") == "Please fill in all fields"
+    assert auth.validate_signup("alice", "secret1", "a@example.com", confirm="") == "Please fill in all fields"
+    assert auth.validate_signup("alice", "secret1", "a@example.com", confirm="secret2") == "Passwords don't match!"
+    assert "at least" in auth.validate_signup("alice", "short", "a@example.com")
+    assert auth.validate_signup("alice", "secret1", "a@b") == "Invalid email format"
+    assert auth.validate_signup("alice", "secret1", "a@example.com", confirm="secret1") is None
+
+
+def test_users_file_is_reread_only_when_it_changes(workdir):
+    auth.signup("alice", "secret1", "alice@example.com")
+    assert auth._cached_users() is auth._cached_users()
+
+    # Another worker adds an account
+    users = auth.load_users()
+    users["bob"] = dict(users["alice"], email="bob@example.com")
+    auth.save_users(users)
+    assert auth.username_exists("bob")
+    assert auth.get_user("bob")["email"] == "bob@example.com"
+
+
+def test_auth_imports_no_models_or_journal_store():
+    code = ("import sys, auth; heavy = {'torch', 'transformers', 'langchain', 'storage', 'journal_store'}; "
+            "print(sorted(heavy & set(sys.modules)))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=DILBOT_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("langchain")
+import bench_turn
+
+
+def test_stub_llm_is_deterministic():
+    llm = bench_turn.StubLLM()
+    assert llm.invoke("same prompt") == llm.invoke("same prompt")
+    assert llm.invoke("same prompt") != llm.invoke("another prompt")
+
+
+def test_stub_tts_writes_the_audio_file(workdir):
+    bench_turn.create_user_directory("bench")
+    path = bench_turn.make_stub_tts(0)("Hello there", "bench")
+    with open(path, "rb") as f:
+        assert f.read().startswith(b"ID3Hello")
+
+
+def test_latency_summary_in_milliseconds():
+    summary = bench_turn.latency_summary([0.001, 0.002, 0.003])
+    assert summary["count"] == 3
+    assert summary["mean_ms"] == pytest.approx(2.0)
+    assert summary["p50_ms"] == pytest.approx(2.0)
+
+
+def test_print_comparison_reports_changes(capsys):
+    def result(p50):
+        stats = {"count": 1, "mean_ms": p50, "p50_ms": p50, "p95_ms": p50}
+        return {"journal_entries": 10, "quote_corpus": "category", "throughput_turns_per_s": 1000 / p50,
+                "end_to_end": stats, "stages": {"chain_run": stats}}
+
+    bench_turn.print_comparison({"results": [result(5.0)]}, {"commit": "abc", "results": [result(10.0)]})
+    output = capsys.readouterr().out
+    assert "Compared with abc" in output
+    assert "(-50.0%)" in output
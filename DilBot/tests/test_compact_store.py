@@ -0,0 +1,67 @@
+import os, json
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import ann_index
+import compact_store
+
+TEXTS = ["Rest is productive.", "Be gentle with yourself.", "Ünïcode quotes survive too."]
+
+
+def _vectorstore(embeddings, vector_dtype="float32"):
+    vectors = np.asarray(embeddings.embed_documents(TEXTS), dtype=np.float32)
+    index = ann_index.make_index(vectors.shape[1], len(TEXTS), "flat", vector_dtype)
+    ann_index.train_index(index, vectors)
+    vectorstore = ann_index.wrap_index(index, embeddings)
+    vectorstore.add_embeddings(list(zip(TEXTS, vectors.tolist())))
+    return vectorstore
+
+
+def test_round_trip_records_the_index_dtype(workdir):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    path = str(workdir / "vectorstore")
+    compact_store.save_compact(_vectorstore(embeddings, "int8"), path)
+    with open(os.path.join(path, compact_store.MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    assert manifest["vector_dtype"] == "int8" and manifest["count"] == 3
+
+    store = compact_store.load_compact(path, embeddings)
+    assert list(compact_store.store_texts(store)) == TEXTS
+    assert store.similarity_search(TEXTS[2], k=1)[0].page_content == TEXTS[2]
+
+
+def test_loaded_stores_refuse_changes(workdir):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    path = str(workdir / "vectorstore")
+    compact_store.save_compact(_vectorstore(embeddings), path)
+    store = compact_store.load_compact(path, embeddings)
+    with pytest.raises(NotImplementedError):
+        store.add_texts(["Another quote."])
+    with pytest.raises(NotImplementedError):
+        store.delete(["0"])
+    assert store.index.ntotal == 3
+
+
+def test_a_store_moved_aside_stays_readable_until_replaced(workdir):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    path = str(workdir / "vectorstore")
+    compact_store.save_compact(_vectorstore(embeddings), path)
+    # As if a save crashed between moving the old store aside and moving the new one in
+    os.replace(path, path + compact_store.RETIRED_SUFFIX)
+    assert compact_store.is_compact_store(path)
+    assert compact_store.load_compact(path, embeddings).index.ntotal == 3
+
+    compact_store.save_compact(_vectorstore(embeddings, "float16"), path)
+    assert not os.path.exists(path + compact_store.RETIRED_SUFFIX)
+    assert compact_store.load_compact(path, embeddings).index.ntotal == 3
+
+    compact_store.remove_compact(path)
+    assert not compact_store.is_compact_store(path)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf"])
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_vector_dtype(index_type, dtype):
+    assert ann_index.vector_dtype(ann_index.make_index(16, 100, index_type, dtype)) == dtype
@@ -0,0 +1,70 @@
+import threading
+from conversation_memory import ConversationMemory, make_token_counter
+
+count_tokens = make_token_counter()
+
+
+def _memory(summarize=None, recent_turns=2, summary_every=2):
+    summarize = summarize or (lambda summary, turns: f"{turns.count('User:')} turns")
+    return ConversationMemory(summarize, count_tokens, recent_turns=recent_turns, summary_every=summary_every)
+
+
+def test_render_keeps_newest_turns_within_budget():
+    memory = _memory(recent_turns=10)
+    for i in range(5):
+        memory.add_turn(f"message {i}", f"reply {i}")
+    full = memory.render(1000)
+    assert full.startswith("User: message 0")
+
+    history = memory.render(20)
+    assert count_tokens(history) <= 20
+    assert "message 4" in history and "message 0" not in history
+    assert memory.render(0) == ""
+
+
+def test_render_truncates_an_oversized_summary():
+    memory = _memory()
+    memory.summary = "word " * 100
+    history = memory.render(10)
+    assert history.startswith("Summary of earlier conversation:")
+    assert count_tokens(history) <= 10
+
+
+def test_add_turn_reports_a_due_summary_without_making_the_call():
+    calls = []
+    memory = _memory(lambda summary, turns: calls.append(turns) or "summary")
+    due = [memory.add_turn(f"message {i}", f"reply {i}") for i in range(4)]
+    assert due == [False, False, False, True]
+    assert calls == []
+    assert "message 0" in memory.render(1000)  # still verbatim until summarized
+
+    memory.refresh_summary()
+    assert len(calls) == 1 and memory.unsummarized == []
+    assert memory.render(1000).startswith("Summary of earlier conversation: summary")
+
+
+def test_turns_evicted_during_a_summary_are_kept():
+    started, release = threading.Event(), threading.Event()
+
+    def summarize(summary, turns):
+        started.set()
+        release.wait(5)
+        return "summary"
+
+    memory = _memory(summarize)
+    for i in range(4):
+        memory.add_turn(f"message {i}", f"reply {i}")
+    worker = threading.Thread(target=memory.refresh_summary)
+    worker.start()
+    started.wait(5)
+    assert memory.add_turn("message 4", "reply 4") is False  # one summary at a time
+    release.set()
+    worker.join(5)
+    assert [user for user, _ in memory.unsummarized] == ["message 2"]
+
+
+def test_truncate_respects_the_token_limit():
+    memory = _memory()
+    text = "one two three four five"
+    assert memory.truncate(text, 3).strip() == "one two three"
+    assert memory.truncate(text, 0) == ""
@@ -0,0 +1,76 @@
+import os, json, time, zipfile, datetime
+import export
+
+
+def _journal(path, entries):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(entries, f)
+
+
+def test_user_changed_since(workdir):
+    since = datetime.datetime(2024, 3, 1)
+    journal_path = str(workdir / "users" / "alice" / "journal.json")
+    assert export.user_changed_since({"created_at": "2024-01-01 09:00:00"}, journal_path, None)
+    assert export.user_changed_since({"created_at": "2024-03-02 09:00:00"}, journal_path, since)
+    assert not export.user_changed_since({"created_at": "2024-01-01 09:00:00"}, journal_path, since)
+
+    # A record without created_at is decided by its journal's mtime
+    assert not export.user_changed_since({}, journal_path, since)
+    _journal(journal_path, [])
+    assert export.user_changed_since({}, journal_path, since)
+    old = time.mktime(datetime.datetime(2024, 2, 1).timetuple())
+    os.utime(journal_path, (old, old))
+    assert not export.user_changed_since({"created_at": None}, journal_path, since)
+
+
+def test_incremental_export_only_includes_new_entries(workdir):
+    users = {"alice": {"password": "hash", "email": "a@example.com", "created_at": "2024-01-01 09:00:00"},
+             "bob": {"password": "hash", "email": "b@example.com"}}
+    path_for = lambda name: str(workdir / "users" / name / "journal.json")
+    _journal(path_for("alice"), [
+        {"timestamp": "2024-01-02 10:00:00", "user_input": "old"},
+        {"user_input": "no timestamp"},
+    ])
+    _journal(path_for("bob"), [])
+
+    path, summary = export.export_user_data(users, path_for, export_dir=str(workdir / "exports"))
+    assert summary == {"users": 2, "journal_entries": 2, "since": None}
+    with zipfile.ZipFile(path) as archive:
+        profiles = [json.loads(line) for line in archive.read("users.ndjson").splitlines()]
+    assert all("password" not in profile for profile in profiles)
+
+    _journal(path_for("alice"), [
+        {"timestamp": "2024-01-02 10:00:00", "user_input": "old"},
+        {"user_input": "no timestamp"},
+        {"timestamp": str(datetime.datetime.now()), "user_input": "new"},
+    ])
+    old = time.mktime(datetime.datetime(2024, 2, 1).timetuple())
+    os.utime(path_for("bob"), (old, old))
+    path, summary = export.export_user_data(users, path_for, incremental=True, export_dir=str(workdir / "exports"))
+    assert summary["users"] == 1 and summary["journal_entries"] == 1
+    with zipfile.ZipFile(path) as archive:
+        entries = [json.loads(line) for line in archive.read("journals.ndjson").splitlines()]
+    assert [entry["user_input"] for entry in entries] == ["new"]
+
+
+def test_entry_written_after_an_export_started_is_in_the_next_one_once(workdir):
+    users = {"alice": {"password": "hash", "email": "a@example.com", "created_at": "2024-01-01 09:00:00"}}
+    path_for = lambda name: str(workdir / "users" / name / "journal.json")
+    exports = str(workdir / "exports")
+    _journal(path_for("alice"), [])
+    export.export_user_data(users, path_for, export_dir=exports)
+
+    # Queued just before that export started, written to disk after it read the journal
+    queued_at = datetime.datetime.fromisoformat(export.load_export_state()["last_export"]) - \
+        datetime.timedelta(milliseconds=300)
+    pending = {"timestamp": str(queued_at), "user_input": "pending"}
+    _journal(path_for("alice"), [pending])
+    _, summary = export.export_user_data(users, path_for, incremental=True, export_dir=exports)
+    assert summary["journal_entries"] == 1
+
+    _journal(path_for("alice"), [pending, {"timestamp": str(datetime.datetime.now()), "user_input": "later"}])
+    path, summary = export.export_user_data(users, path_for, incremental=True, export_dir=exports)
+    with zipfile.ZipFile(path) as archive:
+        entries = [json.loads(line) for line in archive.read("journals.ndjson").splitlines()]
+    assert [entry["user_input"] for entry in entries] == ["later"]
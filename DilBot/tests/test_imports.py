@@ -0,0 +1,43 @@
+# Every module imports, and every name imported from a DilBot module exists there.
+import os, ast, importlib
+import pytest
+from conftest import DILBOT_DIR
+
+BENCHMARKS_DIR = os.path.join(DILBOT_DIR, "benchmarks")
+MODULES = {name[:-3]: os.path.join(directory, name)
+           for directory in (DILBOT_DIR, BENCHMARKS_DIR)
+           for name in sorted(os.listdir(directory)) if name.endswith(".py")}
+SCRIPTS = {"app"}  # Streamlit pages run on import
+
+
+def _top_level_names(path):
+    names = set()
+    for node in ast.parse(open(path, encoding="utf-8").read()).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    return names
+
+
+@pytest.mark.parametrize("module", sorted(MODULES))
+def test_imported_names_exist(module):
+    for node in ast.walk(ast.parse(open(MODULES[module], encoding="utf-8").read())):
+        if isinstance(node, ast.ImportFrom) and node.module in MODULES:
+            defined = _top_level_names(MODULES[node.module])
+            missing = [alias.name for alias in node.names if alias.name not in defined]
+            assert not missing, f"{module} imports {missing} from {node.module}, which does not define them"
+
+
+@pytest.mark.parametrize("module", sorted(set(MODULES) - SCRIPTS))
+def test_module_imports(module, workdir):
+    try:
+        importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        if e.name in MODULES:
+            raise
+        pytest.skip(f"{e.name} is not installed")
@@ -0,0 +1,94 @@
+import os, time, sqlite3
+from contextlib import closing
+import pytest
+import jobs
+
+
+@pytest.fixture
+def queue(workdir, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WORKERS", 0)  # submit() runs the job inline
+    monkeypatch.setattr(jobs, "RETRY_BASE_DELAY", 0)
+    return monkeypatch
+
+
+def test_inline_job_reports_progress_and_result(queue):
+    def double(args, progress):
+        progress(0.5, "halfway")
+        return {"value": args["value"] * 2}
+
+    queue.setitem(jobs.HANDLERS, "double", double)
+    job = jobs.get_job(jobs.submit("double", {"value": 21}, username="alice"))
+    assert job["status"] == "done" and job["progress"] == 1.0
+    assert job["result"] == {"value": 42} and job["message"] == "halfway"
+    assert jobs.latest_job("double", "alice")["id"] == job["id"]
+    assert jobs.active_jobs("double") == []
+
+
+def test_failing_job_is_retried_then_failed(queue):
+    calls = []
+
+    def flaky(args, progress):
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    queue.setitem(jobs.HANDLERS, "flaky", flaky)
+    job = jobs.get_job(jobs.submit("flaky", {}, max_attempts=3))
+    assert len(calls) == 3
+    assert job["status"] == "failed" and job["attempts"] == 3
+    assert "RuntimeError: boom" in job["error"]
+
+    with pytest.raises(ValueError):
+        jobs.submit("no_such_kind", {})
+
+
+def test_orphaned_running_job_is_requeued(queue):
+    queue.setattr(jobs, "JOB_WORKERS", 1)
+    queue.setitem(jobs.HANDLERS, "noop", lambda args, progress: "ok")
+    job_id = jobs.submit("noop", {})
+    with closing(jobs.connect()) as conn:
+        conn.execute("UPDATE jobs SET status = 'running', heartbeat_at = ? WHERE id = ?",
+                     (time.time() - jobs.STALE_AFTER - 1, job_id))
+        assert jobs.run_next(conn)
+    assert jobs.get_job(job_id)["status"] == "done"
+
+
+def test_recurring_jobs_are_queued_once_per_interval(queue):
+    queue.setattr(jobs, "SCHEDULE", {"noop": 3600})
+    queue.setitem(jobs.HANDLERS, "noop", lambda args, progress: "ok")
+    with closing(jobs.connect()) as conn:
+        jobs.submit_due(conn)
+        jobs.submit_due(conn)
+    assert len(jobs.active_jobs("noop")) == 1
+
+
+def test_prune_keeps_the_latest_job_of_each_kind(queue):
+    queue.setitem(jobs.HANDLERS, "noop", lambda args, progress: "ok")
+    first, second = jobs.submit("noop", {}), jobs.submit("noop", {})
+    with closing(jobs.connect()) as conn:
+        conn.execute("UPDATE jobs SET finished_at = 0")
+    assert jobs.prune_finished(60) == 1
+    assert jobs.get_job(first) is None and jobs.get_job(second) is not None
+
+
+def test_speech_is_claimed_ahead_of_queued_batch_work(queue):
+    queue.setattr(jobs, "JOB_WORKERS", 1)  # queue without running
+    export_id = jobs.submit("export", {})
+    tts_id = jobs.submit("tts", {"text": "hi", "username": "alice"})
+    with closing(jobs.connect()) as conn:
+        # The interactive worker never takes batch work
+        assert jobs._claim(conn, max_priority=jobs.INTERACTIVE)["id"] == tts_id
+        assert jobs._claim(conn, max_priority=jobs.INTERACTIVE) is None
+        assert jobs._claim(conn)["id"] == export_id
+
+
+def test_queue_from_before_priorities_is_migrated(queue):
+    os.makedirs(os.path.dirname(jobs.JOBS_DB_PATH), exist_ok=True)
+    with closing(sqlite3.connect(jobs.JOBS_DB_PATH)) as conn:
+        conn.executescript(jobs._SCHEMA.replace("    priority INTEGER NOT NULL DEFAULT 1,\n", ""))
+        conn.execute("INSERT INTO jobs (kind, args, created_at, run_after) VALUES ('export', '{}', 0, 0)")
+        conn.commit()
+    queue.setattr(jobs, "JOB_WORKERS", 1)
+    tts_id = jobs.submit("tts", {"text": "hi", "username": "alice"})
+    with closing(jobs.connect()) as conn:
+        assert jobs._claim(conn)["id"] == tts_id
+        assert jobs._claim(conn)["priority"] == jobs.BATCH
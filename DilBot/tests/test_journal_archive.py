@@ -0,0 +1,79 @@
+import os, json, datetime
+import journal_archive
+from journal_store import iter_journal_entries
+
+TODAY = datetime.date(2024, 6, 15)
+
+
+def _entry(date, hour, emotion="joy", confidence=80.0):
+    return {"date": date, "timestamp": f"{date} {hour:02d}:00:00", "user_input": f"on {date}",
+            "emotion": emotion, "confidence": confidence, "response": "ok"}
+
+
+def _write_journal(path, entries):
+    with open(path, "w") as f:
+        json.dump(entries, f, indent=4)
+
+
+def _journal(workdir):
+    entries = [
+        _entry("2024-01-10", 9, "joy", 90.0),
+        _entry("2024-01-20", 9, "sadness", 60.0),
+        _entry("2024-02-03", 9, "joy", 70.0),
+        _entry("2024-06-10", 9, "anger", 50.0),
+    ]
+    journal_path = str(workdir / "journal.json")
+    _write_journal(journal_path, entries)
+    return journal_path, entries
+
+
+def test_old_entries_move_into_monthly_segments(workdir):
+    journal_path, entries = _journal(workdir)
+
+    assert journal_archive.archive_old_entries(journal_path, older_than_days=30, today=TODAY) == 3
+    assert list(iter_journal_entries(journal_path)) == entries[3:]
+    assert os.path.exists(journal_archive.segment_path(journal_path, "2024-01"))
+    assert os.path.exists(journal_archive.segment_path(journal_path, "2024-02"))
+    assert list(journal_archive.iter_full_journal(journal_path)) == entries
+
+
+def test_summary_comes_from_the_index(workdir):
+    journal_path, _ = _journal(workdir)
+    journal_archive.archive_old_entries(journal_path, older_than_days=30, today=TODAY)
+
+    summary = journal_archive.summary(journal_path)
+    assert summary["entries"] == 3
+    assert summary["emotion_counts"] == {"joy": 2, "sadness": 1}
+    assert summary["confidence_sum"] == 220.0
+    assert (summary["first_date"], summary["last_date"]) == ("2024-01-10", "2024-02-03")
+    assert summary["daily"]["2024-01-20"] == {"sadness": 1}
+    assert summary["months"]["2024-01"]["entries"] == 2
+
+
+def test_archived_reads_skip_months_outside_the_range(workdir):
+    journal_path, entries = _journal(workdir)
+    journal_archive.archive_old_entries(journal_path, older_than_days=30, today=TODAY)
+    os.remove(journal_archive.segment_path(journal_path, "2024-01"))  # never opened for February
+
+    assert list(journal_archive.iter_archived_entries(journal_path, "2024-02-01", "2024-02-28")) == [entries[2]]
+    assert list(journal_archive.iter_archived_month(journal_path, "2024-02")) == [entries[2]]
+    assert list(journal_archive.iter_archived_month(journal_path, "2024-03")) == []
+
+
+def test_rerun_and_interrupted_run_do_not_duplicate(workdir):
+    journal_path, entries = _journal(workdir)
+    journal_archive.archive_old_entries(journal_path, older_than_days=30, today=TODAY)
+    assert journal_archive.archive_old_entries(journal_path, older_than_days=30, today=TODAY) == 0
+
+    # A run that saved the index but died before replacing journal.json
+    _write_journal(journal_path, entries)
+    assert journal_archive.archive_old_entries(journal_path, older_than_days=30, today=TODAY) == 0
+    assert list(journal_archive.iter_full_journal(journal_path)) == entries
+    assert journal_archive.summary(journal_path)["entries"] == 3
+
+
+def test_disabled_archiving_leaves_the_journal_alone(workdir):
+    journal_path, entries = _journal(workdir)
+    assert journal_archive.archive_old_entries(journal_path, older_than_days=0, today=TODAY) == 0
+    assert list(iter_journal_entries(journal_path)) == entries
+    assert not os.path.exists(journal_archive.archive_dir(journal_path))
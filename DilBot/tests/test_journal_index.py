@@ -0,0 +1,92 @@
+import os, json, shutil
+import pytest
+
+np = pytest.importorskip("numpy")
+import journal_index
+
+
+def _entry(i, emotion="joy", date="2024-03-01"):
+    return {"timestamp": f"2024-03-01 10:00:{i:02d}", "date": date, "emotion": emotion,
+            "user_input": f"entry {i}", "response": f"reply {i}"}
+
+
+def _vector(i, dim=8):
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[i % dim] = 1.0
+    return vector
+
+
+def test_search_filters_by_date_and_emotion(workdir):
+    index_dir = str(workdir / "journal_index")
+    journal_index.add_entry(index_dir, _entry(0, "joy", "2024-03-01"), _vector(0))
+    journal_index.add_entry(index_dir, _entry(1, "sadness", "2024-03-05"), _vector(1))
+    journal_index.add_entry(index_dir, _entry(2, "joy", "2024-03-09"), _vector(1))
+
+    matches = journal_index.search(index_dir, _vector(1), k=2)
+    assert [m["user_input"] for m in matches][0] in ("entry 1", "entry 2")
+    assert matches[0]["similarity"] == pytest.approx(1.0)
+
+    matches = journal_index.search(index_dir, _vector(1), k=5, emotions=["Joy"], start_date="2024-03-02")
+    assert [m["user_input"] for m in matches] == ["entry 2"]
+    assert matches[0]["response"] == "reply 2"
+
+
+def test_torn_write_is_truncated_before_the_next_append(workdir):
+    index_dir = str(workdir / "journal_index")
+    journal_index.add_entry(index_dir, _entry(0), _vector(0))
+    # A crash after the vector append but before the offset append
+    with open(os.path.join(index_dir, journal_index.VECTORS_FILE), "ab") as f:
+        f.write(_vector(5).tobytes())
+    journal_index._cache.clear()
+    assert journal_index.entry_count(index_dir) == 1
+
+    journal_index.add_entry(index_dir, _entry(1), _vector(1))
+    journal_index._cache.clear()
+    assert journal_index.entry_count(index_dir) == 2
+    match = journal_index.search(index_dir, _vector(1), k=1)[0]
+    assert match["user_input"] == "entry 1"
+    assert match["similarity"] == pytest.approx(1.0)
+
+
+def test_backfill_indexes_each_entry_once(workdir):
+    journal_path = str(workdir / "journal.json")
+    index_dir = str(workdir / "journal_index")
+    entries = [_entry(i) for i in range(4)]
+    with open(journal_path, "w") as f:
+        json.dump(entries, f)
+    journal_index.add_entry(index_dir, entries[2], _vector(2))  # indexed by the writer, out of order
+
+    encoded = []
+
+    def encode(texts):
+        encoded.extend(texts)
+        return [_vector(int(text.split()[1])) for text in texts]
+
+    assert journal_index.backfill(index_dir, journal_path, encode) == 3
+    assert encoded == ["entry 0", "entry 1", "entry 3"]
+    assert journal_index.entry_count(index_dir) == 4
+    assert journal_index.backfill(index_dir, journal_path, encode) == 0
+
+
+def test_index_deleted_by_another_process_is_reloaded_before_appending(workdir):
+    index_dir = str(workdir / "journal_index")
+    for i in range(5):
+        journal_index.add_entry(index_dir, _entry(i), _vector(i))
+    assert journal_index.entry_count(index_dir) == 5  # cached
+
+    shutil.rmtree(index_dir)  # a reset in the job worker
+    journal_index.add_entry(index_dir, _entry(7), _vector(3))
+    assert journal_index.entry_count(index_dir) == 1
+    assert [m["user_input"] for m in journal_index.search(index_dir, _vector(3), k=5)] == ["entry 7"]
+
+
+def test_entries_without_a_timestamp_are_skipped(workdir):
+    journal_path = str(workdir / "journal.json")
+    index_dir = str(workdir / "journal_index")
+    legacy = {"date": "2023-12-01", "emotion": "joy", "user_input": "entry 6", "response": "ok"}
+    with open(journal_path, "w") as f:
+        json.dump([legacy, _entry(1)], f)
+
+    assert journal_index.add_entry(index_dir, legacy, _vector(6)) is False
+    assert journal_index.backfill(index_dir, journal_path, lambda texts: [_vector(1) for _ in texts]) == 1
+    assert journal_index.entry_count(index_dir) == 1
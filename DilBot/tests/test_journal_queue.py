@@ -0,0 +1,91 @@
+import threading
+import pytest
+import metrics
+from journal_queue import WriteBehindQueue
+
+
+class Recorder:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    def __call__(self, key, items, durable):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.batches.append((key, list(items), durable))
+
+
+def _queue(write_batch):
+    # No early flush and a long interval: the tests flush by hand
+    return WriteBehindQueue(write_batch, flush_interval=60, max_pending=1000)
+
+
+def test_items_are_pending_until_flushed_in_submit_order():
+    writes = Recorder()
+    queue = _queue(writes)
+    queue.submit("alice", 1)
+    queue.submit("bob", 2)
+    queue.submit("alice", 3)
+    assert queue.pending("alice") == [1, 3]
+    assert writes.batches == []
+
+    queue.flush("alice")
+    assert writes.batches == [("alice", [1, 3], False)]
+    assert queue.pending("alice") == []
+    assert queue.pending("bob") == [2]
+    queue.close()
+    assert writes.batches[-1] == ("bob", [2], True)
+
+
+def test_failed_batch_stays_queued_and_is_written_once():
+    writes = Recorder(failures=1)
+    queue = _queue(writes)
+    queue.submit("alice", 1)
+    with pytest.raises(OSError):
+        queue.flush("alice")
+    assert queue.pending("alice") == [1]
+
+    queue.submit("alice", 2)
+    queue.flush("alice")
+    queue.flush("alice")
+    assert writes.batches == [("alice", [1, 2], False)]
+    queue.close()
+
+
+def test_durable_submit_writes_before_returning():
+    writes = Recorder()
+    queue = _queue(writes)
+    queue.submit("alice", 1, durable=True)
+    assert writes.batches == [("alice", [1], True)]
+    assert queue.pending("alice") == []
+    queue.close()
+
+
+def test_background_thread_retries_a_failed_batch(monkeypatch):
+    monkeypatch.setattr("journal_queue.RETRY_DELAY", 0)
+    written = threading.Event()
+
+    def write_batch(key, items, durable):
+        writes(key, items, durable)
+        if writes.batches:
+            written.set()
+
+    writes = Recorder(failures=2)
+    queue = WriteBehindQueue(write_batch, flush_interval=0.01)
+    queue.submit("alice", 1)
+    assert written.wait(5)
+    assert writes.batches == [("alice", [1], False)]
+    queue.close()
+
+
+def test_discard_drops_queued_items(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    writes = Recorder()
+    queue = _queue(writes)
+    queue.submit("alice", 1)
+    assert metrics._gauges["journal_pending_entries"] == 1
+    queue.discard("alice")
+    assert metrics._gauges["journal_pending_entries"] == 0
+    queue.close()
+    assert writes.batches == []
@@ -0,0 +1,95 @@
+import time, threading
+from functools import partial
+import pytest
+import httpcore
+
+pytest.importorskip("langchain_groq")
+import llm_router
+import turn_pipeline
+from groq_stub import StubConfig, start_stub_server, reply_for
+
+
+@pytest.fixture
+def stubs():
+    servers = {}
+
+    def start(name, **config):
+        server, base_url = start_stub_server(StubConfig(token_delay=0, **config))
+        servers[name] = server
+        return partial(turn_pipeline._chat_model, name, "key", base_url, 0)
+
+    yield start
+    for server in servers.values():
+        server.shutdown()
+
+
+def _attempt_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("llm-")]
+
+
+def _wait_for_no_attempts(timeout=2):
+    deadline = time.monotonic() + timeout
+    while _attempt_threads():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_fast_primary_is_not_hedged(stubs):
+    llm = llm_router.HedgedLLM(primary=stubs("primary", latency=0), secondary=stubs("secondary", latency=0),
+                               hedge_after=5)
+    before = llm_router.hedge_stats()
+    assert llm.invoke("hello") == reply_for([{"role": "user", "content": "hello"}])
+    after = llm_router.hedge_stats()
+    assert after["calls"] == before["calls"] + 1
+    assert after["hedged"] == before["hedged"]
+
+
+def test_calls_reuse_a_pooled_connection(stubs, monkeypatch):
+    connects = []
+    connect_tcp = httpcore.SyncBackend.connect_tcp
+    monkeypatch.setattr(httpcore.SyncBackend, "connect_tcp",
+                        lambda self, *args, **kwargs: connects.append(args) or connect_tcp(self, *args, **kwargs))
+    llm = llm_router.HedgedLLM(primary=stubs("primary", latency=0), hedge_after=5)
+    for _ in range(3):
+        assert llm.invoke("hello") == reply_for([{"role": "user", "content": "hello"}])
+    assert len(connects) == 1  # one handshake, not one per call
+
+
+def test_slow_primary_loses_and_is_cut_off_before_its_first_byte(stubs):
+    llm = llm_router.HedgedLLM(primary=stubs("primary", latency=10), secondary=stubs("secondary", latency=0),
+                               hedge_after=0.2)
+    before = llm_router.hedge_stats()
+    started = time.monotonic()
+    assert llm.invoke("hello") == reply_for([{"role": "user", "content": "hello"}])
+    assert time.monotonic() - started < 5
+    after = llm_router.hedge_stats()
+    assert after["hedged"] == before["hedged"] + 1
+    assert after["secondary_wins"] == before["secondary_wins"] + 1
+    # The primary's request, still waiting for headers, gives its thread back now, not after 10s
+    assert _wait_for_no_attempts()
+
+
+def test_failed_primary_falls_back_right_away(stubs):
+    llm = llm_router.HedgedLLM(primary=stubs("primary", latency=0, error_rate=1.0),
+                               secondary=stubs("secondary", latency=0), hedge_after=10)
+    before = llm_router.hedge_stats()
+    started = time.monotonic()
+    llm.invoke("hello")
+    assert time.monotonic() - started < 5
+    assert llm_router.hedge_stats()["fallbacks"] == before["fallbacks"] + 1
+
+
+def test_both_failing_raises(stubs):
+    llm = llm_router.HedgedLLM(primary=stubs("primary", latency=0, error_rate=1.0),
+                               secondary=stubs("secondary", latency=0, error_rate=1.0), hedge_after=10)
+    with pytest.raises(Exception):
+        llm.invoke("hello")
+
+
+def test_hedging_is_off_unless_configured(monkeypatch):
+    monkeypatch.setattr(turn_pipeline, "LLM_HEDGE_AFTER", 0)
+    monkeypatch.setattr(turn_pipeline, "GROQ_API_KEY", "key")
+    assert not isinstance(turn_pipeline.make_llm(), llm_router.HedgedLLM)
+    assert isinstance(turn_pipeline.make_llm(hedge_after=1.5), llm_router.HedgedLLM)
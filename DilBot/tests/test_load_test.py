@@ -0,0 +1,51 @@
+import json, urllib.request, urllib.error
+import pytest
+
+from groq_stub import StubConfig, start_stub_server, reply_for, COMPLETIONS_PATH
+
+
+def _post(base_url, body):
+    request = urllib.request.Request(base_url + COMPLETIONS_PATH, data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.read().decode("utf-8")
+
+
+def test_groq_stub_answers_deterministically_and_streams():
+    server, base_url = start_stub_server(StubConfig(latency=0, token_delay=0))
+    try:
+        messages = [{"role": "user", "content": "hello"}]
+        reply = json.loads(_post(base_url, {"model": "m", "messages": messages}))
+        assert reply["choices"][0]["message"]["content"] == reply_for(messages)
+
+        events = [line[len("data: "):] for line in _post(base_url, {"model": "m", "messages": messages,
+                                                                    "stream": True}).splitlines()
+                  if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        streamed = "".join(json.loads(event)["choices"][0]["delta"].get("content", "") for event in events[:-1])
+        assert streamed == reply_for(messages)
+        assert server.config.requests == 2
+    finally:
+        server.shutdown()
+
+
+def test_groq_stub_fails_the_configured_share():
+    server, base_url = start_stub_server(StubConfig(latency=0, error_rate=1.0, error_status=429, seed=1))
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            _post(base_url, {"model": "m", "messages": []})
+        assert error.value.code == 429
+        assert server.config.errors == 1
+    finally:
+        server.shutdown()
+
+
+def test_recorder_summary():
+    pytest.importorskip("langchain")
+    from load_test import Recorder
+
+    recorder = Recorder()
+    assert recorder.timed("turn", lambda: "ok") == "ok"
+    assert recorder.timed("turn", lambda: 1 / 0) is None
+    summary = recorder.summary(elapsed=1.0)["turn"]
+    assert summary["count"] == 2 and summary["errors"] == 1 and summary["error_rate"] == 0.5
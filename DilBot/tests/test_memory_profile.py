@@ -0,0 +1,77 @@
+import pytest
+import metrics
+import memory_profile
+
+
+@pytest.fixture(autouse=True)
+def clean(monkeypatch):
+    monkeypatch.setattr(memory_profile, "ENABLED", True)
+    monkeypatch.setattr(memory_profile, "_loads", {})
+    monkeypatch.setattr(memory_profile, "_caches", {})
+    monkeypatch.setattr(memory_profile, "_sessions", {})
+    yield
+    memory_profile.stop_tracing()
+
+
+def test_loads_are_recorded_per_name_and_argument():
+    @memory_profile.track_load("index", per_argument=True)
+    def load(name):
+        return bytearray(1024)
+
+    load("alice")
+    load("bob")
+    assert set(memory_profile.report()["loads"]) == {"index:alice", "index:bob"}
+    assert memory_profile.report()["loads"]["index:alice"]["seconds"] >= 0
+
+
+def test_deep_sizeof_follows_containers_and_counts_arrays_by_buffer():
+    np = pytest.importorskip("numpy")
+    array = np.zeros(1000, dtype=np.float64)
+    assert 8000 <= memory_profile.deep_sizeof(array) < 2 * 8000
+    assert memory_profile.deep_sizeof({"a": array, "b": [array]}) < 2 * 8000  # shared, counted once
+    assert memory_profile.deep_sizeof(array[:10]) < 8000  # a view owns no buffer
+    assert memory_profile.deep_sizeof(["x" * 1000]) > 1000
+
+
+def test_sessions_are_sampled_and_expire(monkeypatch):
+    memory_profile.record_session("s1", "alice", {"history": ["x" * 5000], "flag": True})
+    first = memory_profile.report()["sessions"]["s1"]
+    assert first["username"] == "alice"
+    assert first["largest"][0][0] == "history"
+
+    # Within the sample interval the state is not measured again
+    memory_profile.record_session("s1", "alice", {"history": []})
+    assert memory_profile.report()["sessions"]["s1"]["bytes"] == first["bytes"]
+
+    monkeypatch.setattr(memory_profile, "SESSION_STALE_AFTER", -1)
+    assert memory_profile.report()["sessions"] == {}
+
+
+def test_failing_cache_stats_are_reported_not_raised():
+    memory_profile.register_cache("ok", lambda: (3, 300))
+    memory_profile.register_cache("broken", lambda: 1 / 0)
+    caches = memory_profile.report()["caches"]
+    assert caches["ok"] == {"entries": 3, "bytes": 300}
+    assert caches["broken"]["entries"] is None and "division" in caches["broken"]["error"]
+
+
+def test_publish_sets_gauges():
+    memory_profile.register_cache("journal index", lambda: (2, 64))
+    metrics.reset()
+    memory_profile.publish()
+    text = metrics.render_prometheus()
+    assert "memory_cache_entries_journal_index 2" in text
+    assert "memory_rss_bytes" in text
+
+
+def test_tracing_snapshots_report_growth():
+    assert memory_profile.snapshot() == []
+    memory_profile.start_tracing()
+    kept = [bytearray(100) for _ in range(100)]
+    first = memory_profile.snapshot(limit=5)
+    assert first and first[0]["growth"] is None
+    kept += [bytearray(100) for _ in range(100)]
+    assert all(site["growth"] is not None for site in memory_profile.snapshot(limit=5))
+    del kept
+    memory_profile.stop_tracing()
+    assert not memory_profile.report()["tracing"]
@@ -0,0 +1,41 @@
+import socket, logging, urllib.request
+import metrics
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    histogram = metrics.Histogram()
+    for seconds in (0.001, 0.002, 0.003, 1.0):
+        histogram.observe(seconds)
+    assert histogram.total == 4
+    assert 0.001 <= histogram.quantile(0.5) < 0.003
+    assert histogram.quantile(1.0) >= 1.0
+    assert metrics.Histogram().quantile(0.5) is None
+
+
+def test_spans_and_counters_render_for_prometheus():
+    metrics.reset()
+    with metrics.span("unit_test_stage"):
+        pass
+    metrics.increment("unit_test_total", 2)
+    text = metrics.render_prometheus()
+    assert "dilbot_unit_test_total 2" in text
+    assert "unit_test_stage" in text
+    assert metrics.counters("unit_test_") == {"unit_test_total": 2}
+
+
+def test_metrics_server_binds_loopback_and_warns_when_the_port_is_taken(caplog):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        free_port = probe.getsockname()[1]
+    server = metrics.start_metrics_server(port=free_port)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+        with caplog.at_level(logging.WARNING, logger="dilbot"):
+            assert metrics.start_metrics_server(port=port) is None
+        assert "Metrics endpoint not started" in caplog.text
+    finally:
+        server.shutdown()
+        server.server_close()
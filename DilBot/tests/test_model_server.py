@@ -0,0 +1,99 @@
+import os, stat, time, threading
+from multiprocessing.connection import AuthenticationError, Client
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+import models
+import model_server
+
+
+class FakeSentenceModel:
+    def encode(self, texts, batch_size=32):
+        return np.array([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    batches = []
+
+    def detect(texts, token_counts=None):
+        batches.append(list(texts))
+        server.token_counts.append(list(token_counts))
+        return [(text, 1.0, None) for text in texts]
+
+    monkeypatch.setattr(models, "detect_emotion_profiles", detect)
+    monkeypatch.setattr(models, "load_emotion_model", lambda: None)
+    monkeypatch.setattr(models, "load_sentence_model", FakeSentenceModel)
+    server = model_server.BatchingModelServer(max_batch=8, batch_wait=0.2)
+    server.batches = batches
+    server.token_counts = []
+    return server
+
+
+def test_concurrent_requests_share_a_batch(server):
+    results = {}
+
+    def ask(i):
+        results[i] = server.submit("emotion", [f"text {i}"])
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {i: [(f"text {i}", 1.0, None)] for i in range(4)}
+    assert len(server.batches) == 1
+    assert server.stats["emotion"] == {"requests": 4, "texts": 4, "batches": 1}
+
+
+def test_batches_stop_at_max_batch(server):
+    assert len(server.submit("emotion", [f"t{i}" for i in range(8)])) == 8
+    assert server.batches == [[f"t{i}" for i in range(8)]]
+
+
+def test_a_failed_batch_fails_its_requests(server, monkeypatch):
+    def broken(texts, token_counts):
+        raise RuntimeError("out of memory")
+
+    server.handlers["emotion"] = broken
+    with pytest.raises(model_server.ModelServerError, match="out of memory"):
+        server.submit("emotion", ["hello"])
+
+
+def test_client_over_the_socket(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(model_server, "BatchingModelServer", lambda *args: server)
+    socket_path = str(tmp_path / "models.sock")
+    threading.Thread(target=model_server.serve, args=(socket_path,), daemon=True).start()
+
+    client = model_server.ModelClient(socket_path, timeout=5)
+    for _ in range(100):
+        try:
+            assert client.detect_emotion_profile("hi") == ("hi", 1.0, None)
+            break
+        except model_server.ModelServerError:
+            time.sleep(0.05)  # the listener is not up yet
+    else:
+        pytest.fail("model server did not start")
+
+    # A turn's token count travels with its text, so the server does not tokenize it again
+    assert client.detect_emotion_profile("hello there", token_count=2) == ("hello there", 1.0, None)
+    assert server.token_counts[-1] == [2]
+    assert client.encode("abc").tolist() == [3.0, 1.0]
+    assert client.encode(["a", "ab"]).shape == (2, 2)
+    assert client.stats()["encode"]["texts"] == 3
+    with pytest.raises(model_server.ModelServerError, match="Unknown operation"):
+        client.call("translate", ["hi"])
+
+    # Owner-only socket and a random key: nobody else can hand the server a pickle
+    assert os.stat(socket_path).st_mode & 0o077 == 0
+    assert stat.S_IMODE(os.stat(model_server.key_path(socket_path)).st_mode) == 0o600
+    with pytest.raises(AuthenticationError):
+        Client(socket_path, family="AF_UNIX", authkey=b"dilbot-models")
+
+
+def test_client_without_a_server(tmp_path):
+    client = model_server.ModelClient(str(tmp_path / "missing.sock"))
+    with pytest.raises(model_server.ModelServerError, match="No model server"):
+        client.encode("hi")
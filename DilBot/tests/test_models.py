@@ -0,0 +1,92 @@
+import re
+import pytest
+import models
+
+
+class WordTokenizer:
+    """One token per word, with character offsets, plus two special tokens per text"""
+
+    def __call__(self, texts, add_special_tokens=True, return_offsets_mapping=False):
+        offsets = [[m.span() for m in re.finditer(r"\S+", text)] for text in texts]
+        extra = self.num_special_tokens_to_add() if add_special_tokens else 0
+        encoded = {"input_ids": [[0] * (len(spans) + extra) for spans in offsets]}
+        if return_offsets_mapping:
+            encoded["offset_mapping"] = offsets
+        return encoded
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+class KeywordClassifier:
+    """Sad for texts mentioning "sad", joy otherwise; records every call's inputs"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, inputs, top_k=None, batch_size=None, truncation=False):
+        self.calls.append(list(inputs))
+        return [[{"label": "Sadness", "score": 0.8}, {"label": "Joy", "score": 0.2}] if "sad" in text
+                else [{"label": "Joy", "score": 0.9}, {"label": "Sadness", "score": 0.1}] for text in inputs]
+
+
+@pytest.fixture
+def classifier(monkeypatch):
+    model = KeywordClassifier()
+    monkeypatch.setattr(models, "load_tokenizer", WordTokenizer)
+    monkeypatch.setattr(models, "load_emotion_model", lambda: model)
+    monkeypatch.setattr(models, "MODEL_SERVER", None)
+    return model
+
+
+def test_sentences_are_packed_up_to_the_segment_size(classifier):
+    text = "one two three. four five. six seven eight nine."
+    segments = models.split_segments(text, max_tokens=5)
+    assert [text[a:b] for a, b, _ in segments] == ["one two three. four five.", "six seven eight nine."]
+    assert [tokens for _, _, tokens in segments] == [5, 4]
+
+
+def test_long_sentences_are_windowed_at_token_boundaries(classifier):
+    text = " ".join(f"w{i}" for i in range(7))
+    segments = models.split_segments(text, max_tokens=3)
+    assert [text[a:b] for a, b, _ in segments] == ["w0 w1 w2", "w3 w4 w5", "w6"]
+
+
+def test_short_text_is_one_input_without_a_profile(classifier):
+    assert models.detect_emotion_profile("a happy day") == ("joy", 0.9, None)
+    assert classifier.calls == [["a happy day"]]
+
+
+def _sentence(word, words=100):
+    return " ".join([word] * words) + "."
+
+
+def test_long_text_is_classified_by_length_weighted_segments(classifier, monkeypatch):
+    monkeypatch.setattr(models, "EMOTION_MAX_TOKENS", 150)
+    # Sentences of 100 words do not pack into one segment of EMOTION_SEGMENT_TOKENS (128)
+    text = " ".join([_sentence("sad"), _sentence("sun"), _sentence("sun", 50)])
+    label, score, profile = models.detect_emotion_profile(text)
+
+    assert [s["emotion"] for s in profile["segments"]] == ["sadness", "joy", "joy"]
+    assert [text[s["start"]:s["end"]] for s in profile["segments"]] == [
+        _sentence("sad"), _sentence("sun"), _sentence("sun", 50)]
+    # joy: (0.2 * 100 + 0.9 * 100 + 0.9 * 50) / 250
+    assert label == "joy"
+    assert score == pytest.approx(0.62)
+    assert profile["distribution"] == {"joy": 0.62, "sadness": 0.38}
+
+
+def test_many_texts_share_batched_passes(classifier, monkeypatch):
+    monkeypatch.setattr(models, "EMOTION_MAX_TOKENS", 150)
+    long_text = _sentence("sad") + " " + _sentence("sad")
+    results = models.detect_emotion_profiles(["short one", long_text], token_counts=[2, 202])
+    assert classifier.calls == [["short one", _sentence("sad"), _sentence("sad")]]
+    assert results[0] == ("joy", 0.9, None)
+    assert results[1][0] == "sadness"
+    # A server batch mixes clients that sent a token count with clients that did not
+    assert models.detect_emotion_profiles(["short one", long_text], token_counts=[None, 202]) == results
+
+
+def test_emotion_passes(monkeypatch):
+    monkeypatch.setattr(models, "EMOTION_BATCH_SIZE", 16)
+    assert [models.emotion_passes(n) for n in (1, 16, 17, 40)] == [1, 1, 2, 3]
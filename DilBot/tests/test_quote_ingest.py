@@ -0,0 +1,44 @@
+import io
+import pytest
+
+pytest.importorskip("faiss")
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import quote_ingest
+
+
+def _stream(lines):
+    return io.BytesIO("\n".join(lines).encode("utf-8"))
+
+
+def test_normalize_and_count_lines():
+    assert quote_ingest.normalize_quote("  Keep\tgoing,  friend \n") == "Keep going, friend"
+    stream = _stream(["a", "b", "c"])
+    stream.seek(1)
+    assert quote_ingest.count_lines(stream) == 3
+    assert stream.tell() == 1
+    assert quote_ingest.count_lines(io.BytesIO(b"a\nb\n")) == 2
+
+
+def test_ingest_skips_blank_long_and_duplicate_lines():
+    lines = ["Be kind to yourself.", "", "be  KIND to yourself.", "x" * 600, "One day at a time."] * 3
+    reports = []
+    vectorstore, stats = quote_ingest.ingest_quotes(
+        _stream(lines), DeterministicFakeEmbedding(size=16), batch_size=1,
+        progress=lambda fraction, stats: reports.append((fraction, stats)))
+    assert stats["lines"] == 15
+    assert stats["added"] == 2
+    assert stats["duplicates"] == 7
+    assert stats["too_long"] == 3
+    assert vectorstore.index.ntotal == 2
+    assert reports[-1][0] == 1.0 and reports[-1][1]["added"] == 2
+    assert [doc.page_content for doc in vectorstore.similarity_search("One day at a time.", k=1)] == \
+        ["One day at a time."]
+
+
+def test_ingest_adds_to_an_existing_vectorstore():
+    embeddings = DeterministicFakeEmbedding(size=16)
+    vectorstore, _ = quote_ingest.ingest_quotes(_stream(["First quote."]), embeddings)
+    vectorstore, stats = quote_ingest.ingest_quotes(_stream(["Second quote.", "Third quote."]), embeddings,
+                                                    vectorstore=vectorstore)
+    assert stats["added"] == 2
+    assert vectorstore.index.ntotal == 3
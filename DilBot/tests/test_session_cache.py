@@ -0,0 +1,50 @@
+import json
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("langchain")
+import journal_archive
+import session_cache
+import storage
+
+
+def _entry(date, emotion, confidence=80.0):
+    return {"date": date, "timestamp": f"{date} 10:00:00", "user_input": "hi", "emotion": emotion,
+            "confidence": confidence, "response": "hello"}
+
+
+def test_journal_aggregates_include_the_archive():
+    journal = [_entry("2024-03-02", "joy", 90.0), _entry("2024-03-02", "sadness", 70.0)]
+    archived = {"entries": 2, "emotion_counts": {"joy": 2}, "confidence_sum": 100.0, "first_date": "2024-01-05",
+                "daily": {"2024-01-05": {"joy": 2}}}
+    aggregates = session_cache.journal_aggregates(journal, archived)
+    assert aggregates["total"] == 4
+    assert aggregates["most_common_emotion"] == "joy"
+    assert aggregates["avg_confidence"] == pytest.approx(65.0)
+    assert aggregates["first_date"] == "2024-01-05"
+    assert aggregates["emotion_options"] == ["Joy", "Sadness"]
+    assert aggregates["chart"]["count"].sum() == 4
+
+    empty = session_cache.journal_aggregates([])
+    assert empty["total"] == 0 and empty["avg_confidence"] is None and empty["most_common_emotion"] == "None"
+
+
+def test_cache_reloads_only_after_a_write(workdir, monkeypatch):
+    storage.create_user_directory("alice")
+    with open(storage.get_user_file_path("alice", "journal.json"), "w") as f:
+        json.dump([_entry("2024-03-01", "joy")], f)
+    loads, summaries = [], []
+    monkeypatch.setattr(session_cache, "load_user_journal",
+                        lambda username: loads.append(username) or storage.load_user_journal(username))
+    monkeypatch.setattr(session_cache, "archive_summary",
+                        lambda path: summaries.append(path) or journal_archive.summary(path))
+
+    cache = session_cache.UserStateCache("alice")
+    assert cache.aggregates()["total"] == 1
+    assert len(cache.tail()) == 1
+    assert cache.archived_months() == {}
+    assert len(loads) == len(summaries) == 1  # served from the cache
+
+    storage.bump_generation("alice", "journal")
+    assert cache.aggregates()["total"] == 1
+    assert len(loads) == len(summaries) == 2
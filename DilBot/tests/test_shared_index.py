@@ -0,0 +1,33 @@
+import os
+import pytest
+
+pytest.importorskip("faiss")
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import shared_index
+
+CATEGORIES = {"Self Care": ["Rest is productive.", "Be gentle with yourself."], "Hope": ["This too shall pass."]}
+
+
+def test_category_indexes_are_built_once_and_rebuilt_when_quotes_change(workdir):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    root = str(workdir / "shared")
+    shared_index.ensure_category_indexes(CATEGORIES, embeddings, root)
+    path = shared_index.category_dir("Self Care", root)
+    assert path.endswith("self_care")
+    built_at = os.path.getmtime(os.path.join(path, shared_index.SOURCE_FILE))
+
+    shared_index.ensure_category_indexes(CATEGORIES, embeddings, root)
+    assert os.path.getmtime(os.path.join(path, shared_index.SOURCE_FILE)) == built_at
+
+    store = shared_index.open_category_store("Self Care", embeddings, root)
+    assert store.similarity_search("Rest is productive.", k=1)[0].page_content == "Rest is productive."
+
+    changed = dict(CATEGORIES, **{"Self Care": ["Drink some water."]})
+    shared_index.ensure_category_indexes(changed, embeddings, root)
+    store = shared_index.open_category_store("Self Care", embeddings, root)
+    assert [doc.page_content for doc in store.similarity_search("water", k=5)] == ["Drink some water."]
+
+
+def test_is_default_copy():
+    assert shared_index.is_default_copy(["This too shall pass."], CATEGORIES)
+    assert not shared_index.is_default_copy(["This too shall pass.", "My own quote"], CATEGORIES)
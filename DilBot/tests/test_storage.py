@@ -0,0 +1,44 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+import storage
+import journal_index
+
+
+@pytest.fixture
+def alice(workdir):
+    storage.signup("alice", "secret1", "a@example.com")
+    return "alice"
+
+
+def test_queued_entries_are_visible_before_and_after_the_write(alice):
+    storage.save_user_journal(alice, "hello", "joy", 0.9, "hi there")
+    assert [e["user_input"] for e in storage.load_user_journal(alice)] == ["hello"]
+    storage.flush_user_journals(alice)
+    journal = storage.load_user_journal(alice)
+    assert [e["user_input"] for e in journal] == ["hello"]
+    assert journal[0]["confidence"] == 90.0
+
+
+def test_index_failure_does_not_rewrite_the_batch(alice, monkeypatch):
+    def broken(index_dir, entry, embedding):
+        raise OSError("index unavailable")
+
+    monkeypatch.setattr(journal_index, "add_entry", broken)
+    storage.save_user_journal(alice, "hello", "joy", 0.9, "hi", embedding=np.ones(8, dtype=np.float32))
+    storage.flush_user_journals(alice)
+    storage.flush_user_journals(alice)
+    assert [e["user_input"] for e in storage.load_user_journal(alice)] == ["hello"]
+    assert storage._journal_queue.pending(alice) == []
+
+
+def test_bump_generation_drops_the_cached_journal_index(alice):
+    index_dir = storage.get_user_file_path(alice, "journal_index")
+    storage.save_user_journal(alice, "hello", "joy", 0.9, "hi", embedding=np.ones(8, dtype=np.float32))
+    storage.flush_user_journals(alice)
+    assert journal_index.entry_count(index_dir) == 1
+    assert index_dir in journal_index._cache
+
+    storage.bump_generation(alice, "journal")  # e.g. after a reset job in another process
+    assert index_dir not in journal_index._cache
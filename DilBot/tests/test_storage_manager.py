@@ -0,0 +1,72 @@
+import os, time
+import pytest
+
+pytest.importorskip("langchain")
+import storage
+import storage_manager
+
+
+def _write(path, size=10, age=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    if age:
+        old = time.time() - age
+        os.utime(path, (old, old))
+
+
+def _make_dir(path, age):
+    _write(os.path.join(path, "index.faiss"), age=age)
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
+@pytest.fixture
+def users(workdir):
+    storage.signup("alice", "secret1", "a@example.com")
+    return workdir
+
+
+def test_usage_is_counted_per_artifact(users):
+    _write("users/alice/journal.json", 100)
+    _write("users/alice/vectorstore/index.faiss", 50)
+    report = storage_manager.usage_report()
+    assert report["users"]["alice"]["artifacts"] == {"journal": 100, "vectorstore": 50}
+    assert report["by_artifact"]["journal"] == 100
+    assert storage_manager.load_usage_report()["total"] == report["total"]
+
+
+def test_quota(users, monkeypatch):
+    monkeypatch.setattr(storage_manager, "USER_QUOTA_MB", 1)
+    _write("users/alice/vectorstore/index.faiss", 2**20 - 100)
+    assert storage_manager.check_quota("alice", 50) == (True, "")
+    allowed, message = storage_manager.check_quota("alice", 200)
+    assert not allowed and "1 MB storage quota" in message
+    assert storage_manager.check_quota("alice", 200, replacing=("vectorstore",))[0]
+
+
+def test_garbage_collection(users):
+    hour = storage_manager.ABANDONED_AFTER + 60
+    _write("users/alice/response.mp3", age=storage_manager.AUDIO_TTL_HOURS * 3600 + 60)
+    _make_dir("users/alice/vectorstore.saving", age=hour)
+    _make_dir("users/alice/vectorstore", age=0)
+    _make_dir("users/alice/vectorstore.old", age=hour)
+    _make_dir("users/alice/journal_index", age=0)  # its journal is gone
+    _make_dir("users/mallory", age=hour)  # not in the users file
+
+    dry = storage_manager.collect_garbage(dry_run=True)
+    assert os.path.exists("users/alice/response.mp3")
+    result = storage_manager.collect_garbage()
+    assert {item["path"] for item in result["removed"]} == {item["path"] for item in dry["removed"]}
+
+    for path in ("users/alice/response.mp3", "users/alice/vectorstore.saving", "users/alice/vectorstore.old",
+                 "users/alice/journal_index", "users/mallory"):
+        assert not os.path.exists(path), path
+    assert os.path.exists("users/alice/vectorstore")
+    assert storage_manager.load_usage_report()["last_gc"]["removed_count"] == 5
+
+
+def test_a_moved_aside_store_without_replacement_is_kept(users):
+    _make_dir("users/alice/vectorstore.old", age=storage_manager.ABANDONED_AFTER + 60)
+    storage_manager.collect_garbage()
+    assert os.path.exists("users/alice/vectorstore.old")
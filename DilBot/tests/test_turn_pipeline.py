@@ -0,0 +1,135 @@
+import re, time
+import pytest
+
+pytest.importorskip("langchain")
+np = pytest.importorskip("numpy")
+from langchain_core.documents import Document
+from langchain_core.language_models.llms import LLM
+import turn_pipeline
+from conversation_memory import ConversationMemory, make_token_counter
+
+WORD = re.compile(r"\w+|[^\w\s]")
+count_tokens = make_token_counter()
+
+
+class WordTokenizer:
+    def encode(self, text, add_special_tokens=True):
+        return WORD.findall(text)
+
+
+class RecordingLLM(LLM):
+    prompts: list = []
+
+    @property
+    def _llm_type(self):
+        return "recording"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(prompt)
+        return "I hear you."
+
+
+class Quotes:
+    def similarity_search_by_vector(self, vector, k=2):
+        return [Document(page_content="Healing is not linear, and that's perfectly okay. " * 5)][:k]
+
+
+def _encode(text):
+    if isinstance(text, list):
+        return [_encode(t) for t in text]
+    vector = np.zeros(8, dtype=np.float32)
+    vector[len(text) % 8] = 1.0
+    return vector
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    saved = []
+    monkeypatch.setattr(turn_pipeline, "load_tokenizer", WordTokenizer)
+    monkeypatch.setattr(turn_pipeline, "save_user_journal", lambda *args, **kwargs: saved.append(args))
+
+    def turn(message, memory, llm, budget=1500):
+        return turn_pipeline.process_turn(
+            "alice", message, Quotes(), [], llm, memory=memory, synthesize=None, prompt_token_budget=budget,
+            detect=lambda text, token_count=None: ("joy", 0.9, None), encode=_encode, admission=None)
+    return turn
+
+
+def test_oversized_message_is_cut_to_the_budget(pipeline):
+    llm = RecordingLLM(prompts=[])
+    memory = ConversationMemory(lambda summary, turns: "summary", count_tokens)
+    result = pipeline("word " * 2000, memory, llm, budget=150)
+    assert result["prompt_tokens"] <= 150
+    assert count_tokens(llm.prompts[0]) <= 150
+    assert "word" in llm.prompts[0]
+
+
+def test_summary_runs_off_the_request_path(pipeline):
+    llm = RecordingLLM(prompts=[])
+    summarized = []
+
+    def summarize(summary, turns):
+        summarized.append(turns)
+        return "they had a long week"
+
+    memory = ConversationMemory(summarize, count_tokens, recent_turns=1, summary_every=1)
+    pipeline("first message", memory, llm)
+    pipeline("second message", memory, llm)
+    deadline = time.monotonic() + 5
+    while not memory.summary and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert memory.summary == "they had a long week"
+    assert "first message" in summarized[0]
+
+
+def test_turn_context_tokenizes_and_embeds_once():
+    encoded, tokenized = [], []
+
+    class CountingTokenizer(WordTokenizer):
+        def encode(self, text, add_special_tokens=True):
+            tokenized.append(text)
+            return super().encode(text, add_special_tokens)
+
+    def encode(text):
+        encoded.append(text)
+        return _encode(text)
+
+    turn = turn_pipeline.TurnContext("I feel fine, thanks.", encode=encode, tokenizer=CountingTokenizer())
+    detected = []
+    turn.detect_emotion(lambda text, token_count=None: detected.append(token_count) or ("joy", 0.9, None))
+    assert turn.embedding is turn.embedding
+    assert turn.embedding.dtype == np.float32
+    assert turn.token_count == 6
+    assert (detected, len(encoded), len(tokenized)) == ([6], 1, 1)
+    assert turn.forward_passes == {"emotion": 1, "encode": 1}
+
+
+def test_segmented_detection_counts_its_batched_passes(monkeypatch):
+    monkeypatch.setattr(turn_pipeline, "emotion_passes", lambda segments: -(-segments // 16))
+    turn = turn_pipeline.TurnContext("long text", encode=_encode, tokenizer=WordTokenizer())
+    profile = {"distribution": {}, "segments": [{}] * 20}
+    turn.detect_emotion(lambda text, token_count=None: ("joy", 0.9, profile))
+    assert turn.forward_passes == {"emotion": 2}
+
+
+def test_quote_embeddings_are_encoded_once_across_turns(pipeline, monkeypatch):
+    monkeypatch.setattr(turn_pipeline, "_quote_embeddings", turn_pipeline.OrderedDict())
+    quotes = [f"quote {'x' * i}" for i in range(40)]
+    batches = []
+
+    def encode(text):
+        if isinstance(text, list):
+            batches.append(len(text))
+        return _encode(text)
+
+    def turn():
+        return turn_pipeline.process_turn(
+            "alice", "hello there", Quotes(), quotes, RecordingLLM(prompts=[]), synthesize=None,
+            detect=lambda text, token_count=None: ("joy", 0.9, None), encode=encode, admission=None)
+
+    first = turn()
+    assert first["forward_passes"] == {"emotion": 1, "encode": 1 + 2}  # the message, then 40 quotes in 2 batches
+    assert first["selected_quote"] in quotes
+    second = turn()
+    assert second["forward_passes"] == {"emotion": 1, "encode": 1}
+    assert batches == [40]
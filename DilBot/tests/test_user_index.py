@@ -0,0 +1,102 @@
+import os
+from contextlib import closing
+import pytest
+import user_index
+
+
+def _entries(emotions, date="2024-05-01"):
+    return [{"emotion": emotion, "date": date} for emotion in emotions]
+
+
+@pytest.fixture
+def users(workdir):
+    user_index.add_user("Alice", "alice@example.com", "2024-01-05 10:00:00")
+    user_index.add_user("alfred", "fred@example.com", "2024-02-10")
+    user_index.add_user("bob", "Alpha.Bob@example.com", "2024-03-15")
+    user_index.record_entries("Alice", _entries(["joy", "joy", "sadness"], "2024-05-03"))
+    user_index.record_entries("alfred", _entries(["anger"], "2024-04-01"))
+    return workdir
+
+
+def _names(**filters):
+    return [user["username"] for user in user_index.search(**filters)[0]]
+
+
+def test_prefix_matches_username_or_email_case_insensitively(users):
+    assert sorted(_names(prefix="AL")) == ["Alice", "alfred", "bob"]
+    assert _names(prefix="fred") == ["alfred"]
+    assert _names(prefix="zed") == []
+
+
+def test_filters_and_sorting(users):
+    assert _names(sort="conversations") == ["Alice", "alfred", "bob"]
+    assert _names(sort="joined") == ["bob", "alfred", "Alice"]
+    assert _names(sort="username") == ["alfred", "Alice", "bob"]
+    assert _names(min_conversations=1, max_conversations=2) == ["alfred"]
+    assert _names(emotion="Joy") == ["Alice"]
+    assert _names(joined_from="2024-02-01", joined_to="2024-02-28") == ["alfred"]
+    assert _names(active_since="2024-05-01") == ["Alice"]
+    with pytest.raises(ValueError):
+        user_index.search(sort="email")
+
+
+def test_pages_carry_the_total_and_details(users):
+    page, total = user_index.search(sort="username", limit=1, offset=1)
+    assert total == 3
+    assert page == [{
+        "username": "Alice", "email": "alice@example.com", "joined": "2024-01-05", "conversations": 3,
+        "last_activity": "2024-05-03", "most_common_emotion": "Joy",
+        "emotions_breakdown": {"joy": 2, "sadness": 1},
+    }]
+
+
+def test_writes_bump_the_journal_version(users):
+    version = user_index.journal_version()
+    user_index.record_entries("bob", _entries(["fear"]))
+    assert user_index.journal_version() == version + 1
+    user_index.record_entries("nobody", _entries(["fear"]))  # not indexed, nothing to count
+    assert user_index.journal_version() == version + 1
+
+    user_index.clear_activity("Alice")
+    assert user_index.journal_version() == version + 2
+    alice = user_index.search(prefix="alice")[0][0]
+    assert (alice["conversations"], alice["last_activity"], alice["emotions_breakdown"]) == (0, "Never", {})
+
+
+def test_failed_clear_leaves_the_row_and_the_database_usable(users, monkeypatch):
+    def broken(conn):
+        raise RuntimeError("disk I/O error")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(user_index, "_bump_journal_version", broken)
+        with pytest.raises(RuntimeError):
+            user_index.clear_activity("Alice")
+    assert user_index.search(prefix="alice")[0][0]["conversations"] == 3
+    user_index.record_entries("Alice", _entries(["joy"]))
+    assert user_index.search(prefix="alice")[0][0]["conversations"] == 4
+
+
+def test_a_deleted_database_is_recreated(users):
+    os.remove(user_index.USER_INDEX_PATH)
+    assert user_index.search()[1] == 0
+    assert not user_index.is_built()
+    user_index.add_user("carol", "c@example.com", "2024-06-01")
+    assert _names() == ["carol"]
+
+
+def test_schema_is_created_once_per_database_file(users):
+    with closing(user_index.connect()) as conn:
+        conn.execute("DROP INDEX users_last_activity")
+    with closing(user_index.connect()) as conn:
+        # Not re-created: this connect ran no schema script
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'users_last_activity'").fetchone()[0] == 0
+
+
+def test_overview_and_rebuild(users):
+    user_index.replace_all([("dana", "d@example.com", "2024-06-01", 25, "2024-06-02", {"joy": 20, "fear": 5})])
+    assert user_index.is_built()
+    assert user_index.overview("2024-06-01", "2024-05-25") == {
+        "total_users": 1, "users_today": 1, "users_this_week": 1, "total_conversations": 25, "active_users": 1}
+    assert user_index.activity_levels()["Heavy (21+)"] == 1
+    assert user_index.emotion_totals() == {"joy": 20, "fear": 5}
+    assert user_index.registrations_by_day() == {"2024-06-01": 1}
@@ -0,0 +1,297 @@
+# One DilBot conversation turn, independent of Streamlit.
+#
+# process_turn() runs emotion detection, embedding, retrieval, prompt building,
+# the LLM call, journal writing, best-quote selection and speech synthesis,
+# timing each stage with metrics.span. The LLM and the speech synthesizer are passed in, so the
+# benchmarks can substitute deterministic local stubs for Groq and gTTS.
+#
+# A TurnContext holds what the turn computes from the user's message: one
+# tokenization (shared by emotion detection and the prompt token budget) and
+# one embedding (shared by retrieval, best-quote ranking and the journal search
+# index). Quote embeddings for best-quote ranking are cached across turns. Each
+# turn reports its model forward passes in the result and in the
+# turn_forward_passes_<kind> counters.
+import os, logging, threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from functools import partial
+import numpy as np
+from gtts import gTTS
+from langchain_groq import ChatGroq
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+import metrics
+from metrics import span
+from memory_profile import register_cache
+from admission import controller as admission_controller
+from llm_router import HedgedLLM
+from models import detect_emotion_profile, encode_text, load_tokenizer, emotion_passes, ENCODE_BATCH_SIZE
+from storage import get_user_file_path, save_user_journal
+from conversation_memory import ConversationMemory, SUMMARY_PROMPT, make_token_counter
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Point at a Groq-compatible server instead of api.groq.com (e.g. benchmarks/groq_stub.py)
+GROQ_BASE_URL = os.getenv("DILBOT_GROQ_BASE_URL")
+LLM_MODEL = "llama3-70b-8192"
+LLM_TIMEOUT = float(os.getenv("DILBOT_LLM_TIMEOUT", "30"))  # seconds per request, either model
+
+# Hedging (opt-in): without a first token after DILBOT_LLM_HEDGE_MS, the prompt also
+# goes to the secondary model (any Groq/OpenAI-compatible endpoint); 0 = no hedging
+LLM_HEDGE_AFTER = float(os.getenv("DILBOT_LLM_HEDGE_MS", "0")) / 1000
+SECONDARY_LLM_MODEL = os.getenv("DILBOT_LLM_SECONDARY_MODEL", "llama3-8b-8192")
+SECONDARY_BASE_URL = os.getenv("DILBOT_LLM_SECONDARY_BASE_URL")  # unset = same endpoint as the primary
+SECONDARY_API_KEY = os.getenv("DILBOT_LLM_SECONDARY_API_KEY")  # unset = GROQ_API_KEY
+
+# Conversation memory: verbatim turns kept, how often older turns are summarized,
+# and the hard token budget for the whole prompt
+MEMORY_RECENT_TURNS = int(os.getenv("DILBOT_MEMORY_TURNS", "4"))
+MEMORY_SUMMARY_EVERY = int(os.getenv("DILBOT_SUMMARY_EVERY", "4"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("DILBOT_PROMPT_TOKEN_BUDGET", "1500"))
+
+QUOTE_EMBEDDING_CACHE = 32  # quote lists whose embeddings are kept for best-quote ranking
+
+CRISIS_KEYWORDS = ["suicide", "kill myself", "end it all", "worthless", "can't go on", "hurt myself", "self harm", "want to disappear", "no reason to live"]
+
+PROMPT_TEMPLATE = PromptTemplate(
+    input_variables=["context", "history", "user_input", "username"],
+    template="""You are DilBot, an empathetic emotional support AI companion for {username}.
+Use the following emotional quote context to respond gently, supportively, and personally.
+Context quotes:
+{context}
+Conversation so far:
+{history}
+User's message:
+{user_input}
+Respond as DilBot with warmth, empathy, and understanding. Keep it conversational and supportive."""
+)
+
+logger = logging.getLogger("dilbot")
+
+
+def is_crisis(text):
+    """Check for crisis keywords"""
+    return any(phrase in text.lower() for phrase in CRISIS_KEYWORDS)
+
+
+def _chat_model(model, api_key, base_url, max_retries, http_client=None):
+    options = {"timeout": LLM_TIMEOUT, "max_retries": max_retries, "http_client": http_client}
+    if base_url:
+        return ChatGroq(api_key=api_key or "local", model=model, base_url=base_url, **options)
+    return ChatGroq(api_key=api_key, model=model, **options)
+
+
+def make_llm(hedge_after=None):
+    hedge_after = LLM_HEDGE_AFTER if hedge_after is None else hedge_after
+    if hedge_after <= 0 or not SECONDARY_LLM_MODEL:
+        return _chat_model(LLM_MODEL, GROQ_API_KEY, GROQ_BASE_URL, max_retries=2)
+    # Retries would hide a failing primary from the hedge; the secondary is the retry
+    primary = partial(_chat_model, LLM_MODEL, GROQ_API_KEY, GROQ_BASE_URL, max_retries=0)
+    secondary = partial(_chat_model, SECONDARY_LLM_MODEL, SECONDARY_API_KEY or GROQ_API_KEY,
+                        SECONDARY_BASE_URL or GROQ_BASE_URL, max_retries=1)
+    return HedgedLLM(primary=primary, secondary=secondary, hedge_after=hedge_after)
+
+
+def create_conversation_memory(llm):
+    """A fresh conversation memory whose rolling summary is written by `llm`"""
+    summary_chain = LLMChain(
+        llm=llm,
+        prompt=PromptTemplate(input_variables=["summary", "turns"], template=SUMMARY_PROMPT)
+    )
+    return ConversationMemory(
+        summarize=summary_chain.run,
+        count_tokens=make_token_counter(load_tokenizer()),
+        recent_turns=MEMORY_RECENT_TURNS,
+        summary_every=MEMORY_SUMMARY_EVERY
+    )
+
+
+def synthesize_speech(text, username):
+    """Generate the spoken response and return the audio file path"""
+    tts = gTTS(text=text, lang='en')
+    audio_path = get_user_file_path(username, "response.mp3")
+    tts.save(audio_path)
+    return audio_path
+
+
+class TurnContext:
+    """The user's message and what the turn's stages need from it, each computed at most once"""
+
+    def __init__(self, text, encode=encode_text, tokenizer=None):
+        self.text = text
+        self._encode = encode
+        self._tokenizer = tokenizer
+        self._embedding = None
+        self._token_count = None
+        self.forward_passes = {}  # model kind -> forward passes run for this turn
+
+    def count_passes(self, kind, passes):
+        if passes:
+            self.forward_passes[kind] = self.forward_passes.get(kind, 0) + passes
+            metrics.increment(f"turn_forward_passes_{kind}", passes)
+
+    @property
+    def embedding(self):
+        """float32 embedding of the message (one forward pass, on first use)"""
+        if self._embedding is None:
+            with span("embed_message"):
+                self._embedding = np.asarray(self._encode(self.text), dtype=np.float32)
+            self.count_passes("encode", 1)
+        return self._embedding
+
+    @property
+    def token_count(self):
+        """Tokens in the message without special tokens, for the emotion model's window and the prompt budget"""
+        if self._token_count is None:
+            tokenizer = self._tokenizer or load_tokenizer()
+            self._token_count = len(tokenizer.encode(self.text, add_special_tokens=False))
+        return self._token_count
+
+    def detect_emotion(self, detect=detect_emotion_profile):
+        """(label, score, profile) from detect(text, token_count=...), which can skip its own tokenization"""
+        with span("detect_emotion"):
+            result = detect(self.text, token_count=self.token_count)
+        profile = result[2]
+        self.count_passes("emotion", 1 if profile is None else emotion_passes(len(profile["segments"])))
+        return result
+
+
+_quote_embeddings = OrderedDict()  # (quotes, encode) -> row-normalized matrix, least recently used first
+_quote_embeddings_lock = threading.Lock()
+
+
+def _quote_embeddings_stats():
+    with _quote_embeddings_lock:
+        return len(_quote_embeddings), sum(matrix.nbytes for matrix in _quote_embeddings.values())
+
+
+register_cache("quote_embeddings", _quote_embeddings_stats)
+
+
+def quote_matrix(quotes, encode=encode_text, context=None):
+    """Normalized embeddings of a quote list, encoded once and then served from an LRU cache"""
+    key = (tuple(quotes), encode)
+    with _quote_embeddings_lock:
+        matrix = _quote_embeddings.get(key)
+        if matrix is not None:
+            _quote_embeddings.move_to_end(key)
+            return matrix
+    matrix = np.asarray(encode(list(quotes)), dtype=np.float32)
+    matrix = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+    if context is not None:
+        context.count_passes("encode", -(-len(quotes) // ENCODE_BATCH_SIZE))
+    with _quote_embeddings_lock:
+        _quote_embeddings[key] = matrix
+        while len(_quote_embeddings) > QUOTE_EMBEDDING_CACHE:
+            _quote_embeddings.popitem(last=False)
+    return matrix
+
+
+def select_best_quote(user_embedding, current_quotes, similar_docs, encode=encode_text, context=None):
+    """Pick the quote closest to the message"""
+    if current_quotes:
+        sims = quote_matrix(current_quotes, encode, context) @ user_embedding
+        return current_quotes[int(sims.argmax())]
+    if similar_docs:
+        # Uploaded corpora can be huge: the nearest retrieved quote is the best match
+        return similar_docs[0].page_content
+    return None
+
+
+def _refresh_summary(memory, username, admission):
+    """Summarize older turns off the request path; the summary call takes an LLM slot like any other"""
+    try:
+        with (admission.slot(username) if admission is not None else nullcontext()):
+            with span("memory_summary"):
+                memory.refresh_summary()
+    except Exception:
+        # The turns stay unsummarized (and rendered verbatim); the next due summary retries them
+        logger.exception("Could not summarize the conversation for %s", username)
+
+
+def process_turn(username, user_input, vectorstore, current_quotes, llm, memory=None,
+                 synthesize=synthesize_speech, prompt_token_budget=PROMPT_TOKEN_BUDGET,
+                 detect=detect_emotion_profile, encode=encode_text, admission=admission_controller, on_queue=None):
+    """Run one conversation turn end to end and return everything the UI needs to render it
+
+    `detect(text, token_count)` (-> label, score, profile) and `encode` run the local models; the
+    API passes versions that hand the work to its model processes. The LLM call
+    goes through `admission` (admission.AdmissionController, None = unlimited):
+    a user over their rate gets admission.RateLimited before any model runs,
+    and on_queue(position) reports their place in line while all slots are busy.
+    """
+    if admission is not None:
+        admission.acquire_token(username)
+    turn = TurnContext(user_input, encode=encode)
+
+    # Emotion detection
+    emotion, score, emotion_profile = turn.detect_emotion(detect)
+
+    # Embed the message once; reused for retrieval, quote selection and the journal search index
+    user_embedding = turn.embedding
+
+    # Get similar quotes
+    with span("similarity_search"):
+        similar_docs = vectorstore.similarity_search_by_vector(user_embedding.tolist(), k=2)
+    context = "\n".join([doc.page_content for doc in similar_docs])
+
+    # Fit conversation history into whatever the token budget leaves over
+    history = ""
+    prompt_tokens = None
+    prompt_input = user_input
+    if memory is not None:
+        with span("build_prompt"):
+            # The message was tokenized for emotion detection already (the memory counts with
+            # the same tokenizer, see create_conversation_memory)
+            fixed_tokens = memory.count_tokens(PROMPT_TEMPLATE.format(
+                context=context, history="", user_input="", username=username)) + turn.token_count
+            if fixed_tokens > prompt_token_budget:
+                # A message too long for the budget: the quote context is cut first, then the message
+                template_tokens = memory.count_tokens(PROMPT_TEMPLATE.format(
+                    context="", history="", user_input="", username=username))
+                context = memory.truncate(context, prompt_token_budget - template_tokens - turn.token_count)
+                prompt_input = memory.truncate(
+                    user_input, prompt_token_budget - template_tokens - memory.count_tokens(context))
+                logger.warning("prompt over budget (%d > %d tokens); message cut to %d of %d characters user=%s",
+                               fixed_tokens, prompt_token_budget, len(prompt_input), len(user_input), username)
+                fixed_tokens = memory.count_tokens(PROMPT_TEMPLATE.format(
+                    context=context, history="", user_input=prompt_input, username=username))
+            history = memory.render(prompt_token_budget - fixed_tokens)
+            prompt_tokens = fixed_tokens + memory.count_tokens(history)
+        logger.info("prompt_tokens=%d history_tokens=%d user=%s",
+                    prompt_tokens, prompt_tokens - fixed_tokens, username)
+
+    # Generate response
+    chain = LLMChain(llm=llm, prompt=PROMPT_TEMPLATE)
+    with (admission.slot(username, on_wait=on_queue) if admission is not None else nullcontext()):
+        with span("chain_run"):
+            response = chain.run(context=context, history=history, user_input=prompt_input, username=username)
+    if memory is not None:
+        with span("memory_update"):
+            if memory.add_turn(user_input, response):
+                threading.Thread(target=_refresh_summary, args=(memory, username, admission), daemon=True,
+                                 name="memory-summary").start()
+
+    # Queue the journal entry; it is written in the background (journal_queue)
+    with span("save_user_journal"):
+        save_user_journal(username, user_input, emotion, score, response, embedding=user_embedding,
+                          emotion_profile=emotion_profile)
+
+    with span("best_quote"):
+        selected_quote = select_best_quote(user_embedding, current_quotes, similar_docs, encode, turn)
+
+    audio_path = None
+    if synthesize is not None:
+        with span("speak"):
+            audio_path = synthesize(response, username)
+
+    return {
+        "emotion": emotion,
+        "score": score,
+        "emotion_profile": emotion_profile,
+        "response": response,
+        "selected_quote": selected_quote,
+        "crisis": is_crisis(user_input),
+        "audio_path": audio_path,
+        "prompt_tokens": prompt_tokens,
+        "forward_passes": dict(turn.forward_passes),
+    }
@@ -0,0 +1,282 @@
+# Maintained index over users for the admin dashboard, backed by SQLite.
+#
+#   user_index.add_user("alice", "alice@example.com", created_at)     # at signup
+#   user_index.record_entries("alice", entries)                       # as journal entries are written
+#   user_index.search(prefix="ali", min_conversations=5, sort="last_activity", limit=50)
+#
+# One row per user (lowercased username and email, join date, conversation
+# count, last activity, dominant emotion) plus per-user emotion counts, each
+# column with its own B-tree index, so prefix search, range filters and top-k
+# sorting are index seeks instead of a scan over every journal. Rows are
+# updated write-through by storage.py; storage.rebuild_user_index() fills the
+# index from the users file and journals on first use and repairs any drift.
+# Every journal change also bumps journal_version(), which tells derived
+# results (analytics.py) that they are out of date.
+import os, time, sqlite3
+from contextlib import closing
+
+USER_INDEX_PATH = os.getenv("DILBOT_USER_INDEX_DB", "data/user_index.db")
+SORT_COLUMNS = {
+    "conversations": "conversations DESC, username_key",
+    "last_activity": "last_activity DESC, username_key",
+    "joined": "joined DESC, username_key",
+    "username": "username_key",
+}
+ACTIVITY_LEVELS = [("Inactive (0)", 0, 0), ("Light (1-5)", 1, 5), ("Moderate (6-20)", 6, 20), ("Heavy (21+)", 21, None)]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    username_key TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL,
+    joined TEXT NOT NULL,
+    conversations INTEGER NOT NULL DEFAULT 0,
+    last_activity TEXT,
+    dominant_emotion TEXT
+);
+CREATE INDEX IF NOT EXISTS users_username ON users (username_key);
+CREATE INDEX IF NOT EXISTS users_email ON users (email_key);
+CREATE INDEX IF NOT EXISTS users_joined ON users (joined);
+CREATE INDEX IF NOT EXISTS users_conversations ON users (conversations);
+CREATE INDEX IF NOT EXISTS users_last_activity ON users (last_activity);
+CREATE INDEX IF NOT EXISTS users_emotion ON users (dominant_emotion, conversations);
+CREATE TABLE IF NOT EXISTS user_emotions (
+    username TEXT NOT NULL,
+    emotion TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (username, emotion)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Database files (path, device, inode) this process has created the schema in
+_schema_ready = set()
+
+
+def connect():
+    os.makedirs(os.path.dirname(USER_INDEX_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(USER_INDEX_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # Once per file: a deleted (or replaced) database comes back as a new, empty file
+    stat = os.stat(USER_INDEX_PATH)
+    key = (os.path.abspath(USER_INDEX_PATH), stat.st_dev, stat.st_ino)
+    if key not in _schema_ready or stat.st_size == 0:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _schema_ready.add(key)
+    return conn
+
+
+def _prefix_range(prefix):
+    """[low, high) bounds matching every string that starts with prefix (an index range scan)"""
+    prefix = prefix.lower()
+    return prefix, prefix + "\U0010ffff"
+
+
+def _bump_journal_version(conn):
+    conn.execute("INSERT INTO meta (key, value) VALUES ('journal_version', 1) "
+                 "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+
+def _set_dominant(conn, username):
+    row = conn.execute("SELECT emotion FROM user_emotions WHERE username = ? ORDER BY count DESC, emotion LIMIT 1",
+                       (username,)).fetchone()
+    conn.execute("UPDATE users SET dominant_emotion = ? WHERE username = ?", (row[0] if row else None, username))
+
+
+# Writes
+def add_user(username, email, created_at):
+    with closing(connect()) as conn:
+        conn.execute(
+            "INSERT INTO users (username, username_key, email, email_key, joined) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET email = excluded.email, email_key = excluded.email_key, "
+            "joined = excluded.joined",
+            (username, username.lower(), email, email.lower(), str(created_at)[:10])
+        )
+
+
+def record_entries(username, entries):
+    """Count newly written journal entries towards the user's row"""
+    if not entries:
+        return
+    emotions = {}
+    for entry in entries:
+        emotions[entry["emotion"]] = emotions.get(entry["emotion"], 0) + 1
+    last_date = max(entry["date"] for entry in entries)
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = conn.execute(
+                "UPDATE users SET conversations = conversations + ?, "
+                "last_activity = MAX(COALESCE(last_activity, ''), ?) WHERE username = ?",
+                (len(entries), last_date, username)
+            ).rowcount
+            if not updated:  # not indexed (e.g. the admin account); the next rebuild decides
+                conn.execute("ROLLBACK")
+                return
+            conn.executemany(
+                "INSERT INTO user_emotions (username, emotion, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (username, emotion) DO UPDATE SET count = count + excluded.count",
+                [(username, emotion, count) for emotion, count in emotions.items()]
+            )
+            _set_dominant(conn, username)
+            _bump_journal_version(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def clear_activity(username):
+    """The user's journal was deleted"""
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM user_emotions WHERE username = ?", (username,))
+            conn.execute("UPDATE users SET conversations = 0, last_activity = NULL, dominant_emotion = NULL "
+                         "WHERE username = ?", (username,))
+            _bump_journal_version(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def replace_all(rows):
+    """Swap in a full rebuild: rows of (username, email, created_at, conversations, last_activity, emotion_counts)"""
+    with closing(connect()) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM users")
+            conn.execute("DELETE FROM user_emotions")
+            for username, email, created_at, conversations, last_activity, emotion_counts in rows:
+                conn.execute(
+                    "INSERT INTO users (username, username_key, email, email_key, joined, conversations, last_activity) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (username, username.lower(), email, email.lower(), str(created_at)[:10], conversations,
+                     last_activity)
+                )
+                conn.executemany("INSERT INTO user_emotions (username, emotion, count) VALUES (?, ?, ?)",
+                                 [(username, emotion, count) for emotion, count in emotion_counts.items() if count])
+                _set_dominant(conn, username)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)", (str(time.time()),))
+            _bump_journal_version(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def journal_version():
+    """Counter bumped by every journal write or reset that reached the index"""
+    with closing(connect()) as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'journal_version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def is_built():
+    with closing(connect()) as conn:
+        return conn.execute("SELECT 1 FROM meta WHERE key = 'built_at'").fetchone() is not None
+
+
+# Queries
+def search(prefix="", min_conversations=0, max_conversations=None, emotion=None, joined_from=None, joined_to=None,
+           active_since=None, sort="conversations", limit=50, offset=0):
+    """(matching users for one page, total matches); prefix matches the start of the username or email"""
+    clauses, params = [], []
+    if prefix:
+        low, high = _prefix_range(prefix)
+        # Two range scans (one per index) rather than one OR, which SQLite would answer with a full scan
+        clauses.append("username IN (SELECT username FROM users WHERE username_key >= ? AND username_key < ? "
+                       "UNION SELECT username FROM users WHERE email_key >= ? AND email_key < ?)")
+        params += [low, high, low, high]
+    if min_conversations:
+        clauses.append("conversations >= ?")
+        params.append(min_conversations)
+    if max_conversations is not None:
+        clauses.append("conversations <= ?")
+        params.append(max_conversations)
+    if emotion:
+        clauses.append("dominant_emotion = ?")
+        params.append(emotion.lower())
+    if joined_from:
+        clauses.append("joined >= ?")
+        params.append(str(joined_from))
+    if joined_to:
+        clauses.append("joined <= ?")
+        params.append(str(joined_to))
+    if active_since:
+        clauses.append("last_activity >= ?")
+        params.append(str(active_since))
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    order = SORT_COLUMNS.get(sort)
+    if order is None:
+        raise ValueError(f"Unknown sort: {sort} (expected one of {', '.join(SORT_COLUMNS)})")
+
+    with closing(connect()) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM users{where}", params).fetchone()[0]
+        page = f"SELECT username FROM users{where} ORDER BY {order} LIMIT ? OFFSET ?"
+        rows = conn.execute(f"SELECT * FROM users WHERE username IN ({page}) ORDER BY {order}",
+                            params + [limit, offset]).fetchall()
+        breakdowns = {}
+        for username, emotion_name, count in conn.execute(
+                f"SELECT username, emotion, count FROM user_emotions WHERE username IN ({page}) "
+                f"ORDER BY count DESC", params + [limit, offset]):
+            breakdowns.setdefault(username, {})[emotion_name] = count
+    return [_user_details(row, breakdowns.get(row["username"], {})) for row in rows], total
+
+
+def _user_details(row, emotions_breakdown):
+    """Same shape as get_admin_stats()["user_details"] items"""
+    return {
+        "username": row["username"],
+        "email": row["email"],
+        "joined": row["joined"],
+        "conversations": row["conversations"],
+        "last_activity": row["last_activity"] or "Never",
+        "most_common_emotion": (row["dominant_emotion"] or "None").capitalize(),
+        "emotions_breakdown": emotions_breakdown,
+    }
+
+
+def overview(today, week_ago):
+    with closing(connect()) as conn:
+        row = conn.execute(
+            "SELECT COUNT(*), SUM(joined = ?), SUM(joined >= ?), COALESCE(SUM(conversations), 0), "
+            "SUM(conversations > 0) FROM users", (str(today), str(week_ago))
+        ).fetchone()
+    return {
+        "total_users": row[0],
+        "users_today": row[1] or 0,
+        "users_this_week": row[2] or 0,
+        "total_conversations": row[3],
+        "active_users": row[4] or 0,
+    }
+
+
+def registrations_by_day():
+    with closing(connect()) as conn:
+        return {day: count for day, count in conn.execute("SELECT joined, COUNT(*) FROM users GROUP BY joined")}
+
+
+def emotion_totals():
+    with closing(connect()) as conn:
+        return {emotion: count for emotion, count in
+                conn.execute("SELECT emotion, SUM(count) FROM user_emotions GROUP BY emotion")}
+
+
+def activity_levels():
+    levels = {}
+    with closing(connect()) as conn:
+        for label, low, high in ACTIVITY_LEVELS:
+            levels[label] = conn.execute(
+                "SELECT COUNT(*) FROM users WHERE conversations >= ? AND (? IS NULL OR conversations <= ?)",
+                (low, high, high)
+            ).fetchone()[0]
+    return levels
+
+
+def all_user_details():
+    """Every user, as get_admin_stats() used to build from the journals"""
+    return search(limit=-1, sort="username")[0]